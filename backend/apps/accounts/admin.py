@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+
+from apps.core.pagination import EstimatedCountPaginator
+
 from .models import User
 
 class CustomUserAdmin(UserAdmin):
@@ -16,7 +19,12 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
     list_display = ('email', 'first_name', 'last_name', 'is_staff')
+    # Ricerche icontains servite dagli indici trigram su Postgres (vedi la migrazione accounts 0002)
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+    date_hierarchy = 'date_joined'
+    # Conteggi stimati sulle tabelle grandi, senza COUNT(*) dell'intera tabella
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
+
+    def ready(self):
+        # Registra i receiver dei segnali
+        from . import signals  # noqa: F401
+        # Registra i controlli di sistema
+        from . import checks  # noqa: F401
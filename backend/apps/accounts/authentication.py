@@ -0,0 +1,147 @@
+# backend/apps/accounts/authentication.py
+"""
+Autenticazione JWT con risoluzione dell'utente dalla cache.
+
+JWTAuthentication esegue una SELECT sulla tabella degli utenti a ogni
+richiesta per trasformare il claim user_id in un'istanza del modello.
+CachedJWTAuthentication conserva l'utente nella cache condivisa per
+USER_CACHE_TIMEOUT secondi, insieme alla versione dell'utente con cui è
+stato letto: la versione viene incrementata (vedi signals.py) a ogni
+modifica del profilo, della password, dei gruppi o dei permessi, quindi una
+voce con una versione diversa da quella corrente viene ignorata. Versione e
+utente sono letti con una sola chiamata alla cache.
+
+Le view di sola lettura che non usano dati dell'utente oltre a ID, is_staff
+e reparto possono impostare token_user = True: per i metodi sicuri
+l'utente è un TokenUser costruito dai claim del token, senza accessi né al
+database né alla cache. I claim restano quelli dell'emissione del token,
+quindi una revoca dei permessi ha effetto su queste view solo alla scadenza
+del token di accesso.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.core.conditional import VersionCounter
+
+USER_VERSIONS = VersionCounter('accounts:users')
+
+# Durata massima (secondi) di un utente in cache, anche a versione invariata
+USER_CACHE_TIMEOUT = 120
+
+# Intervallo minimo tra due aggiornamenti di last_login dello stesso utente
+LAST_LOGIN_INTERVAL = timedelta(hours=1)
+
+
+def _user_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def cached_user(user_id):
+    """
+    Args:
+        user_id: ID dell'utente
+
+    Returns:
+        User | None: Utente in cache se letto con la versione corrente
+    """
+    version_key = USER_VERSIONS.key(user_id)
+    found = cache.get_many([version_key, _user_key(user_id)])
+    entry = found.get(_user_key(user_id))
+    if entry is None or version_key not in found or entry[0] != found[version_key]:
+        return None
+    return entry[1]
+
+
+def cache_user(user, version):
+    """
+    Salva un utente in cache con la versione letta prima di caricarlo.
+
+    Args:
+        user: Istanza di User
+        version: Versione dell'utente letta prima della query
+    """
+    cache.set(_user_key(user.pk), (version, user), timeout=USER_CACHE_TIMEOUT)
+
+
+def touch_last_login(user):
+    """
+    Aggiorna last_login al login, al più una volta ogni LAST_LOGIN_INTERVAL.
+
+    L'aggiornamento usa un UPDATE diretto: non invia post_save e non
+    invalida l'utente in cache.
+
+    Args:
+        user: Utente che ha effettuato il login
+    """
+    now = timezone.now()
+    if user.last_login is not None and now - user.last_login < LAST_LOGIN_INTERVAL:
+        return
+    type(user).objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication con l'utente letto dalla cache condivisa e, per le
+    view con token_user = True, un TokenUser per i metodi sicuri.
+    """
+
+    def authenticate(self, request):
+        view = request.parser_context.get('view') if request.parser_context else None
+        if getattr(view, 'token_user', False) and request.method in SAFE_METHODS:
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_("Token contained no recognizable user identification"))
+            return api_settings.TOKEN_USER_CLASS(validated_token), validated_token
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        """
+        Restituisce l'utente del token dalla cache o, se manca o è di una
+        versione precedente, dal database, salvandolo in cache.
+
+        Raises:
+            InvalidToken: Se il token non contiene l'ID dell'utente
+            AuthenticationFailed: Se l'utente non esiste, non è attivo o ha
+                                  cambiato password (con CHECK_REVOKE_TOKEN)
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = cached_user(user_id)
+        if user is None:
+            # La versione va letta prima della query: una modifica concorrente
+            # la incrementa dopo il commit e rende la voce subito obsoleta
+            version = USER_VERSIONS.get(user_id)
+            user = super().get_user(validated_token)
+            cache_user(user, version)
+            return user
+
+        # In cache ci sono solo utenti attivi: i controlli sono quelli di
+        # JWTAuthentication per il caso di una versione non ancora incrementata
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
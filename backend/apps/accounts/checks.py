@@ -0,0 +1,45 @@
+# backend/apps/accounts/checks.py
+"""
+Controlli di sistema dell'app accounts.
+"""
+
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+from .models import User
+
+# Indici trigram creati dalla migrazione 0002_user_search_indexes
+TRIGRAM_INDEXES = ('user_email_trgm_idx', 'user_first_name_trgm_idx', 'user_last_name_trgm_idx')
+
+
+@register(Tags.database)
+def check_trigram_indexes(app_configs, databases=None, **kwargs):
+    """
+    Su Postgres segnala gli indici trigram degli utenti non creati dalla
+    migrazione perché l'estensione pg_trgm non era disponibile: le ricerche
+    dell'admin funzionano, ma con una scansione sequenziale.
+
+    Eseguito da migrate e da check --database.
+    """
+    warnings = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname = ANY(%s)",
+                [User._meta.db_table, list(TRIGRAM_INDEXES)]
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in TRIGRAM_INDEXES if name not in existing]
+        if missing:
+            warnings.append(
+                Warning(
+                    f"Indici trigram degli utenti mancanti sul database '{alias}': {', '.join(missing)}",
+                    hint="Installare l'estensione pg_trgm e rieseguire la migrazione "
+                         "accounts 0002_user_search_indexes",
+                    id='accounts.W001',
+                )
+            )
+    return warnings
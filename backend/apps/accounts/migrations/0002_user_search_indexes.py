@@ -0,0 +1,58 @@
+# Generated by Django 5.0.2 on 2026-10-17 23:44
+
+from django.db import migrations, models
+
+# Indici trigram sulle espressioni usate da icontains (UPPER(campo)): con
+# pg_trgm le ricerche dell'admin usano gli indici invece di una scansione
+# sequenziale. Esistono solo su Postgres, quindi non compaiono in
+# User.Meta.indexes
+TRIGRAM_INDEXES = (
+    ('user_email_trgm_idx', 'email'),
+    ('user_first_name_trgm_idx', 'first_name'),
+    ('user_last_name_trgm_idx', 'last_name'),
+)
+
+
+def add_trigram_indexes(apps, schema_editor):
+    """
+    Crea l'estensione pg_trgm e gli indici trigram, se il database è
+    Postgres e l'estensione è disponibile. Gli indici mancanti vengono
+    segnalati dal controllo di sistema accounts.W001.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone() is not None
+    if not available:
+        return
+    table = schema_editor.quote_name(apps.get_model('accounts', 'User')._meta.db_table)
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} "
+            f"ON {table} USING gin (UPPER({schema_editor.quote_name(column)}) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_trigram_indexes, drop_trigram_indexes),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ),
+    ]
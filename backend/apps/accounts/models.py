@@ -82,6 +82,14 @@ class User(AbstractUser):
     
     objects = UserManager()  # Collega il manager personalizzato
     
+    class Meta(AbstractUser.Meta):
+        # Indice sulla data di iscrizione per la navigazione per data
+        # dell'admin. Gli indici trigram per le ricerche dell'admin esistono
+        # solo su Postgres e sono creati dalla migrazione 0002
+        indexes = [
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+    
     def __str__(self):
         """
         Restituisce una rappresentazione leggibile dell'utente.
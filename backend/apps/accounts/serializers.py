@@ -4,6 +4,7 @@ from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from .authentication import touch_last_login
 from .models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -19,8 +20,17 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Custom token serializer to include user data in response
     """
+    @classmethod
+    def get_token(cls, user):
+        # Claims used by TokenUser on endpoints with token_user = True
+        token = super().get_token(user)
+        token['is_staff'] = user.is_staff
+        token['department'] = user.department
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
+        touch_last_login(self.user)
         
         # Add user data to response
         user = self.user
@@ -0,0 +1,91 @@
+# backend/apps/accounts/signals.py
+"""
+Segnali dell'app accounts.
+
+Incrementano la versione degli utenti modificati (vedi authentication.py)
+così l'autenticazione non usa più la copia in cache.
+"""
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import USER_VERSIONS
+from .models import User
+
+
+def users_changed(user_ids):
+    """
+    Segnala la modifica di alcuni utenti.
+
+    Le versioni vengono incrementate solo dopo il commit, così nessuna
+    richiesta può salvare in cache, con la nuova versione, dati non ancora
+    visibili.
+
+    Args:
+        user_ids: ID degli utenti modificati
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    def bump():
+        for user_id in user_ids:
+            USER_VERSIONS.bump(user_id)
+
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Invalida l'utente in cache quando cambia il profilo, la password o lo
+    stato; il solo aggiornamento di last_login non lo invalida.
+    """
+    if raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    users_changed([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    users_changed([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida gli utenti di cui cambiano gruppi o permessi diretti, da
+    entrambi i lati della relazione.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        users_changed([instance.pk])
+    elif action == 'pre_clear':
+        users_changed(instance.account_users.values_list('pk', flat=True))
+    else:
+        users_changed(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida i membri dei gruppi di cui cambiano i permessi.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        groups = [instance.pk]
+    elif action == 'pre_clear':
+        groups = instance.group_set.values_list('pk', flat=True)
+    else:
+        groups = pk_set
+    users_changed(User.objects.filter(groups__in=groups).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    users_changed(instance.account_users.values_list('pk', flat=True))
@@ -13,6 +13,8 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.core.conditional import conditional
+
 from .models import User
 from .serializers import UserSerializer, CustomTokenObtainPairSerializer, PasswordResetSerializer, SetPasswordSerializer
 
@@ -29,10 +31,14 @@ class UserProfileView(APIView):
     Gestisce le operazioni relative al profilo dell'utente autenticato.
     Consente di recuperare e aggiornare i dati del profilo utente.
     
-    Richiede autenticazione per tutte le operazioni.
+    Richiede autenticazione per tutte le operazioni. La GET porta un ETag
+    calcolato dai campi del profilo già caricati con l'utente autenticato.
     """
     permission_classes = [permissions.IsAuthenticated]
     
+    @conditional(etag_func=lambda view, request: tuple(
+        getattr(request.user, field) for field in UserSerializer.Meta.fields
+    ))
     def get(self, request):
         """
         Recupera i dati del profilo dell'utente corrente.
@@ -0,0 +1,43 @@
+# backend/apps/core/checks.py
+"""
+Controlli di sistema dell'app core.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backend di cache locali al processo: contatori di versione, dati di
+# riferimento, calendario e utenti in cache non verrebbero condivisi
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Fuori da DEBUG la cache predefinita deve essere condivisa tra i processi.
+
+    È un controllo di deployment (check --deploy): il test runner esegue i
+    controlli con DEBUG disattivato anche in sviluppo, dove la cache locale
+    è quella prevista. In produzione REDIS_URL è comunque obbligatorio
+    (settings/production.py).
+
+    Le invalidazioni (versioni delle risposte condizionali, dati di
+    riferimento, calendario dei giorni lavorativi, utenti autenticati)
+    passano dalla cache: con una cache per processo un worker che non ha
+    visto una modifica continuerebbe a servire dati obsoleti.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f"La cache predefinita ({backend}) non è condivisa tra i processi",
+            hint="Impostare REDIS_URL (o un'altra cache condivisa) in produzione",
+            id='core.E001',
+        )
+    ]
@@ -0,0 +1,195 @@
+# backend/apps/core/conditional.py
+"""
+Risposte condizionali (ETag / Last-Modified) per le viste DRF.
+
+Un client che ripete la stessa GET invia il validatore ricevuto in
+If-None-Match (o la data in If-Modified-Since); se il validatore calcolato
+dalla vista coincide la risposta è un 304 senza corpo, senza eseguire la
+query principale né serializzare i dati.
+
+Il validatore deve essere economico: una versione in cache, un aggregato
+indicizzato o i campi di un oggetto già caricato. Il decoratore conditional
+lo combina con il percorso completo della richiesta e con l'utente
+autenticato, così risposte diverse non condividono mai lo stesso ETag.
+
+Esempio:
+    class LeaveTypeListView(APIView):
+        @conditional(etag_func=lambda view, request: reference_version())
+        def get(self, request):
+            ...
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(request, value):
+    """
+    Calcola un ETag forte a partire da un valore e dalla richiesta.
+
+    Args:
+        request: Richiesta corrente (percorso e utente entrano nel validatore)
+        value: Valore qualsiasi con una repr() stabile
+
+    Returns:
+        str: ETag tra virgolette
+    """
+    user = getattr(request, 'user', None)
+    user_id = getattr(user, 'pk', None)
+    digest = hashlib.sha1(
+        repr((request.get_full_path(), user_id, value)).encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    Verifica le intestazioni condizionali della richiesta.
+
+    Args:
+        request: Richiesta corrente
+        etag: ETag della risorsa (tra virgolette) o None
+        last_modified: Datetime aware dell'ultima modifica o None
+
+    Returns:
+        HttpResponse: 304 se la risorsa non è cambiata, altrimenti None
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        return None
+    if isinstance(response, HttpResponseNotModified):
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """
+    Aggiunge alla risposta i validatori e le intestazioni di cache.
+
+    Le risposte restano private e vanno sempre riconvalidate: il client
+    può riusarle solo dopo un 304.
+
+    Args:
+        response: Risposta da completare
+        etag: ETag della risorsa o None
+        last_modified: Datetime aware dell'ultima modifica o None
+    """
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+
+
+def conditional(etag_func=None, last_modified_func=None):
+    """
+    Decoratore per i metodi GET delle APIView.
+
+    Le funzioni dei validatori ricevono (view, request, *args, **kwargs),
+    vengono chiamate dopo autenticazione e permessi e possono restituire
+    None per disattivare il validatore.
+
+    Args:
+        etag_func: Restituisce un valore da cui derivare l'ETag
+        last_modified_func: Restituisce il datetime aware dell'ultima modifica
+
+    Returns:
+        callable: Decoratore
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            etag = None
+            if etag_func is not None:
+                value = etag_func(view, request, *args, **kwargs)
+                if value is not None:
+                    etag = make_etag(request, value)
+            last_modified = None
+            if last_modified_func is not None:
+                last_modified = last_modified_func(view, request, *args, **kwargs)
+
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+class VersionCounter:
+    """
+    Contatori di versione nella cache condivisa, globali o per ambito
+    (es. per utente), da usare come validatori economici.
+
+    Se la chiave manca (cache svuotata o voce rimossa) viene inizializzata
+    con l'istante corrente in nanosecondi, diverso da ogni valore già
+    restituito: un client non riceve mai un 304 per dati che potrebbero
+    essere cambiati.
+
+    Args:
+        prefix: Prefisso delle chiavi in cache
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def key(self, *scope):
+        return ':'.join([self.prefix, 'version', *(str(part) for part in scope)])
+
+    def get(self, *scope):
+        """
+        Args:
+            *scope: Ambito del contatore (nessuno per il contatore globale)
+
+        Returns:
+            int: Versione corrente
+        """
+        key = self.key(*scope)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def get_many(self, scopes):
+        """
+        Legge più versioni con una sola chiamata alla cache.
+
+        Args:
+            scopes: Tuple di ambito
+
+        Returns:
+            dict: Versione corrente per ambito
+        """
+        keys = {scope: self.key(*scope) for scope in scopes}
+        found = cache.get_many(keys.values())
+        missing = [scope for scope, key in keys.items() if key not in found]
+        if missing:
+            for scope in missing:
+                cache.add(keys[scope], time.time_ns(), timeout=None)
+            found.update(cache.get_many([keys[scope] for scope in missing]))
+        return {scope: found.get(key) for scope, key in keys.items()}
+
+    def bump(self, *scope):
+        """
+        Incrementa la versione di un ambito.
+
+        Args:
+            *scope: Ambito del contatore (nessuno per il contatore globale)
+        """
+        key = self.key(*scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
@@ -0,0 +1,242 @@
+# backend/apps/core/log_agent.py
+"""
+Agente locale di spedizione dei log condiviso dai worker di un host.
+
+Con gunicorn ogni worker ha il proprio SimpleLogHandler e quindi le proprie
+connessioni verso il microservizio di logging. In modalità agente (impostando
+LOGGING_AGENT_SOCKET) i worker scrivono invece i record, già serializzati, su un
+socket Unix datagram locale con scritture non bloccanti. Un unico processo
+agente (python manage.py run_log_agent) li riceve, li raggruppa, li comprime e
+li inoltra a LOGGING_SERVICE_URL su una sola connessione persistente.
+
+Protocollo: ogni datagramma contiene uno o più record NDJSON separati da '\\n'.
+"""
+
+import errno
+import grp
+import os
+import socket
+
+from .log_shipper import LogShipper, OVERFLOW_BLOCK, SENT, RETRY
+
+# Dimensione massima di un datagramma: i batch più grandi vengono spezzati
+MAX_DATAGRAM = 60 * 1024
+
+# Buffer di ricezione richiesto per il socket dell'agente
+RECEIVE_BUFFER = 4 * 1024 * 1024
+
+
+def _pack_datagrams(batch):
+    """
+    Raggruppa i payload in datagrammi NDJSON di al più MAX_DATAGRAM byte.
+
+    Args:
+        batch: Lista di payload serializzati
+
+    Yields:
+        tuple: (datagramma, numero di record contenuti)
+    """
+    chunk, size = [], 0
+    for payload in batch:
+        if chunk and size + len(payload) + 1 > MAX_DATAGRAM:
+            yield b'\n'.join(chunk), len(chunk)
+            chunk, size = [], 0
+        chunk.append(payload)
+        size += len(payload) + 1
+    if chunk:
+        yield b'\n'.join(chunk), len(chunk)
+
+
+class AgentShipper(LogShipper):
+    """
+    LogShipper che consegna i batch all'agente locale invece che via HTTP.
+
+    Il thread worker del processo scrive sul socket Unix in modalità non
+    bloccante: se l'agente non è in esecuzione o il suo buffer è pieno il batch
+    segue lo stesso percorso di un errore di rete (spool su disco e backoff).
+    """
+
+    def __init__(self, socket_path, **kwargs):
+        """
+        Args:
+            socket_path: Percorso del socket Unix dell'agente
+            **kwargs: Parametri di LogShipper (coda, batch, spool, ...)
+        """
+        super().__init__(socket_path, **kwargs)
+        self.socket_path = socket_path
+        self.endpoint = socket_path
+
+    def _get_session(self):
+        """
+        Restituisce il socket datagram non bloccante del worker.
+
+        Returns:
+            socket.socket: Socket Unix non connesso
+        """
+        if self._session is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            self._session = sock
+        return self._session
+
+    def _send_batch(self, batch):
+        """
+        Scrive un batch sul socket dell'agente, spezzandolo in datagrammi.
+
+        Args:
+            batch: Lista di payload serializzati
+
+        Returns:
+            tuple: (esito, record gestiti), come LogShipper._send_batch
+        """
+        sock = self._get_session()
+        handled = 0
+        for datagram, count in _pack_datagrams(batch):
+            try:
+                sock.sendto(datagram, self.socket_path)
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE and count == 1:
+                    # Record singolo più grande del massimo consentito dal kernel
+                    print(f"Log record too large for the log agent socket ({len(datagram)} bytes)")
+                    self.failed += 1
+                    handled += 1
+                    continue
+                # Agente non avviato (ENOENT/ECONNREFUSED) o buffer pieno (EAGAIN)
+                if self._backoff == 0.0:
+                    print(f"Error sending logs to agent at {self.socket_path}: {e}")
+                self._mark_unavailable()
+                return RETRY, handled
+            self.shipped += count
+            handled += count
+        self._mark_available()
+        return SENT, handled
+
+
+class LogAgent:
+    """
+    Processo agente: riceve i record dai worker e li inoltra al microservizio.
+    """
+
+    def __init__(self, socket_path, service_url, spool_dir=None, batch_size=500,
+                 flush_interval=1.0, queue_size=50000, socket_group=None, **kwargs):
+        """
+        Args:
+            socket_path: Percorso del socket Unix su cui ricevere i record
+            socket_group: Gruppo (nome o GID) dei worker autorizzati a scrivere
+                          sul socket; se None il socket è accessibile solo
+                          all'utente dell'agente
+            service_url: URL base del microservizio di logging
+            spool_dir: Directory dello spool dell'agente (None per disabilitarlo)
+            batch_size: Numero massimo di record per richiesta HTTP
+            flush_interval: Secondi massimi di attesa prima di inviare un batch incompleto
+            queue_size: Numero massimo di record in attesa nell'agente
+            **kwargs: Altri parametri di LogShipper
+        """
+        self.socket_path = socket_path
+        self.socket_group = socket_group
+        # Con la politica 'block' un servizio lento rallenta la ricezione:
+        # il buffer del socket si riempie e i worker ripiegano sul loro spool
+        self.shipper = LogShipper(
+            service_url,
+            queue_size=queue_size,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            overflow_policy=OVERFLOW_BLOCK,
+            block_timeout=1.0,
+            spool_dir=spool_dir,
+            encode=bytes,
+            **kwargs
+        )
+        self.received = 0
+        self._sock = None
+        self._running = False
+
+    def bind(self):
+        """
+        Crea il socket di ricezione, rimuovendo un eventuale socket orfano.
+        """
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+        sock.bind(self.socket_path)
+        # Se i worker girano con un utente diverso da quello dell'agente
+        # l'accesso passa dal gruppo condiviso, mai dagli altri utenti
+        if self.socket_group:
+            os.chown(self.socket_path, -1, self._resolve_group(self.socket_group))
+            os.chmod(self.socket_path, 0o660)
+        else:
+            os.chmod(self.socket_path, 0o600)
+        sock.settimeout(0.5)
+        self._sock = sock
+
+    @staticmethod
+    def _resolve_group(group):
+        """
+        Args:
+            group: Nome o GID del gruppo
+
+        Returns:
+            int: GID del gruppo
+
+        Raises:
+            ValueError: Se il gruppo non esiste
+        """
+        if isinstance(group, int) or str(group).isdigit():
+            return int(group)
+        try:
+            return grp.getgrnam(group).gr_gid
+        except KeyError:
+            raise ValueError(f"Gruppo inesistente per il socket dell'agente: {group}")
+
+    def serve_forever(self):
+        """
+        Riceve datagrammi finché non viene chiamato stop().
+        """
+        if self._sock is None:
+            self.bind()
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    datagram = self._sock.recv(MAX_DATAGRAM + 1024)
+                except socket.timeout:
+                    continue
+                except InterruptedError:
+                    continue
+                except OSError as e:
+                    print(f"Error receiving from log agent socket: {e}")
+                    continue
+                for line in datagram.split(b'\n'):
+                    if line:
+                        self.received += 1
+                        self.shipper.enqueue(line)
+        finally:
+            self._shutdown()
+
+    def stop(self):
+        """
+        Chiede l'arresto del ciclo di ricezione (utilizzabile da un signal handler).
+        """
+        self._running = False
+
+    def _shutdown(self):
+        """
+        Invia i record rimasti e rimuove il socket.
+        """
+        self.shipper.close()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,455 @@
+# backend/apps/core/log_async.py
+"""
+Trasporto asincrono dei log per il deployment ASGI.
+
+Sotto un server ASGI (uvicorn, daphne) l'AsyncLogShipper spedisce i batch dal
+loop asyncio del server con un client HTTP asincrono (httpx), senza thread
+dedicati all'I/O:
+
+- i record emessi sul loop (viste async, middleware) vengono accodati in una
+  asyncio.Queue con put_nowait, quindi senza mai sospendere la vista;
+- i record emessi da thread sincroni (viste sync eseguite da sync_to_async)
+  vengono consegnati al loop con call_soon_threadsafe;
+- senza un loop in esecuzione (management command, shell, test) si usa il
+  trasporto a thread ereditato da LogShipper.
+
+Il trasporto a thread fa anche da ripiego: i batch che il loop non riesce a
+consegnare gli vengono passati già serializzati, e lì vengono gestiti spool su
+disco, backoff e replay come nel deployment WSGI.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import time
+
+from .log_shipper import (
+    LogShipper, OVERFLOW_DROP_OLDEST, _FLUSH, SENT, RETRY, REJECTED,
+    RECORDS_BATCHED, BATCH_SIZE, SHIP_DURATION
+)
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    httpx = None
+
+
+def _running_loop():
+    """
+    Returns:
+        asyncio.AbstractEventLoop: Loop in esecuzione nel thread corrente, o None
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class AsyncLogShipper(LogShipper):
+    """
+    LogShipper che invia i batch dal loop asyncio del server ASGI.
+
+    Il loop viene agganciato al primo record emesso al suo interno; da quel
+    momento anche i thread sincroni dello stesso processo vi consegnano i
+    record. Se il loop si ferma, i record non inviati passano al trasporto a
+    thread.
+    """
+
+    def __init__(self, service_url, **kwargs):
+        """
+        Args:
+            service_url: URL base del microservizio di logging
+            **kwargs: Parametri di LogShipper (coda, batch, spool, ...)
+        """
+        super().__init__(service_url, **kwargs)
+        # Il trasporto a thread riceve dal loop payload già serializzati
+        self._encode_record = self._encode
+        self._encode = self._encode_fallback
+
+        self._loop = None
+        self._loop_pid = None
+        self._aqueue = None
+        self._task = None
+        self._client = None
+
+        if httpx is None:
+            print("httpx non installato: AsyncLogShipper usa il trasporto a thread")
+
+    def enqueue(self, item):
+        """
+        Accoda un record senza bloccare il loop né il thread chiamante.
+
+        Con la coda asincrona piena la politica 'block' si comporta come
+        'drop_newest': sul loop non è possibile attendere.
+
+        Args:
+            item: Elemento da inviare
+
+        Returns:
+            bool: True se il record è stato accodato (o consegnato al loop),
+                  False se è stato scartato
+        """
+        if self._closed:
+            return False
+        running = _running_loop()
+        loop = self._bound_loop(running)
+        if loop is None:
+            return super().enqueue(item)
+        if loop is running:
+            return self._put(item)
+        try:
+            loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError:
+            # Loop chiuso nel frattempo
+            return super().enqueue(item)
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Attende l'invio dei record accodati, sia sul loop sia sul thread.
+
+        Chiamato dal thread del loop non può attendere il loop stesso: in quel
+        caso usare `await aflush()`.
+
+        Args:
+            timeout: Secondi massimi di attesa
+
+        Returns:
+            bool: True se lo svuotamento è stato completato entro il timeout
+        """
+        if timeout is None:
+            timeout = self.flush_interval + self.timeout
+        loop = self._live_loop()
+        if loop is not None and loop.is_running() and _running_loop() is not loop:
+            future = asyncio.run_coroutine_threadsafe(self.aflush(), loop)
+            try:
+                future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                return False
+        return super().flush(timeout)
+
+    async def aflush(self):
+        """
+        Attende che il loop abbia gestito i record accodati finora.
+
+        Va chiamato dal loop a cui è agganciato il trasporto.
+        """
+        if self._task is None or self._task.done() or _running_loop() is not self._loop:
+            return
+        done = asyncio.Event()
+        await self._aqueue.put((_FLUSH, done))
+        await done.wait()
+
+    def close(self, timeout=None):
+        """
+        Passa al trasporto a thread i record rimasti sul loop e lo arresta.
+
+        Args:
+            timeout: Secondi massimi di attesa per lo svuotamento finale
+        """
+        if self._closed:
+            return
+        if timeout is None:
+            timeout = self.flush_interval + self.timeout
+        loop = self._live_loop()
+        if loop is not None and loop.is_running() and _running_loop() is not loop:
+            future = asyncio.run_coroutine_threadsafe(self._aclose(), loop)
+            try:
+                future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                pass
+        elif self._aqueue is not None and self._loop_pid == os.getpid():
+            # Loop fermo (es. logging.shutdown all'uscita del processo) o
+            # chiusura richiesta dal loop stesso
+            self._drain_queue()
+        self._loop = None
+        super().close(timeout)
+
+    def queue_depth(self):
+        """
+        Returns:
+            int: Record in attesa sul loop e nella coda del trasporto a thread
+        """
+        depth = super().queue_depth()
+        if self._aqueue is not None and self._loop_pid == os.getpid():
+            depth += self._aqueue.qsize()
+        return depth
+
+    def _bound_loop(self, running):
+        """
+        Restituisce il loop a cui consegnare i record, agganciandolo se serve.
+
+        Args:
+            running: Loop in esecuzione nel thread chiamante, o None
+
+        Returns:
+            asyncio.AbstractEventLoop: Loop agganciato e attivo, o None per
+                                       usare il trasporto a thread
+        """
+        loop = self._live_loop()
+        if loop is not None and loop.is_running():
+            return loop
+        if running is None or httpx is None:
+            return None
+        with self._lock:
+            if self._loop is not running:
+                if self._aqueue is not None and self._loop_pid == os.getpid():
+                    # Record rimasti sul loop precedente, ormai fermo
+                    self._drain_queue()
+                self._loop = running
+                self._loop_pid = os.getpid()
+                self._aqueue = asyncio.Queue(maxsize=self.queue_size)
+                self._client = None
+                self._task = running.create_task(self._run_async(self._aqueue))
+        return running
+
+    def _live_loop(self):
+        """
+        Returns:
+            asyncio.AbstractEventLoop: Loop agganciato in questo processo e non
+                                       ancora chiuso, o None
+        """
+        loop = self._loop
+        if loop is None or self._loop_pid != os.getpid() or loop.is_closed():
+            return None
+        return loop
+
+    def _put(self, item):
+        """
+        Inserisce un record nella coda asincrona; eseguito sul loop.
+
+        Args:
+            item: Elemento da inviare
+
+        Returns:
+            bool: True se il record è stato accodato
+        """
+        q = self._aqueue
+        try:
+            q.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            try:
+                q.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            try:
+                q.put_nowait(item)
+                return True
+            except asyncio.QueueFull:
+                pass
+        self.dropped += 1
+        return False
+
+    async def _run_async(self, q):
+        """
+        Task del loop: raccoglie i record in batch e li invia.
+
+        Stessa logica di batching di LogShipper._run: si invia quando il batch
+        raggiunge batch_size o quando scade flush_interval dal primo record.
+
+        Args:
+            q: Coda asincrona associata a questo task
+        """
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        try:
+            while True:
+                # I record già in coda vengono prelevati senza creare attese
+                try:
+                    item = q.get_nowait()
+                except asyncio.QueueEmpty:
+                    wait = None if deadline is None else max(0.0, deadline - loop.time())
+                    try:
+                        item = await asyncio.wait_for(q.get(), wait)
+                    except asyncio.TimeoutError:
+                        item = None
+
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    pending, batch, deadline = batch, [], None
+                    await self._dispatch_async(pending)
+                    item[1].set()
+                    continue
+
+                if item is not None:
+                    if not batch:
+                        deadline = loop.time() + self.flush_interval
+                    batch.append(item)
+
+                if batch and (len(batch) >= self.batch_size or loop.time() >= deadline):
+                    pending, batch, deadline = batch, [], None
+                    await self._dispatch_async(pending)
+        except asyncio.CancelledError:
+            # Loop in chiusura: il trasporto a thread si occupa del resto
+            self._fallback(batch)
+            self._drain_queue(q)
+            raise
+        finally:
+            if self._client is not None:
+                client, self._client = self._client, None
+                try:
+                    await client.aclose()
+                except Exception:
+                    pass
+
+    async def _dispatch_async(self, items):
+        """
+        Serializza e invia un batch, passando al trasporto a thread ciò che
+        non è stato possibile consegnare.
+
+        La serializzazione avviene nell'executor di default del loop, così il
+        costo CPU di batch grandi non ritarda le richieste in corso.
+
+        Args:
+            items: Elementi accodati dall'applicazione
+        """
+        if not items:
+            return
+        RECORDS_BATCHED.inc(len(items))
+        BATCH_SIZE.observe(len(items))
+        if time.monotonic() < self._retry_at:
+            # Circuito aperto: spool e backoff sono gestiti dal trasporto a thread
+            self._fallback(items)
+            return
+        pending = items
+        try:
+            loop = asyncio.get_running_loop()
+            payloads = await loop.run_in_executor(None, self._encode_batch, items)
+            pending = payloads
+            if payloads:
+                start = time.perf_counter()
+                outcome = await self._send_batch_async(payloads)
+                SHIP_DURATION.labels(outcome).observe(time.perf_counter() - start)
+                if outcome == RETRY:
+                    self._fallback(payloads)
+        except asyncio.CancelledError:
+            self._fallback(pending)
+            raise
+
+    def _encode_batch(self, items):
+        """
+        Serializza un batch scartando i record non serializzabili.
+
+        Args:
+            items: Elementi accodati dall'applicazione
+
+        Returns:
+            list: Payload serializzati
+        """
+        payloads = []
+        for item in items:
+            try:
+                payloads.append(self._encode_record(item))
+            except Exception as e:
+                print(f"Error encoding log record: {e}")
+                self.dropped += 1
+        return payloads
+
+    async def _send_batch_async(self, batch):
+        """
+        Invia un batch all'endpoint bulk con il client HTTP asincrono.
+
+        Args:
+            batch: Lista di payload serializzati
+
+        Returns:
+            str: SENT, RETRY (errore temporaneo) o REJECTED (batch non valido)
+        """
+        body, headers = self._build_request(batch)
+        try:
+            response = await self._get_client().post(self.endpoint, content=body, headers=headers)
+            if response.status_code == 201:
+                self.shipped += len(batch)
+                self._mark_available()
+                return SENT
+            print(f"Failed to send log batch to service. Status: {response.status_code}, Response: {response.text}")
+            if response.status_code < 500:
+                self.failed += len(batch)
+                return REJECTED
+        except httpx.HTTPError as e:
+            print(f"Error sending log batch to service: {e}")
+        except Exception as e:
+            print(f"Unexpected error in async log shipper: {e}")
+        self._mark_unavailable()
+        return RETRY
+
+    def _get_client(self):
+        """
+        Restituisce il client HTTP asincrono del loop, creandolo al primo utilizzo.
+
+        Returns:
+            httpx.AsyncClient: Client con connessioni persistenti
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                )
+            )
+        return self._client
+
+    async def _aclose(self):
+        """
+        Arresta il task del loop e ne attende il passaggio di consegne.
+        """
+        task = self._task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._task = None
+        self._drain_queue()
+
+    def _drain_queue(self, q=None):
+        """
+        Sposta sul trasporto a thread i record ancora nella coda asincrona.
+
+        Va chiamato dal loop o quando il loop non è in esecuzione.
+
+        Args:
+            q: Coda da svuotare (default: quella corrente)
+        """
+        q = q if q is not None else self._aqueue
+        if q is None:
+            return
+        items = []
+        while True:
+            try:
+                item = q.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                item[1].set()
+                continue
+            items.append(item)
+        self._fallback(items)
+
+    def _fallback(self, items):
+        """
+        Consegna record o payload al trasporto a thread.
+
+        Args:
+            items: Elementi accodati o payload già serializzati
+        """
+        for item in items:
+            LogShipper.enqueue(self, item)
+
+    def _encode_fallback(self, item):
+        """
+        Serializzazione del trasporto a thread: i payload arrivati dal loop
+        sono già serializzati.
+
+        Args:
+            item: Elemento accodato o payload serializzato
+
+        Returns:
+            bytes: Record serializzato in JSON (UTF-8)
+        """
+        if isinstance(item, bytes):
+            return item
+        return self._encode_record(item)
@@ -0,0 +1,554 @@
+# backend/apps/core/log_shipper.py
+"""
+Trasporto dei log verso il microservizio di logging.
+
+Questo modulo definisce il LogShipper, una coda limitata in memoria svuotata da
+un unico thread di background per processo. Il thread raggruppa i record in
+batch (per dimensione e per tempo) e li invia all'endpoint bulk del
+microservizio riutilizzando una sessione HTTP con connessioni persistenti.
+
+Se è configurato uno spool su disco (vedi log_spool.py), i batch che non è
+possibile consegnare vengono salvati localmente e rispediti in ordine quando il
+microservizio torna raggiungibile.
+
+Formato di trasmissione: i batch sono inviati come NDJSON (un oggetto JSON per
+riga, Content-Type application/x-ndjson), compressi con gzip se superano
+COMPRESS_MIN_BYTES.
+"""
+
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .log_spool import LogSpool
+from .metrics import Counter, Gauge, Histogram
+
+# Politiche applicabili quando la coda è piena
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_POLICIES = (OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK)
+
+# Marcatori di controllo scambiati con il thread worker
+_FLUSH = object()
+_STOP = object()
+
+# Sotto questa dimensione la compressione costa più di quanto faccia risparmiare
+COMPRESS_MIN_BYTES = 1024
+
+# Esiti di un tentativo di invio
+SENT = 'sent'
+RETRY = 'retry'
+REJECTED = 'rejected'
+
+# Trasporti attivi nel processo, letti al momento della raccolta delle metriche
+_SHIPPERS = weakref.WeakSet()
+
+
+def _sum_shippers(getter):
+    """
+    Somma un valore su tutti i trasporti attivi del processo.
+
+    Args:
+        getter: Funzione che estrae il valore da un LogShipper
+
+    Returns:
+        int: Somma dei valori
+    """
+    return sum(getter(shipper) for shipper in list(_SHIPPERS))
+
+
+# Metriche del trasporto (vedi apps.core.metrics)
+RECORDS_BATCHED = Counter('hrease_log_records_batched_total', 'Record raggruppati in batch per l\'invio')
+RECORDS_SHIPPED = Counter('hrease_log_records_shipped_total', 'Record consegnati al microservizio di logging')
+RECORDS_DROPPED = Counter('hrease_log_records_dropped_total', 'Record scartati (coda piena, spool pieno, errori)')
+RECORDS_FAILED = Counter('hrease_log_records_failed_total', 'Record rifiutati dal microservizio di logging')
+RECORDS_SPOOLED = Counter('hrease_log_records_spooled_total', 'Record salvati nello spool su disco')
+QUEUE_DEPTH = Gauge('hrease_log_queue_depth', 'Record in attesa nella coda in memoria')
+QUEUE_CAPACITY = Gauge('hrease_log_queue_capacity', 'Capacità della coda in memoria')
+SPOOL_RECORDS = Gauge('hrease_log_spool_records', 'Record in attesa nello spool su disco')
+CIRCUIT_OPEN = Gauge('hrease_log_circuit_open', 'Trasporti con il circuit breaker aperto')
+BATCH_SIZE = Histogram(
+    'hrease_log_batch_size', 'Record per batch',
+    buckets=(1, 5, 10, 25, 50, 100, 200, 500, 1000)
+)
+SHIP_DURATION = Histogram(
+    'hrease_log_ship_duration_seconds', 'Durata dell\'invio di un batch', ['outcome']
+)
+
+RECORDS_SHIPPED.set_function(lambda: _sum_shippers(lambda s: s.shipped))
+RECORDS_DROPPED.set_function(lambda: _sum_shippers(lambda s: s.dropped))
+RECORDS_FAILED.set_function(lambda: _sum_shippers(lambda s: s.failed))
+RECORDS_SPOOLED.set_function(lambda: _sum_shippers(lambda s: s.spooled))
+QUEUE_DEPTH.set_function(lambda: _sum_shippers(lambda s: s.queue_depth()))
+QUEUE_CAPACITY.set_function(lambda: _sum_shippers(lambda s: s.queue_size))
+SPOOL_RECORDS.set_function(lambda: _sum_shippers(lambda s: len(s._spool) if s._spool is not None else 0))
+CIRCUIT_OPEN.set_function(lambda: _sum_shippers(lambda s: int(time.monotonic() < s._retry_at)))
+
+
+class LogShipper:
+    """
+    Coda limitata di record di log svuotata da un thread worker dedicato.
+
+    Il thread viene avviato alla prima richiesta di accodamento e ricreato
+    automaticamente nei processi figli dopo un fork (es. worker gunicorn avviati
+    con --preload), così ogni processo ha sempre un solo worker attivo.
+    """
+
+    def __init__(self, service_url, queue_size=10000, batch_size=200,
+                 flush_interval=1.0, overflow_policy=OVERFLOW_DROP_NEWEST,
+                 block_timeout=0.05, timeout=2.0, pool_size=2,
+                 spool_dir=None, spool_size=16 * 1024 * 1024, max_backoff=30.0,
+                 compress=True, encode=None):
+        """
+        Inizializza il trasporto senza avviare il thread worker.
+
+        Args:
+            service_url: URL base del microservizio di logging
+            queue_size: Numero massimo di record in attesa di invio
+            batch_size: Numero massimo di record per richiesta HTTP
+            flush_interval: Secondi massimi di attesa prima di inviare un batch incompleto
+            overflow_policy: Comportamento a coda piena (drop_newest, drop_oldest, block)
+            block_timeout: Secondi di attesa massima con la politica 'block'
+            timeout: Timeout in secondi delle richieste HTTP
+            pool_size: Numero di connessioni mantenute nel pool HTTP
+            spool_dir: Directory dello spool su disco (None o '' per disabilitarlo)
+            spool_size: Dimensione massima in byte dello spool di ogni processo
+            max_backoff: Secondi massimi tra due tentativi quando il servizio è giù
+            compress: Se True i batch più grandi di COMPRESS_MIN_BYTES vengono compressi con gzip
+            encode: Funzione che converte un elemento della coda in una riga JSON
+                    (bytes); eseguita sul thread worker. Default: json.dumps
+
+        Raises:
+            ValueError: Se la politica di overflow non è valida
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy non valida: {overflow_policy!r} "
+                f"(valori ammessi: {', '.join(OVERFLOW_POLICIES)})"
+            )
+        self.endpoint = f"{service_url.rstrip('/')}/api/logs"
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.spool_dir = spool_dir
+        self.spool_size = spool_size
+        self.max_backoff = max_backoff
+        self.compress = compress
+        if encode is not None:
+            self._encode = encode
+
+        # Contatori essenziali, letti solo a scopo diagnostico
+        self.dropped = 0
+        self.shipped = 0
+        self.failed = 0
+        self.spooled = 0
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._session = None
+        self._spool = None
+        self._closed = False
+
+        # Stato del circuit breaker: finché il servizio non risponde i batch
+        # vanno direttamente allo spool, senza attendere il timeout HTTP
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+        _SHIPPERS.add(self)
+
+    def enqueue(self, item):
+        """
+        Accoda un record per l'invio applicando la politica di overflow.
+
+        Non esegue mai I/O di rete sul thread chiamante.
+
+        Args:
+            item: Elemento da inviare (dizionario JSON o quanto accettato da `encode`)
+
+        Returns:
+            bool: True se il record è stato accodato, False se è stato scartato
+        """
+        if self._closed:
+            return False
+        q = self._ensure_worker()
+        try:
+            q.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            try:
+                q.put(item, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                pass
+        elif self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            # Libera un posto scartando il record più vecchio
+            try:
+                q.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+
+        self.dropped += 1
+        return False
+
+    def flush(self, timeout=None):
+        """
+        Attende che tutti i record accodati finora siano stati inviati.
+
+        Args:
+            timeout: Secondi massimi di attesa (default: flush_interval + timeout HTTP)
+
+        Returns:
+            bool: True se lo svuotamento è stato completato entro il timeout
+        """
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return True
+        if timeout is None:
+            timeout = self.flush_interval + self.timeout
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """
+        Invia i record rimasti e arresta il thread worker.
+
+        Args:
+            timeout: Secondi massimi di attesa per lo svuotamento finale
+        """
+        if self._closed:
+            return
+        self._closed = True
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        if timeout is None:
+            timeout = self.flush_interval + self.timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def queue_depth(self):
+        """
+        Returns:
+            int: Record in attesa nella coda del processo corrente
+        """
+        if self._queue is None or self._pid != os.getpid():
+            return 0
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        """
+        Restituisce la coda del processo corrente, avviando il worker se necessario.
+
+        Returns:
+            queue.Queue: Coda associata al thread worker di questo processo
+        """
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return self._queue
+        with self._lock:
+            if self._pid != pid or self._thread is None:
+                # Dopo un fork il thread del processo padre non esiste più:
+                # si riparte con una coda e una sessione nuove
+                self._pid = pid
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._session = None
+                if self._spool is not None:
+                    # Lo spool ereditato resta al processo padre
+                    self._spool.abandon()
+                    self._spool = None
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='log-shipper',
+                    daemon=True
+                )
+                self._thread.start()
+        return self._queue
+
+    def _get_session(self):
+        """
+        Restituisce la sessione HTTP del worker, creandola al primo utilizzo.
+
+        Returns:
+            requests.Session: Sessione con pool di connessioni persistenti
+        """
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.pool_size,
+                max_retries=0
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def _open_spool(self):
+        """
+        Apre lo spool su disco del processo corrente, se configurato.
+        """
+        if not self.spool_dir:
+            return
+        try:
+            self._spool = LogSpool.claim(self.spool_dir, capacity=self.spool_size)
+            if self._spool is None:
+                print(f"No free log spool file in {self.spool_dir}, spooling disabled")
+        except OSError as e:
+            print(f"Error opening log spool in {self.spool_dir}: {e}")
+            self._spool = None
+
+    def _run(self):
+        """
+        Ciclo principale del thread worker.
+
+        Raccoglie i record in un batch finché non si raggiunge batch_size o
+        scade flush_interval dal primo record, poi lo consegna. Tra un batch e
+        l'altro rispedisce gli eventuali record presenti nello spool.
+        """
+        self._open_spool()
+        q = self._queue
+        batch = []
+        deadline = None
+
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._spool is not None and len(self._spool):
+                # Con record nello spool il worker si risveglia per rispedirli
+                retry_in = max(0.0, self._retry_at - time.monotonic())
+                wait = retry_in if wait is None else min(wait, retry_in)
+            try:
+                item = q.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._dispatch(batch)
+                break
+
+            if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                self._dispatch(batch)
+                batch, deadline = [], None
+                item[1].set()
+                continue
+
+            if item is not None:
+                try:
+                    payload = self._encode(item)
+                except Exception as e:
+                    # Un record non serializzabile non deve fermare il worker
+                    print(f"Error encoding log record: {e}")
+                    self.dropped += 1
+                    payload = None
+                if payload is not None:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(payload)
+
+            dispatched = False
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._dispatch(batch)
+                batch, deadline = [], None
+                dispatched = True
+
+            if item is None or dispatched:
+                self._replay_spool()
+
+        if self._session is not None:
+            self._session.close()
+        if self._spool is not None:
+            self._spool.close()
+
+    def _encode(self, item):
+        """
+        Serializza un record nel payload JSON salvato nello spool e inviato.
+
+        Args:
+            item: Dizionario del record
+
+        Returns:
+            bytes: Record serializzato in JSON (UTF-8)
+        """
+        return json.dumps(item, default=str).encode('utf-8')
+
+    def _dispatch(self, batch):
+        """
+        Consegna un batch al microservizio o, se non è possibile, allo spool.
+
+        Finché nello spool ci sono record più vecchi, anche i nuovi batch vi
+        vengono accodati per preservare l'ordine di invio.
+
+        Args:
+            batch: Lista di payload serializzati
+        """
+        if not batch:
+            return
+        RECORDS_BATCHED.inc(len(batch))
+        BATCH_SIZE.observe(len(batch))
+        if self._spool is not None and len(self._spool):
+            self._spool_batch(batch)
+            return
+        if time.monotonic() < self._retry_at:
+            # Servizio giù: nessun tentativo di rete, il batch non rallenta il worker
+            if self._spool is not None:
+                self._spool_batch(batch)
+            else:
+                self.dropped += len(batch)
+            return
+        outcome, handled = self._timed_send(batch)
+        if outcome == RETRY:
+            # Solo i record non ancora consegnati finiscono nello spool
+            remaining = batch[handled:]
+            if self._spool is not None:
+                self._spool_batch(remaining)
+            else:
+                self.dropped += len(remaining)
+
+    def _spool_batch(self, batch):
+        """
+        Salva un batch nello spool su disco.
+
+        Args:
+            batch: Lista di payload serializzati
+        """
+        before = self._spool.overwritten
+        rejected = self._spool.append(batch)
+        self.spooled += len(batch) - rejected
+        self.dropped += rejected + (self._spool.overwritten - before)
+
+    def _replay_spool(self):
+        """
+        Rispedisce i record dello spool, in batch, se il servizio è disponibile.
+
+        Il replay dura al massimo flush_interval secondi per volta, così i nuovi
+        record continuano a essere prelevati dalla coda in memoria.
+        """
+        if self._spool is None:
+            return
+        budget_end = time.monotonic() + self.flush_interval
+        while len(self._spool) and time.monotonic() >= self._retry_at:
+            batch = self._spool.peek(self.batch_size)
+            outcome, handled = self._timed_send(batch)
+            # Anche i batch rifiutati dal servizio vengono rimossi: non
+            # sarebbero mai accettati e bloccherebbero lo spool
+            self._spool.consume(handled)
+            if outcome == RETRY:
+                return
+            if time.monotonic() >= budget_end:
+                return
+
+    def _timed_send(self, batch):
+        """
+        Invia un batch registrandone la durata per esito.
+
+        Args:
+            batch: Lista di payload serializzati
+
+        Returns:
+            tuple: (esito, record gestiti), come _send_batch
+        """
+        start = time.perf_counter()
+        outcome, handled = self._send_batch(batch)
+        SHIP_DURATION.labels(outcome).observe(time.perf_counter() - start)
+        return outcome, handled
+
+    def _build_request(self, batch):
+        """
+        Prepara corpo e header della richiesta bulk per un batch.
+
+        Args:
+            batch: Lista di payload serializzati
+
+        Returns:
+            tuple: (corpo NDJSON eventualmente compresso, header HTTP)
+        """
+        body = b'\n'.join(batch) + b'\n'
+        headers = {'Content-Type': 'application/x-ndjson'}
+        if self.compress and len(body) >= COMPRESS_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    def _send_batch(self, batch):
+        """
+        Invia un batch di record all'endpoint bulk del microservizio.
+
+        Aggiorna lo stato del circuit breaker: dopo un errore di rete o una
+        risposta 5xx i tentativi successivi vengono rimandati con un backoff
+        esponenziale fino a max_backoff secondi.
+
+        Args:
+            batch: Lista di payload serializzati
+
+        Returns:
+            tuple: (esito, record gestiti). L'esito è SENT, RETRY (errore
+                   temporaneo) o REJECTED (batch non valido); i record gestiti
+                   sono quelli consegnati o rifiutati prima di un eventuale
+                   errore temporaneo e non vanno rispediti.
+        """
+        body, headers = self._build_request(batch)
+        try:
+            response = self._get_session().post(
+                self.endpoint,
+                data=body,
+                headers=headers,
+                timeout=self.timeout
+            )
+            if response.status_code == 201:
+                self.shipped += len(batch)
+                self._mark_available()
+                return SENT, len(batch)
+            print(f"Failed to send log batch to service. Status: {response.status_code}, Response: {response.text}")
+            if response.status_code < 500:
+                self.failed += len(batch)
+                return REJECTED, len(batch)
+        except requests.RequestException as e:
+            # Ignora errori di rete per evitare che problemi nel servizio di logging
+            # causino problemi nell'applicazione principale
+            print(f"Error sending log batch to service: {e}")
+        except Exception as e:
+            print(f"Unexpected error in log shipper: {e}")
+        self._mark_unavailable()
+        return RETRY, 0
+
+    def _mark_available(self):
+        """
+        Chiude il circuit breaker dopo un invio riuscito.
+        """
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    def _mark_unavailable(self):
+        """
+        Apre il circuit breaker raddoppiando l'attesa prima del prossimo tentativo.
+        """
+        self._backoff = min(max(self._backoff * 2, 0.5), self.max_backoff)
+        self._retry_at = time.monotonic() + self._backoff
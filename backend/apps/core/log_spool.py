@@ -0,0 +1,261 @@
+# backend/apps/core/log_spool.py
+"""
+Spool su disco per i log non ancora consegnati al microservizio di logging.
+
+Lo spool è un buffer circolare append-only mappato in memoria (mmap) con una
+dimensione massima fissa. Quando il microservizio non è raggiungibile i record
+vengono scritti qui e poi rispediti, nello stesso ordine, appena il servizio
+torna disponibile. A spool pieno vengono sovrascritti i record più vecchi.
+
+Formato del file:
+    [header di HEADER_SIZE byte][area dati di `capacity` byte]
+    Ogni record nell'area dati è: lunghezza (uint32 little endian) + payload.
+    Una lunghezza pari a WRAP_MARKER indica che il record successivo si trova
+    all'inizio dell'area dati.
+"""
+
+import errno
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b'HRSP'
+VERSION = 1
+
+# magic, versione, capacity, head, tail, numero di record
+_HEADER = struct.Struct('<4sIQQQQ')
+HEADER_SIZE = 64
+_LENGTH = struct.Struct('<I')
+WRAP_MARKER = 0xFFFFFFFF
+
+# Numero massimo di file di spool per directory (uno per processo worker)
+MAX_SPOOL_FILES = 64
+
+
+class LogSpool:
+    """
+    Buffer circolare persistente di payload binari.
+
+    Tutte le operazioni sono protette da un lock e aggiornano l'header dopo
+    aver scritto i dati, così un crash del processo lascia il file coerente
+    (al più si perde l'ultimo batch in scrittura).
+    """
+
+    def __init__(self, fd, path, capacity):
+        """
+        Inizializza lo spool su un file già aperto e bloccato.
+
+        Usare LogSpool.claim() per ottenere un'istanza.
+
+        Args:
+            fd: File descriptor aperto in lettura/scrittura con lock esclusivo
+            path: Percorso del file di spool
+            capacity: Dimensione in byte dell'area dati
+        """
+        self.fd = fd
+        self.path = path
+        self.capacity = capacity
+        # Record sovrascritti perché lo spool era pieno
+        self.overwritten = 0
+        self._lock = threading.Lock()
+
+        size = HEADER_SIZE + capacity
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+        self._mm = mmap.mmap(fd, size)
+
+        magic, version, stored_capacity, head, tail, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or stored_capacity != capacity:
+            # File nuovo, corrotto o creato con una dimensione diversa: si riparte da vuoto
+            head = tail = count = 0
+        self._head, self._tail, self._count = head, tail, count
+        self._write_header()
+
+    @classmethod
+    def claim(cls, directory, prefix='backend', capacity=16 * 1024 * 1024):
+        """
+        Apre il primo file di spool della directory non in uso da un altro processo.
+
+        Ogni processo ottiene un file dedicato tramite un lock esclusivo (flock).
+        Un processo riavviato riprende il file lasciato da un worker terminato e
+        ne rispedisce i record ancora pendenti.
+
+        Args:
+            directory: Directory in cui risiedono i file di spool
+            prefix: Prefisso del nome dei file
+            capacity: Dimensione in byte dell'area dati
+
+        Returns:
+            LogSpool: Spool pronto all'uso, o None se non è disponibile alcun file
+        """
+        os.makedirs(directory, exist_ok=True)
+        for index in range(MAX_SPOOL_FILES):
+            path = os.path.join(directory, f"{prefix}-{index}.spool")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                os.close(fd)
+                if e.errno in (errno.EAGAIN, errno.EACCES, errno.EWOULDBLOCK):
+                    continue
+                raise
+            return cls(fd, path, capacity)
+        return None
+
+    def __len__(self):
+        """
+        Returns:
+            int: Numero di record presenti nello spool
+        """
+        return self._count
+
+    def append(self, payloads):
+        """
+        Aggiunge dei payload in coda, sovrascrivendo i più vecchi se necessario.
+
+        Args:
+            payloads: Lista di payload (bytes) da salvare
+
+        Returns:
+            int: Numero di payload scartati perché più grandi dell'intero spool
+        """
+        rejected = 0
+        with self._lock:
+            for payload in payloads:
+                size = _LENGTH.size + len(payload)
+                if size > self.capacity - _LENGTH.size:
+                    rejected += 1
+                    continue
+                offset = self._reserve(size)
+                _LENGTH.pack_into(self._mm, HEADER_SIZE + offset, len(payload))
+                start = HEADER_SIZE + offset + _LENGTH.size
+                self._mm[start:start + len(payload)] = payload
+                self._tail = offset + size
+                self._count += 1
+            self._write_header()
+        return rejected
+
+    def peek(self, limit):
+        """
+        Legge i record più vecchi senza rimuoverli.
+
+        Args:
+            limit: Numero massimo di record da leggere
+
+        Returns:
+            list: Payload (bytes) in ordine di inserimento
+        """
+        payloads = []
+        with self._lock:
+            position = self._head
+            for _ in range(min(limit, self._count)):
+                position, length = self._read_length(position)
+                start = HEADER_SIZE + position + _LENGTH.size
+                payloads.append(bytes(self._mm[start:start + length]))
+                position += _LENGTH.size + length
+        return payloads
+
+    def consume(self, count):
+        """
+        Rimuove i record più vecchi, tipicamente dopo un invio riuscito.
+
+        Args:
+            count: Numero di record da rimuovere
+        """
+        with self._lock:
+            for _ in range(min(count, self._count)):
+                self._drop_oldest()
+            self._write_header()
+
+    def close(self):
+        """
+        Sincronizza lo spool su disco e rilascia il file.
+        """
+        with self._lock:
+            if self._mm is None:
+                return
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+            os.close(self.fd)
+
+    def abandon(self):
+        """
+        Rilascia le risorse ereditate da un fork senza toccare il file.
+
+        Il lock resta al processo padre, che continua a usare lo spool.
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            os.close(self.fd)
+
+    def _reserve(self, size):
+        """
+        Trova lo spazio per un record, liberando i record più vecchi se serve.
+
+        Args:
+            size: Byte necessari (lunghezza + payload)
+
+        Returns:
+            int: Offset nell'area dati in cui scrivere il record
+        """
+        while True:
+            if self._count == 0:
+                self._head = self._tail = 0
+                return 0
+            if self._tail > self._head:
+                # Dati contigui tra head e tail: spazio libero in fondo e all'inizio
+                if self.capacity - self._tail >= size:
+                    return self._tail
+                if self._head >= size:
+                    if self.capacity - self._tail >= _LENGTH.size:
+                        _LENGTH.pack_into(self._mm, HEADER_SIZE + self._tail, WRAP_MARKER)
+                    return 0
+            elif self._head - self._tail >= size:
+                # Dati avvolti: spazio libero solo tra tail e head
+                return self._tail
+            self._drop_oldest()
+            self.overwritten += 1
+
+    def _read_length(self, position):
+        """
+        Legge la lunghezza del record in una posizione, seguendo i wrap.
+
+        Args:
+            position: Offset nell'area dati
+
+        Returns:
+            tuple: (offset effettivo del record, lunghezza del payload)
+        """
+        if self.capacity - position < _LENGTH.size:
+            position = 0
+        (length,) = _LENGTH.unpack_from(self._mm, HEADER_SIZE + position)
+        if length == WRAP_MARKER:
+            position = 0
+            (length,) = _LENGTH.unpack_from(self._mm, HEADER_SIZE + position)
+        return position, length
+
+    def _drop_oldest(self):
+        """
+        Rimuove il record in testa senza aggiornare l'header.
+        """
+        position, length = self._read_length(self._head)
+        self._head = position + _LENGTH.size + length
+        self._count -= 1
+        if self._count == 0:
+            self._head = self._tail = 0
+        else:
+            # Se il prossimo record è all'inizio dell'area dati, head punta lì
+            self._head, _ = self._read_length(self._head)
+
+    def _write_header(self):
+        """
+        Scrive l'header con le posizioni correnti.
+        """
+        _HEADER.pack_into(
+            self._mm, 0,
+            MAGIC, VERSION, self.capacity, self._head, self._tail, self._count
+        )
@@ -0,0 +1,327 @@
+# backend/apps/core/log_storm.py
+"""
+Protezione dalle "tempeste" di log per SimpleLogHandler.
+
+Quando qualcosa si rompe lo stesso errore può essere emesso migliaia di volte
+al minuto. LogStormGuard decide, per ogni record, se inoltrarlo al microservizio
+applicando nell'ordine:
+
+1. campionamento probabilistico per livello (tipicamente DEBUG/INFO)
+2. deduplicazione: i record identici (modulo, riga, template del messaggio)
+   in una finestra temporale vengono collassati in un unico record di
+   riepilogo con il numero di occorrenze
+3. rate limit a token bucket per logger e per livello
+
+La configurazione arriva dal dizionario LOGGING (chiave 'storm_protection'
+dell'handler), ad esempio:
+
+    'storm_protection': {
+        'sampling': {'DEBUG': 0.1, 'INFO': 0.5},
+        'rate_limits': {'ERROR': {'rate': 10, 'burst': 50}},
+        'logger_rate_limits': {'django.request': {'rate': 20, 'burst': 40}},
+        'dedup_window': 10,
+    }
+"""
+
+import logging
+import random
+import threading
+import time
+import weakref
+
+from .metrics import Counter
+
+# Meta restituiti per i record che non richiedono informazioni aggiuntive
+NO_META = {}
+
+# Protezioni attive nel processo, lette al momento della raccolta delle metriche
+_GUARDS = weakref.WeakSet()
+
+RECORDS_FILTERED = Counter(
+    'hrease_log_records_filtered_total',
+    'Record non inoltrati dalla protezione dalle tempeste di log',
+    ['reason']
+)
+RECORDS_FILTERED.set_function(lambda: {
+    (reason,): sum(getattr(guard, reason) for guard in list(_GUARDS))
+    for reason in ('sampled_out', 'deduplicated', 'rate_limited')
+})
+
+
+class TokenBucket:
+    """
+    Token bucket classico: `rate` token al secondo, al massimo `burst` accumulati.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'rejected')
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: Token aggiunti al secondo
+            burst: Capacità massima del bucket (default: pari a rate)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        # Record rifiutati dall'ultimo record accettato
+        self.rejected = 0
+
+    def refill(self, now):
+        """
+        Aggiunge i token maturati dall'ultimo aggiornamento.
+
+        Args:
+            now: Istante corrente (time.monotonic())
+        """
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+
+# Attributi del primo record di una finestra conservati per il riepilogo
+SUMMARY_ATTRS = (
+    'name', 'levelno', 'levelname', 'pathname', 'filename', 'module', 'lineno',
+    'funcName', 'created', 'msecs', 'relativeCreated', 'process', 'processName',
+    'thread', 'threadName',
+)
+
+
+class _DedupEntry:
+    """
+    Stato di deduplicazione per una chiave (modulo, riga, template).
+
+    Del primo record conserva solo il messaggio già formattato e gli
+    attributi elencati in SUMMARY_ATTRS, non il LogRecord con i suoi
+    argomenti e l'eventuale traceback.
+    """
+
+    __slots__ = ('data', 'first_seen', 'count')
+
+    def __init__(self, record, first_seen):
+        data = {attr: getattr(record, attr, None) for attr in SUMMARY_ATTRS}
+        data['msg'] = record.getMessage()
+        data['args'] = None
+        self.data = data
+        self.first_seen = first_seen
+        self.count = 1
+
+    def summary(self, dedup_window):
+        """
+        Args:
+            dedup_window: Durata della finestra di deduplicazione in secondi
+
+        Returns:
+            tuple: Coppia (attributi del record, meta di riepilogo)
+        """
+        return self.data, {
+            'occurrences': self.count,
+            'dedup_window': dedup_window,
+        }
+
+
+class LogStormGuard:
+    """
+    Applica campionamento, deduplicazione e rate limit ai record di log.
+
+    Tutti i metodi sono thread-safe.
+    """
+
+    def __init__(self, sampling=None, rate_limits=None, logger_rate_limits=None,
+                 dedup_window=0, dedup_max_keys=1000):
+        """
+        Args:
+            sampling: Dizionario livello -> frazione di record da inoltrare (0-1)
+            rate_limits: Dizionario livello -> {'rate', 'burst'}, applicato
+                         separatamente a ogni logger
+            logger_rate_limits: Dizionario prefisso logger -> {'rate', 'burst'},
+                                condiviso da tutti i livelli del sottoalbero
+            dedup_window: Finestra di deduplicazione in secondi (0 per disabilitarla)
+            dedup_max_keys: Numero massimo di chiavi tracciate contemporaneamente
+        """
+        self.sampling = {
+            logging.getLevelName(level.upper()) if isinstance(level, str) else level: float(rate)
+            for level, rate in (sampling or {}).items()
+        }
+        self.rate_limits = {
+            logging.getLevelName(level.upper()) if isinstance(level, str) else level: limit
+            for level, limit in (rate_limits or {}).items()
+        }
+        # Prefissi ordinati dal più specifico al più generico
+        self.logger_rate_limits = sorted(
+            (logger_rate_limits or {}).items(),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self.dedup_window = float(dedup_window or 0)
+        self.dedup_max_keys = dedup_max_keys
+
+        # Contatori diagnostici
+        self.sampled_out = 0
+        self.deduplicated = 0
+        self.rate_limited = 0
+
+        self._lock = threading.Lock()
+        self._level_buckets = {}
+        self._logger_buckets = {}
+        self._logger_prefix_cache = {}
+        self._dedup = {}
+        # Riepiloghi di finestre sostituite prima di essere raccolte
+        self._pending_summaries = []
+        self._next_expiry = None
+
+        _GUARDS.add(self)
+
+    @property
+    def enabled(self):
+        """
+        Returns:
+            bool: True se almeno una protezione è configurata
+        """
+        return bool(self.sampling or self.rate_limits or self.logger_rate_limits or self.dedup_window)
+
+    def check(self, record):
+        """
+        Decide se un record deve essere inoltrato.
+
+        Args:
+            record: LogRecord da valutare
+
+        Returns:
+            dict: Meta aggiuntivi da allegare al record (NO_META se nessuno),
+                  oppure None se il record deve essere scartato
+        """
+        meta = NO_META
+
+        rate = self.sampling.get(record.levelno)
+        if rate is not None and rate < 1.0:
+            if random.random() >= rate:
+                self.sampled_out += 1
+                return None
+            meta = {'sample_rate': rate}
+
+        with self._lock:
+            now = time.monotonic()
+
+            if self.dedup_window:
+                key = (record.module, record.lineno, record.msg if isinstance(record.msg, str) else repr(record.msg))
+                entry = self._dedup.get(key)
+                if entry is not None and now - entry.first_seen < self.dedup_window:
+                    entry.count += 1
+                    self.deduplicated += 1
+                    return None
+                if entry is None and len(self._dedup) < self.dedup_max_keys:
+                    self._dedup[key] = _DedupEntry(record, now)
+                    if self._next_expiry is None:
+                        self._next_expiry = now + self.dedup_window
+                elif entry is not None:
+                    # Finestra scaduta ma riepilogo non ancora raccolto: il
+                    # riepilogo viene messo da parte e la finestra riparte da qui
+                    if entry.count > 1:
+                        self._pending_summaries.append(entry.summary(self.dedup_window))
+                    self._dedup[key] = _DedupEntry(record, now)
+
+            buckets = self._buckets_for(record)
+            if buckets:
+                for bucket in buckets:
+                    bucket.refill(now)
+                if any(bucket.tokens < 1.0 for bucket in buckets):
+                    for bucket in buckets:
+                        bucket.rejected += 1
+                    self.rate_limited += 1
+                    return None
+                suppressed = 0
+                for bucket in buckets:
+                    bucket.tokens -= 1.0
+                    suppressed = max(suppressed, bucket.rejected)
+                    bucket.rejected = 0
+                if suppressed:
+                    meta = dict(meta, rate_limited_before=suppressed)
+
+        return meta
+
+    def collect_summaries(self, force=False):
+        """
+        Raccoglie i riepiloghi delle finestre di deduplicazione scadute.
+
+        Il controllo è quasi gratuito finché nessuna finestra è scaduta, quindi
+        può essere chiamato a ogni record.
+
+        Args:
+            force: Se True raccoglie anche le finestre non ancora scadute
+                   (usato in chiusura dell'handler)
+
+        Returns:
+            list: Coppie (attributi del primo record, meta di riepilogo) per
+                  le chiavi con più di un'occorrenza; gli attributi sono
+                  utilizzabili con logging.makeLogRecord
+        """
+        if not self.dedup_window:
+            return []
+        now = time.monotonic()
+        if (not force and not self._pending_summaries
+                and (self._next_expiry is None or now < self._next_expiry)):
+            return []
+
+        with self._lock:
+            summaries, self._pending_summaries = self._pending_summaries, []
+            next_expiry = None
+            for key, entry in list(self._dedup.items()):
+                expires = entry.first_seen + self.dedup_window
+                if force or now >= expires:
+                    del self._dedup[key]
+                    if entry.count > 1:
+                        summaries.append(entry.summary(self.dedup_window))
+                elif next_expiry is None or expires < next_expiry:
+                    next_expiry = expires
+            self._next_expiry = next_expiry
+        return summaries
+
+    def _buckets_for(self, record):
+        """
+        Restituisce i token bucket applicabili a un record, creandoli se serve.
+
+        Args:
+            record: LogRecord da valutare
+
+        Returns:
+            list: Bucket per (logger, livello) e per prefisso di logger
+        """
+        buckets = []
+        limit = self.rate_limits.get(record.levelno)
+        if limit is not None:
+            key = (record.name, record.levelno)
+            bucket = self._level_buckets.get(key)
+            if bucket is None:
+                bucket = self._level_buckets[key] = TokenBucket(limit['rate'], limit.get('burst'))
+            buckets.append(bucket)
+
+        if self.logger_rate_limits:
+            prefix = self._logger_prefix_cache.get(record.name, False)
+            if prefix is False:
+                prefix = self._match_logger_prefix(record.name)
+                self._logger_prefix_cache[record.name] = prefix
+            if prefix is not None:
+                bucket = self._logger_buckets.get(prefix)
+                if bucket is None:
+                    limit = dict(self.logger_rate_limits)[prefix]
+                    bucket = self._logger_buckets[prefix] = TokenBucket(limit['rate'], limit.get('burst'))
+                buckets.append(bucket)
+        return buckets
+
+    def _match_logger_prefix(self, name):
+        """
+        Trova il prefisso configurato più specifico per un nome di logger.
+
+        Args:
+            name: Nome del logger (es. 'django.request')
+
+        Returns:
+            str: Prefisso configurato, o None se nessuno corrisponde
+        """
+        for prefix, _ in self.logger_rate_limits:
+            if name == prefix or name.startswith(prefix + '.'):
+                return prefix
+        return None
@@ -6,135 +6,320 @@ Questo modulo definisce un handler che può essere usato con il sistema di loggi
 standard di Python/Django per inviare log al microservizio di logging centralizzato.
 """
 
-import logging
-import requests
-import threading
 import json
-from datetime import datetime
+import logging
+from datetime import datetime, timezone
 from django.conf import settings
 
+from .log_agent import AgentShipper
+from .log_async import AsyncLogShipper
+from .log_shipper import LogShipper, OVERFLOW_DROP_NEWEST
+from .log_storm import LogStormGuard
+from .metrics import Counter
+from .request_context import request_id_var
+
+# Attributi standard di un LogRecord: tutto il resto è un dato "extra".
+# 'message' e 'asctime' vengono aggiunti dal Formatter durante la formattazione.
+RESERVED_ATTRS = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+# Mappa i livelli di log di Django a quelli del microservizio
+LEVEL_MAP = {
+    'DEBUG': 'debug',
+    'INFO': 'info',
+    'WARNING': 'warn',
+    'ERROR': 'error',
+    'CRITICAL': 'critical'
+}
+
+RECORDS_EMITTED = Counter(
+    'hrease_log_records_emitted_total',
+    'Record ricevuti dall\'handler del microservizio di logging',
+    ['level']
+)
+
+# Tipi di argomenti che possono essere formattati in seguito, su un altro thread,
+# senza rischiare che il loro valore cambi nel frattempo
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None), bytes)
+
+
 class SimpleLogHandler(logging.Handler):
     """
     Handler di logging che invia log al microservizio di logging via HTTP.
-    
-    Invia i log in modo asincrono tramite thread separati per evitare di
-    bloccare l'applicazione principale durante l'invio.
+
+    I record vengono accodati in una coda limitata in memoria e inviati in batch
+    da un unico thread di background per processo (vedi LogShipper), così il
+    thread chiamante non esegue mai I/O di rete.
+
+    Sul thread chiamante viene solo fotografato lo stato del record: la
+    formattazione del messaggio e la serializzazione JSON avvengono sul thread
+    di invio.
     """
-    
-    def __init__(self, *args, **kwargs):
+
+    def __init__(self, queue_size=10000, batch_size=200, flush_interval=1.0,
+                 overflow_policy=OVERFLOW_DROP_NEWEST, timeout=2.0,
+                 spool_dir=None, spool_size=16 * 1024 * 1024, storm_protection=None,
+                 compress=True, agent_socket=None, *args, **kwargs):
         """
         Inizializza l'handler con le configurazioni dal settings.py.
-        
+
+        I parametri del trasporto possono essere impostati direttamente nella
+        definizione dell'handler nel dizionario LOGGING.
+
         Args:
+            queue_size: Numero massimo di record in attesa di invio
+            batch_size: Numero massimo di record per richiesta HTTP
+            flush_interval: Secondi massimi di attesa prima di inviare un batch incompleto
+            overflow_policy: Comportamento a coda piena (drop_newest, drop_oldest, block)
+            timeout: Timeout in secondi delle richieste HTTP
+            spool_dir: Directory dello spool su disco per i log non consegnati
+                       (None o '' per disabilitarlo)
+            spool_size: Dimensione massima in byte dello spool di ogni processo
+            storm_protection: Configurazione di campionamento, deduplicazione e
+                              rate limit (vedi LogStormGuard)
+            compress: Se True i batch vengono inviati come NDJSON compresso gzip
+            agent_socket: Percorso del socket Unix dell'agente locale (run_log_agent);
+                          se impostato i record vengono consegnati all'agente
+                          invece che direttamente al microservizio
             *args: Argomenti posizionali per la classe base Handler
             **kwargs: Argomenti keyword per la classe base Handler
         """
         super().__init__(*args, **kwargs)
         # Ottieni l'URL del servizio di logging dalle impostazioni
         self.service_url = getattr(settings, 'LOGGING_SERVICE_URL', 'http://logging-service:8080')
+        shipper_options = {
+            'queue_size': queue_size,
+            'batch_size': batch_size,
+            'flush_interval': flush_interval,
+            'overflow_policy': overflow_policy,
+            'timeout': timeout,
+            'spool_dir': spool_dir,
+            'spool_size': spool_size,
+            'compress': compress,
+            'encode': self.encode,
+        }
+        self.shipper = self.create_shipper(agent_socket, shipper_options)
+        self.storm_guard = LogStormGuard(**(storm_protection or {}))
         # Stampa l'URL del servizio per aiutare nella configurazione
-        print(f"SimpleLogHandler initialized with service URL: {self.service_url}")
-    
+        if agent_socket:
+            print(f"SimpleLogHandler initialized with log agent socket: {agent_socket}")
+        else:
+            print(f"SimpleLogHandler initialized with service URL: {self.service_url}")
+
+    def create_shipper(self, agent_socket, options):
+        """
+        Crea il trasporto usato dall'handler.
+
+        Args:
+            agent_socket: Percorso del socket dell'agente locale, o None
+            options: Parametri comuni del trasporto (coda, batch, spool, ...)
+
+        Returns:
+            LogShipper: Trasporto verso l'agente o verso il microservizio
+        """
+        if agent_socket:
+            # Modalità agente: un solo processo per host parla con il microservizio
+            return AgentShipper(agent_socket, **options)
+        return LogShipper(self.service_url, **options)
+
     def emit(self, record):
         """
         Invia un record di log al microservizio.
-        
-        Si occupa di formattare il record, preparare i dati e
-        avviare un thread separato per l'invio asincrono.
-        
+
+        Applica la protezione dalle tempeste di log, fotografa il record e lo
+        accoda per l'invio in batch da parte del thread di background.
+
         Args:
             record: LogRecord da inviare
         """
         try:
 
-            # Ignora i log generati dal modulo requests o urllib3 per evitare loop
-            if record.name.startswith(('requests', 'urllib3')):
+            # Ignora i log dei client HTTP usati per l'invio per evitare loop
+            if record.name.startswith(('requests', 'urllib3', 'httpx', 'httpcore')):
                 return
-                
+
             # Ignora i log generati all'interno del SimpleLogHandler stesso
             if record.module == 'logging' or record.module == self.__class__.__module__:
                 return
-            
-            # Formatta il messaggio di log usando il formatter configurato
-            log_entry = self.format(record)
-            
-            # Mappa i livelli di log di Django a quelli del microservizio
-            level_map = {
-                'DEBUG': 'debug',
-                'INFO': 'info',
-                'WARNING': 'warn',
-                'ERROR': 'error',
-                'CRITICAL': 'critical'
-            }
-            
-            # Usa il mapping o il livello di default 'info'
-            level = level_map.get(record.levelname, 'info').lower()
-            
-            # Estrai eventuali dati extra dal record
-            extra_data = {}
-            for key, value in record.__dict__.items():
-                if key not in logging.LogRecord('', 0, '', 0, '', (), None).__dict__:
-                    # Tenta di serializzare in JSON, altrimenti usa str()
-                    try:
-                        if isinstance(value, (dict, list, tuple, str, int, float, bool, type(None))):
-                            extra_data[key] = value
-                        else:
-                            extra_data[key] = str(value)
-                    except Exception:
-                        extra_data[key] = str(value)
-            
-            # Prepara i dati per l'invio
-            log_data = {
-                'source': 'backend',
-                'level': level,
-                'message': log_entry,
-                'timestamp': datetime.utcnow().isoformat(),
-                'meta': {
-                    'module': record.module,
-                    'function': record.funcName,
-                    'line': record.lineno,
-                    'process_id': record.process,
-                    'thread_id': record.thread,
-                    **extra_data  # Includi tutti i dati extra dal record
-                }
-            }
-            
-            # Invia in modo asincrono per non bloccare l'applicazione
-            threading.Thread(
-                target=self._send_log,
-                args=(log_data,),
-                daemon=True
-            ).start()
-            
+
+            RECORDS_EMITTED.labels(LEVEL_MAP.get(record.levelname, 'info')).inc()
+
+            extra_meta = None
+            if self.storm_guard.enabled:
+                # Inoltra i riepiloghi delle finestre di deduplicazione scadute
+                for summary in self.storm_guard.collect_summaries():
+                    self.shipper.enqueue(summary)
+
+                # Campionamento, deduplicazione e rate limit
+                extra_meta = self.storm_guard.check(record)
+                if extra_meta is None:
+                    return
+
+            # Accoda per l'invio in batch senza bloccare l'applicazione
+            self.shipper.enqueue((self.snapshot(record), extra_meta))
+
         except Exception as e:
             # In caso di errore, usa il metodo handleError della classe base
             print(f"Error in SimpleLogHandler.emit: {e}")
             self.handleError(record)
-    
-    def _send_log(self, log_data):
+
+    def snapshot(self, record):
         """
-        Invia effettivamente il log al microservizio.
-        
-        Metodo destinato a essere eseguito in un thread separato.
-        
+        Fotografa lo stato di un record per formattarlo in un secondo momento.
+
+        È l'unico lavoro svolto sul thread chiamante: una copia superficiale
+        degli attributi del record, a cui si aggiunge l'ID della richiesta in
+        corso (che sul thread di invio non sarebbe più visibile). Il messaggio viene formattato subito solo se
+        gli argomenti sono oggetti mutabili, e le eccezioni vengono convertite in
+        testo perché il traceback non sopravvive al thread chiamante.
+
         Args:
-            log_data: Dati del log da inviare
+            record: LogRecord da fotografare
+
+        Returns:
+            dict: Attributi del record, utilizzabili con logging.makeLogRecord
+        """
+        data = record.__dict__.copy()
+        # ID di correlazione della richiesta in corso (RequestContextMiddleware)
+        if 'request_id' not in data:
+            # I log di django.request vengono emessi dopo l'uscita dal
+            # middleware, ma portano con sé la richiesta
+            request_id = request_id_var.get() or getattr(data.get('request'), 'request_id', None)
+            if request_id is not None:
+                data['request_id'] = request_id
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(type(arg) in _IMMUTABLE_ARG_TYPES for arg in args)):
+            data['msg'] = record.getMessage()
+            data['args'] = None
+        if record.exc_info:
+            if not record.exc_text:
+                formatter = self.formatter or logging._defaultFormatter
+                data['exc_text'] = formatter.formatException(record.exc_info)
+            data['exc_info'] = None
+        return data
+
+    def build_log_data(self, data, extra_meta=None):
+        """
+        Prepara il dizionario inviato al microservizio a partire da una fotografia.
+
+        Viene eseguito sul thread di invio.
+
+        Args:
+            data: Attributi del record restituiti da snapshot()
+            extra_meta: Meta aggiuntivi (es. numero di occorrenze deduplicate)
+
+        Returns:
+            dict: Dati del log nel formato atteso dal microservizio
+        """
+        record = logging.makeLogRecord(data)
+
+        # Formatta il messaggio di log usando il formatter configurato
+        log_entry = self.format(record)
+
+        # Usa il mapping o il livello di default 'info'
+        level = LEVEL_MAP.get(record.levelname, 'info')
+
+        # Prepara i dati per l'invio
+        meta = {
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'process_id': record.process,
+            'thread_id': record.thread,
+        }
+        # Includi tutti i dati extra dal record
+        for key in data.keys() - RESERVED_ATTRS:
+            meta[key] = data[key]
+
+        log_data = {
+            'source': 'backend',
+            'level': level,
+            'message': log_entry,
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat(),
+            'meta': meta
+        }
+
+        if extra_meta:
+            meta.update(extra_meta)
+            if 'occurrences' in extra_meta:
+                # Riepilogo di deduplicazione: rendi visibile il conteggio anche nella dashboard
+                log_data['message'] = (
+                    f"{log_entry} [ripetuto {extra_meta['occurrences']} volte "
+                    f"in {extra_meta['dedup_window']:g}s]"
+                )
+        return log_data
+
+    def encode(self, item):
+        """
+        Serializza un elemento della coda in una riga JSON.
+
+        Usato dal LogShipper sul thread di invio; i valori extra non
+        serializzabili in JSON vengono convertiti con str().
+
+        Args:
+            item: Coppia (fotografia del record, meta aggiuntivi)
+
+        Returns:
+            bytes: Record serializzato in JSON (UTF-8), senza a capo
+        """
+        data, extra_meta = item
+        return json.dumps(self.build_log_data(data, extra_meta), default=str).encode('utf-8')
+
+    def flush(self):
+        """
+        Attende l'invio dei record già accodati.
+        """
+        self.shipper.flush()
+
+    def _flush_summaries(self):
+        """
+        Accoda i riepiloghi di deduplicazione ancora aperti.
+        """
+        for summary in self.storm_guard.collect_summaries(force=True):
+            self.shipper.enqueue(summary)
+
+    def close(self):
+        """
+        Invia i record rimasti e arresta il thread di background.
+
+        Viene chiamato da logging.shutdown() all'uscita del processo.
         """
         try:
-            # Timeout breve per evitare blocchi
-            response = requests.post(
-                f"{self.service_url}/api/logs",
-                json=log_data,
-                timeout=1
-            )
-            
-            # Log di debug (stampato solo nella console)
-            if response.status_code != 201:
-                print(f"Failed to send log to service. Status: {response.status_code}, Response: {response.text}")
-                
-        except requests.RequestException as e:
-            # Ignora errori di rete per evitare che problemi nel servizio di logging
-            # causino problemi nell'applicazione principale
-            print(f"Error sending log to service: {e}")
-        except Exception as e:
-            print(f"Unexpected error in log handler: {e}")
+            self._flush_summaries()
+            self.shipper.close()
+        finally:
+            super().close()
+
+
+class AsyncLogHandler(SimpleLogHandler):
+    """
+    Variante di SimpleLogHandler per il deployment ASGI.
+
+    I record vengono spediti dal loop asyncio del server con un client HTTP
+    asincrono (vedi AsyncLogShipper); fuori dal loop, ad esempio nei
+    management command, si comporta come SimpleLogHandler.
+    """
+
+    def create_shipper(self, agent_socket, options):
+        """
+        Crea il trasporto asincrono, salvo in modalità agente.
+
+        La scrittura sul socket dell'agente è già non bloccante e avviene sul
+        thread di invio, quindi in modalità agente non serve il loop.
+
+        Args:
+            agent_socket: Percorso del socket dell'agente locale, o None
+            options: Parametri comuni del trasporto (coda, batch, spool, ...)
+
+        Returns:
+            LogShipper: Trasporto verso l'agente o AsyncLogShipper
+        """
+        if agent_socket:
+            return super().create_shipper(agent_socket, options)
+        return AsyncLogShipper(self.service_url, **options)
+
+    async def aflush(self):
+        """
+        Attende, dal loop, l'invio dei record accodati.
+        """
+        if isinstance(self.shipper, AsyncLogShipper):
+            await self.shipper.aflush()
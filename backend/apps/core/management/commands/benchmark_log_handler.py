@@ -0,0 +1,155 @@
+# backend/apps/core/management/commands/benchmark_log_handler.py
+"""
+Microbenchmark del costo per chiamata di SimpleLogHandler.emit.
+
+Confronta il percorso originale (formattazione, mappa dei livelli ricostruita e
+un LogRecord usa e getta per ogni attributo, tutto sul thread chiamante) con il
+percorso attuale, in cui il thread chiamante fotografa solo il record e la
+formattazione/serializzazione avviene sul thread di invio.
+
+Non esegue I/O di rete: l'accodamento viene sostituito da una lista in memoria.
+
+Esempio:
+    python manage.py benchmark_log_handler --iterations 50000
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from apps.core.logging import SimpleLogHandler
+
+
+def legacy_build_log_data(handler, record):
+    """
+    Riproduce la preparazione del record eseguita da emit prima del LogShipper.
+
+    Mantenuta qui solo come termine di paragone per il benchmark.
+
+    Args:
+        handler: Handler usato per la formattazione
+        record: LogRecord da preparare
+
+    Returns:
+        dict: Dati del log nel formato del microservizio
+    """
+    log_entry = handler.format(record)
+    level_map = {
+        'DEBUG': 'debug',
+        'INFO': 'info',
+        'WARNING': 'warn',
+        'ERROR': 'error',
+        'CRITICAL': 'critical'
+    }
+    level = level_map.get(record.levelname, 'info').lower()
+    extra_data = {}
+    for key, value in record.__dict__.items():
+        if key not in logging.LogRecord('', 0, '', 0, '', (), None).__dict__:
+            try:
+                if isinstance(value, (dict, list, tuple, str, int, float, bool, type(None))):
+                    extra_data[key] = value
+                else:
+                    extra_data[key] = str(value)
+            except Exception:
+                extra_data[key] = str(value)
+    return {
+        'source': 'backend',
+        'level': level,
+        'message': log_entry,
+        'timestamp': datetime.utcnow().isoformat(),
+        'meta': {
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'process_id': record.process,
+            'thread_id': record.thread,
+            **extra_data
+        }
+    }
+
+
+class Command(BaseCommand):
+    help = 'Misura il costo per chiamata di SimpleLogHandler.emit (prima/dopo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000,
+                            help='Numero di record per ogni misura')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Ripetizioni di ogni misura (si riporta la migliore)')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        repeat = options['repeat']
+
+        handler = SimpleLogHandler(spool_dir=None)
+        handler.setFormatter(logging.Formatter(
+            '{levelname} {asctime} {module} {process:d} {thread:d} {message}', style='{'
+        ))
+        # Nessun invio reale: gli elementi accodati finiscono in una lista
+        queued = []
+        handler.shipper.enqueue = queued.append
+
+        records = [
+            logging.LogRecord('apps.benchmark', logging.INFO, __file__, 42,
+                              'Richiesta %s completata in %d ms', (f'/api/v1/items/{i}/', i % 250), None)
+            for i in range(iterations)
+        ]
+        for record in records:
+            record.test_id = 'bench'
+            record.endpoint = 'benchmark'
+
+        def legacy_emit():
+            for record in records:
+                queued.append(legacy_build_log_data(handler, record))
+
+        def fast_emit():
+            for record in records:
+                handler.emit(record)
+
+        def ship_encode():
+            for item in queued:
+                handler.encode(item)
+
+        results = [
+            ('emit originale (thread chiamante)', self._measure(legacy_emit, queued, repeat)),
+            ('emit attuale (thread chiamante)', self._measure(fast_emit, queued, repeat, keep=True)),
+        ]
+        # La serializzazione viene misurata sugli elementi accodati dall'ultimo fast_emit
+        results.append(('encode attuale (thread di invio)', self._measure(ship_encode, None, repeat)))
+
+        self.stdout.write(f"Record per misura: {iterations}, ripetizioni: {repeat}")
+        for label, seconds in results:
+            per_call = seconds / iterations * 1e6
+            self.stdout.write(f"  {label:<40} {per_call:8.2f} µs/record")
+
+        legacy, fast = results[0][1], results[1][1]
+        self.stdout.write(self.style.SUCCESS(
+            f"Costo sul thread chiamante ridotto di {legacy / fast:.1f}x"
+        ))
+
+    def _measure(self, func, queued, repeat, keep=False):
+        """
+        Esegue una funzione più volte e restituisce il tempo migliore.
+
+        Args:
+            func: Funzione da misurare
+            queued: Lista da svuotare prima di ogni esecuzione (o None)
+            repeat: Numero di ripetizioni
+            keep: Se True lascia nella lista gli elementi dell'ultima esecuzione
+
+        Returns:
+            float: Durata minima in secondi
+        """
+        best = None
+        for _ in range(repeat):
+            if queued is not None:
+                queued.clear()
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if queued is not None and not keep:
+            queued.clear()
+        return best
@@ -0,0 +1,70 @@
+# backend/apps/core/management/commands/run_log_agent.py
+"""
+Avvia l'agente locale di spedizione dei log (vedi apps.core.log_agent).
+
+Va eseguito una volta per host, accanto ai worker gunicorn, che devono avere
+LOGGING_AGENT_SOCKET impostato sullo stesso percorso. Se i worker girano con un
+utente diverso da quello dell'agente, entrambi devono appartenere al gruppo
+indicato in LOGGING_AGENT_SOCKET_GROUP. Esempio:
+
+    LOGGING_AGENT_SOCKET=/run/hrease/log-agent.sock LOGGING_AGENT_SOCKET_GROUP=hrease \
+        python manage.py run_log_agent
+"""
+
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.log_agent import LogAgent
+
+
+class Command(BaseCommand):
+    help = "Avvia l'agente locale che inoltra al microservizio i log di tutti i worker dell'host"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None,
+                            help='Percorso del socket Unix (default: LOGGING_AGENT_SOCKET)')
+        parser.add_argument('--socket-group', default=None,
+                            help='Gruppo autorizzato a scrivere sul socket (default: LOGGING_AGENT_SOCKET_GROUP)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Numero massimo di record per richiesta HTTP')
+        parser.add_argument('--flush-interval', type=float, default=1.0,
+                            help='Secondi massimi di attesa prima di inviare un batch incompleto')
+        parser.add_argument('--spool-dir', default=None,
+                            help="Directory dello spool dell'agente (default: LOGGING_SPOOL_DIR/agent)")
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or settings.LOGGING_AGENT_SOCKET
+        if not socket_path:
+            raise CommandError('Specificare --socket o impostare LOGGING_AGENT_SOCKET')
+
+        spool_dir = options['spool_dir']
+        if spool_dir is None and settings.LOGGING_SPOOL_DIR:
+            spool_dir = os.path.join(settings.LOGGING_SPOOL_DIR, 'agent')
+
+        agent = LogAgent(
+            socket_path,
+            settings.LOGGING_SERVICE_URL,
+            spool_dir=spool_dir,
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+            socket_group=options['socket_group'] or settings.LOGGING_AGENT_SOCKET_GROUP or None
+        )
+
+        def stop(signum, frame):
+            agent.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        try:
+            agent.bind()
+        except (ValueError, PermissionError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Log agent listening on {socket_path}, forwarding to {settings.LOGGING_SERVICE_URL}"
+        )
+        agent.serve_forever()
+        self.stdout.write(f"Log agent stopped ({agent.received} records received)")
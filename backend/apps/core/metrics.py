@@ -0,0 +1,353 @@
+# backend/apps/core/metrics.py
+"""
+Metriche di processo esposte in formato testo Prometheus.
+
+Primitive minime (Counter, Gauge, Histogram) senza dipendenze esterne,
+registrate in un registro globale (REGISTRY) che l'endpoint interno delle
+metriche (apps.core.views.metrics) rende nel formato di esposizione testuale
+di Prometheus.
+
+I valori sono per processo: con più worker gunicorn ogni worker espone i
+propri, distinti dall'etichetta 'pid'.
+
+Esempio:
+    RECORDS = Counter('hrease_records_total', 'Record elaborati', ['level'])
+    RECORDS.labels(level='info').inc()
+
+Le metriche il cui valore è già mantenuto altrove possono leggerlo al momento
+della raccolta con set_function(), senza costi sul percorso critico.
+"""
+
+import math
+import os
+import threading
+
+# Bucket di default degli istogrammi di durata (secondi)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    """
+    Formatta un valore numerico secondo il formato di esposizione Prometheus.
+
+    Args:
+        value: Numero da formattare
+
+    Returns:
+        str: Rappresentazione testuale
+    """
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    """
+    Applica l'escape previsto per i valori delle etichette.
+
+    Args:
+        value: Valore dell'etichetta
+
+    Returns:
+        str: Valore con backslash, virgolette e a capo protetti
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    Raccolta delle metriche del processo.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Registra una metrica.
+
+        Args:
+            metric: Metrica da registrare
+
+        Raises:
+            ValueError: Se esiste già una metrica con lo stesso nome
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metrica già registrata: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        """
+        Rende tutte le metriche nel formato di esposizione testuale di Prometheus.
+
+        Returns:
+            str: Testo da servire con Content-Type CONTENT_TYPE
+        """
+        pid = str(os.getpid())
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                labels = dict(labels, pid=pid)
+                rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{metric.name}{suffix}{{{rendered}}} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Content-Type del formato di esposizione testuale
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    """
+    Base comune: nome, descrizione, etichette e figli per valori di etichetta.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        """
+        Args:
+            name: Nome della metrica (snake_case, con prefisso dell'applicazione)
+            documentation: Descrizione mostrata nella riga HELP
+            labelnames: Nomi delle etichette
+            registry: Registro in cui pubblicare la metrica (None per nessuno)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._function = None
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values, **kwargs):
+        """
+        Restituisce il figlio associato a una combinazione di etichette.
+
+        Args:
+            *values: Valori delle etichette, nell'ordine di labelnames
+            **kwargs: In alternativa, valori delle etichette per nome
+
+        Returns:
+            Figlio della metrica (con inc/set/observe)
+
+        Raises:
+            ValueError: Se le etichette non corrispondono a labelnames
+        """
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: attese le etichette {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def set_function(self, function):
+        """
+        Legge il valore della metrica al momento della raccolta.
+
+        Args:
+            function: Callable senza argomenti che restituisce un numero, o un
+                      dizionario {tupla di valori delle etichette: numero}
+        """
+        self._function = function
+
+    def samples(self):
+        """
+        Restituisce i campioni correnti della metrica.
+
+        Returns:
+            list: Terne (suffisso del nome, etichette, valore)
+        """
+        if self._function is not None:
+            value = self._function()
+            if isinstance(value, dict):
+                return [
+                    ('', dict(zip(self.labelnames, key)), val)
+                    for key, val in value.items()
+                ]
+            return [('', {}, value)]
+        samples = []
+        for values, child in list(self._children.items()):
+            samples.extend(child.samples(dict(zip(self.labelnames, values))))
+        return samples
+
+    def _new_child(self):
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        Incrementa il contatore.
+
+        Args:
+            amount: Incremento (non negativo)
+        """
+        with self._lock:
+            self.value += amount
+
+    def samples(self, labels):
+        return [('', labels, self.value)]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        """
+        Decrementa il valore.
+
+        Args:
+            amount: Decremento
+        """
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        """
+        Imposta il valore.
+
+        Args:
+            value: Nuovo valore
+        """
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        Registra un'osservazione.
+
+        Args:
+            value: Valore osservato
+        """
+        with self._lock:
+            self.sum += value
+            for index, bound in enumerate(self.upper_bounds):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+
+    def samples(self, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds, counts):
+            cumulative += count
+            samples.append(('_bucket', dict(labels, le=_format_value(bound)), cumulative))
+        samples.append(('_count', labels, cumulative))
+        samples.append(('_sum', labels, total))
+        return samples
+
+
+class Counter(_Metric):
+    """
+    Valore monotono crescente (azzerato solo al riavvio del processo).
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1):
+        """
+        Incrementa una metrica senza etichette.
+
+        Args:
+            amount: Incremento (non negativo)
+        """
+        self._children[()].inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    """
+    Valore istantaneo che può salire e scendere.
+    """
+
+    type = 'gauge'
+
+    def set(self, value):
+        """
+        Imposta il valore di una metrica senza etichette.
+
+        Args:
+            value: Nuovo valore
+        """
+        self._children[()].set(value)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    """
+    Distribuzione di valori in bucket cumulativi, con conteggio e somma.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        """
+        Args:
+            name: Nome della metrica
+            documentation: Descrizione mostrata nella riga HELP
+            labelnames: Nomi delle etichette
+            buckets: Limiti superiori dei bucket, in ordine crescente
+            registry: Registro in cui pubblicare la metrica
+        """
+        bounds = tuple(sorted(float(bound) for bound in buckets))
+        if not bounds or bounds[-1] != math.inf:
+            bounds += (math.inf,)
+        self.upper_bounds = bounds
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value):
+        """
+        Registra un'osservazione su una metrica senza etichette.
+
+        Args:
+            value: Valore osservato
+        """
+        self._children[()].observe(value)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
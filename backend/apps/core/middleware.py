@@ -0,0 +1,187 @@
+# backend/apps/core/middleware.py
+"""
+Middleware di correlazione e misura delle richieste.
+
+RequestContextMiddleware:
+- accetta l'header X-Request-ID inviato dal frontend (o ne genera uno) e lo
+  rende disponibile nel contesto, così ogni record inviato da SimpleLogHandler
+  lo riporta in meta.request_id;
+- restituisce lo stesso ID nell'header X-Request-ID della risposta;
+- misura durata totale, tempo di database e numero di query, li registra
+  nelle metriche per endpoint e, oltre SLOW_REQUEST_THRESHOLD_MS, emette un
+  record strutturato di richiesta lenta.
+"""
+
+import logging
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import Counter, Histogram
+from .request_context import RequestStats, request_id_var, request_stats_var
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# ID accettati dal client: niente spazi o caratteri di controllo, lunghezza limitata
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+REQUEST_DURATION = Histogram(
+    'hrease_http_request_duration_seconds', 'Durata delle richieste HTTP',
+    ['method', 'route', 'status']
+)
+REQUEST_DB_DURATION = Histogram(
+    'hrease_http_request_db_duration_seconds', 'Tempo di database per richiesta HTTP',
+    ['method', 'route']
+)
+REQUEST_DB_QUERIES = Counter(
+    'hrease_http_request_db_queries_total', 'Query eseguite dalle richieste HTTP',
+    ['method', 'route']
+)
+SLOW_REQUESTS = Counter(
+    'hrease_http_slow_requests_total', 'Richieste oltre SLOW_REQUEST_THRESHOLD_MS',
+    ['method', 'route']
+)
+
+
+def _query_timer(execute, sql, params, many, context):
+    """
+    Execute wrapper che misura le query della richiesta corrente.
+
+    Viene installato una volta per connessione e legge le statistiche dal
+    contesto, così funziona anche quando le query girano nei thread di
+    sync_to_async.
+    """
+    stats = request_stats_var.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.db_queries += 1
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """
+    Aggiunge _query_timer a ogni nuova connessione al database.
+    """
+    if _query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_timer)
+
+
+class RequestContextMiddleware:
+    """
+    Imposta l'ID di correlazione e misura ogni richiesta (WSGI e ASGI).
+
+    Va inserito in cima a MIDDLEWARE per includere nei tempi anche gli altri
+    middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 1000) / 1000.0
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        tokens, stats, start = self._start(request)
+        try:
+            response = self.get_response(request)
+            self._finish(request, response, stats, start)
+        finally:
+            self._reset(tokens)
+        return response
+
+    async def __acall__(self, request):
+        tokens, stats, start = self._start(request)
+        try:
+            response = await self.get_response(request)
+            self._finish(request, response, stats, start)
+        finally:
+            self._reset(tokens)
+        return response
+
+    def _start(self, request):
+        """
+        Imposta ID di correlazione e statistiche nel contesto della richiesta.
+
+        Args:
+            request: HttpRequest corrente
+
+        Returns:
+            tuple: (token delle variabili di contesto, RequestStats, istante di inizio)
+        """
+        request_id = request.headers.get(REQUEST_ID_HEADER)
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        stats = RequestStats()
+        tokens = (request_id_var.set(request_id), request_stats_var.set(stats))
+        return tokens, stats, time.perf_counter()
+
+    def _finish(self, request, response, stats, start):
+        """
+        Registra le metriche della richiesta e segnala le richieste lente.
+
+        Args:
+            request: HttpRequest corrente
+            response: HttpResponse restituita dalla vista
+            stats: RequestStats della richiesta
+            start: Istante di inizio (time.perf_counter())
+        """
+        duration = time.perf_counter() - start
+        response[REQUEST_ID_HEADER] = request.request_id
+
+        # Il pattern dell'URL (non il path) tiene bassa la cardinalità delle etichette
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        method = request.method
+
+        REQUEST_DURATION.labels(method, route, response.status_code).observe(duration)
+        REQUEST_DB_DURATION.labels(method, route).observe(stats.db_time)
+        if stats.db_queries:
+            REQUEST_DB_QUERIES.labels(method, route).inc(stats.db_queries)
+
+        if duration >= self.threshold:
+            SLOW_REQUESTS.labels(method, route).inc()
+            logger.warning(
+                "Slow request: %s %s %d in %.0f ms (%d queries, %.0f ms db)",
+                method, request.path, response.status_code, duration * 1000,
+                stats.db_queries, stats.db_time * 1000,
+                extra={
+                    'method': method,
+                    'path': request.path,
+                    'route': route,
+                    'view': match.view_name if match is not None else None,
+                    'status_code': response.status_code,
+                    'duration_ms': round(duration * 1000, 1),
+                    'db_time_ms': round(stats.db_time * 1000, 1),
+                    'db_queries': stats.db_queries,
+                }
+            )
+
+    def _reset(self, tokens):
+        """
+        Ripristina le variabili di contesto precedenti alla richiesta.
+
+        Args:
+            tokens: Token restituiti da ContextVar.set
+        """
+        request_id_token, stats_token = tokens
+        request_stats_var.reset(stats_token)
+        request_id_var.reset(request_id_token)
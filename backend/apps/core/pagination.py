@@ -0,0 +1,202 @@
+# backend/apps/core/pagination.py
+"""
+Paginazione keyset (a cursore) per le API di elenco.
+
+Invece di OFFSET, ogni pagina riparte dall'ultima chiave restituita: la query
+diventa "chiave successiva a X ORDER BY chiave LIMIT n", risolta da un indice
+composto sulle colonne della chiave con un costo che non dipende dalla
+posizione della pagina né dalla dimensione della tabella.
+
+Il cursore è opaco per il client: contiene i valori della chiave dell'ultima
+riga, codificati in JSON e base64.
+
+Per le liste che mostrano il numero totale di righe (es. l'admin) il
+paginatore EstimatedCountPaginator usa la stima del planner di Postgres al
+posto di COUNT(*) quando le righe sono molte.
+"""
+
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sotto questa stima il conteggio viene eseguito in modo esatto
+EXACT_COUNT_THRESHOLD = 10000
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder che mantiene i microsecondi degli orari: un cursore
+    troncato al millisecondo ripeterebbe le righe successive nello stesso
+    millisecondo.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return super().default(o)
+
+
+class InvalidCursor(ValueError):
+    """
+    Cursore o dimensione di pagina non validi.
+    """
+
+
+class KeysetPaginator:
+    """
+    Pagina un QuerySet su una chiave composta e univoca.
+
+    Args:
+        fields: Campi della chiave, l'ultimo deve essere univoco (es. 'id')
+        descending: Se True le pagine vanno dalla chiave più alta alla più bassa
+    """
+
+    def __init__(self, fields, descending=False):
+        self.fields = tuple(fields)
+        self.descending = descending
+
+    def encode_cursor(self, obj):
+        """
+        Args:
+            obj: Ultima istanza della pagina
+
+        Returns:
+            str: Cursore della pagina successiva
+        """
+        values = [getattr(obj, field) for field in self.fields]
+        raw = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, model, cursor):
+        """
+        Args:
+            model: Modello paginato (per convertire i valori della chiave)
+            cursor: Cursore ricevuto dal client
+
+        Returns:
+            list: Valori della chiave
+
+        Raises:
+            InvalidCursor: Se il cursore non è valido
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError(cursor)
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidCursor("Cursore non valido")
+
+    def after(self, values):
+        """
+        Costruisce il filtro "chiave successiva a values".
+
+        Oltre alla disgiunzione sulle colonne della chiave aggiunge un
+        confronto non stretto sulla prima colonna, che il planner può usare
+        come condizione d'indice.
+
+        Args:
+            values: Valori della chiave dell'ultima riga restituita
+
+        Returns:
+            Q: Filtro per la pagina successiva
+        """
+        strict = 'lt' if self.descending else 'gt'
+        loose = 'lte' if self.descending else 'gte'
+        condition = Q()
+        for position in range(len(self.fields)):
+            equal = {field: value for field, value in zip(self.fields[:position], values)}
+            equal[f"{self.fields[position]}__{strict}"] = values[position]
+            condition |= Q(**equal)
+        return Q(**{f"{self.fields[0]}__{loose}": values[0]}) & condition
+
+    def paginate(self, queryset, cursor=None, page_size=None):
+        """
+        Restituisce una pagina del QuerySet.
+
+        Args:
+            queryset: QuerySet da paginare (senza ordinamento)
+            cursor: Cursore ricevuto dal client (None per la prima pagina)
+            page_size: Numero di elementi per pagina
+
+        Returns:
+            tuple: (lista di istanze, cursore della pagina successiva o None)
+
+        Raises:
+            InvalidCursor: Se il cursore o la dimensione di pagina non sono validi
+        """
+        try:
+            page_size = int(page_size) if page_size not in (None, '') else DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            raise InvalidCursor("Dimensione di pagina non valida")
+        if page_size < 1:
+            raise InvalidCursor("Dimensione di pagina non valida")
+        page_size = min(page_size, MAX_PAGE_SIZE)
+
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(queryset.model, cursor)))
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(*(prefix + field for field in self.fields))
+
+        # Una riga in più indica se esiste una pagina successiva
+        rows = list(queryset[:page_size + 1])
+        next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size], next_cursor
+
+
+def estimated_count(queryset):
+    """
+    Stima il numero di righe di un QuerySet con EXPLAIN, senza eseguirlo.
+
+    Args:
+        queryset: QuerySet da stimare
+
+    Returns:
+        int: Righe stimate dal planner, o None se il database non è Postgres
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginatore che conta le righe con la stima del planner quando sono più
+    di EXACT_COUNT_THRESHOLD.
+
+    Con milioni di righe un COUNT(*) esatto a ogni pagina costa quanto una
+    scansione dell'intera tabella (o di tutte le righe filtrate); la stima
+    costa una pianificazione. Il totale mostrato è quindi approssimato e
+    l'ultima pagina può risultare vuota o incompleta.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = None
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
@@ -0,0 +1,37 @@
+# backend/apps/core/request_context.py
+"""
+Contesto della richiesta HTTP corrente.
+
+Le variabili di contesto vengono impostate da RequestContextMiddleware e sono
+visibili sia nel codice sincrono sia in quello asincrono (asgiref propaga il
+contesto nei thread di sync_to_async). Il modulo non dipende da Django, così
+può essere importato anche dall'handler di logging durante la configurazione.
+"""
+
+from contextvars import ContextVar
+
+# ID di correlazione della richiesta corrente (header X-Request-ID)
+request_id_var = ContextVar('request_id', default=None)
+
+# Statistiche della richiesta corrente (RequestStats), None fuori da una richiesta
+request_stats_var = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Tempi e numero di query accumulati durante una richiesta.
+    """
+
+    __slots__ = ('db_queries', 'db_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+
+def get_request_id():
+    """
+    Returns:
+        str: ID di correlazione della richiesta corrente, o None
+    """
+    return request_id_var.get()
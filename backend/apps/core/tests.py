@@ -1,3 +1,169 @@
-from django.test import TestCase
+# backend/apps/core/tests.py
+"""
+Test dell'app core: spool su disco dei log, protezione dalle tempeste di
+log e paginazione keyset.
+"""
 
-# Create your tests here.
+import logging
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from .log_spool import LogSpool
+from .log_storm import LogStormGuard
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+class LogSpoolTests(SimpleTestCase):
+    """
+    Buffer circolare persistente dei log non consegnati.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def claim(self, capacity=64):
+        spool = LogSpool.claim(self.directory, capacity=capacity)
+        self.addCleanup(spool.close)
+        return spool
+
+    def test_peek_and_consume_keep_insertion_order(self):
+        spool = self.claim()
+        spool.append([b'uno', b'due', b'tre'])
+
+        self.assertEqual(spool.peek(2), [b'uno', b'due'])
+        # peek non rimuove i record
+        self.assertEqual(len(spool), 3)
+
+        spool.consume(2)
+        self.assertEqual(spool.peek(10), [b'tre'])
+        spool.consume(5)
+        self.assertEqual(len(spool), 0)
+        self.assertEqual(spool.peek(10), [])
+
+    def test_wrap_around(self):
+        # Record da 14 byte (4 di lunghezza + 10 di payload) in 64 byte
+        spool = self.claim()
+        spool.append([b'a' * 10, b'b' * 10, b'c' * 10, b'd' * 10])
+        spool.consume(2)
+        # Non c'è spazio in fondo all'area dati: il record riparte dall'inizio
+        spool.append([b'e' * 10, b'f' * 10])
+
+        self.assertEqual(spool.overwritten, 0)
+        self.assertEqual(spool.peek(10), [b'c' * 10, b'd' * 10, b'e' * 10, b'f' * 10])
+        spool.consume(3)
+        self.assertEqual(spool.peek(10), [b'f' * 10])
+
+    def test_overwrite_oldest_when_full(self):
+        spool = self.claim()
+        spool.append([bytes([ord('a') + index]) * 10 for index in range(6)])
+
+        self.assertEqual(spool.overwritten, 2)
+        self.assertEqual(spool.peek(10), [b'c' * 10, b'd' * 10, b'e' * 10, b'f' * 10])
+
+    def test_payload_larger_than_spool_is_rejected(self):
+        spool = self.claim()
+        self.assertEqual(spool.append([b'x' * 100, b'ok']), 1)
+        self.assertEqual(spool.peek(10), [b'ok'])
+
+    def test_records_survive_reopening(self):
+        spool = LogSpool.claim(self.directory, capacity=64)
+        spool.append([b'a' * 10, b'b' * 10, b'c' * 10])
+        spool.consume(1)
+        spool.close()
+
+        reopened = self.claim()
+        self.assertEqual(reopened.peek(10), [b'b' * 10, b'c' * 10])
+
+
+class LogStormGuardTests(SimpleTestCase):
+    """
+    Deduplicazione dei record ripetuti.
+    """
+
+    def record(self, value):
+        return logging.LogRecord('hrease', logging.ERROR, '/app/views.py', 10, 'errore %s', (value,), None)
+
+    def test_summary_of_replaced_window_is_kept(self):
+        guard = LogStormGuard(dedup_window=10)
+        with mock.patch('apps.core.log_storm.time.monotonic') as monotonic:
+            monotonic.return_value = 100.0
+            self.assertIsNotNone(guard.check(self.record(1)))
+            for value in range(2, 5):
+                self.assertIsNone(guard.check(self.record(value)))
+
+            # Finestra scaduta, riepilogo non ancora raccolto
+            monotonic.return_value = 111.0
+            self.assertIsNotNone(guard.check(self.record(5)))
+            self.assertIsNone(guard.check(self.record(6)))
+
+            summaries = guard.collect_summaries()
+            self.assertEqual(len(summaries), 1)
+            data, meta = summaries[0]
+            self.assertEqual(meta['occurrences'], 4)
+            # Solo il messaggio già formattato, non il record originale
+            self.assertEqual(logging.makeLogRecord(data).getMessage(), 'errore 1')
+
+            data, meta = guard.collect_summaries(force=True)[0]
+            self.assertEqual(meta['occurrences'], 2)
+            self.assertEqual(data['msg'], 'errore 5')
+
+
+class KeysetPaginatorTests(TestCase):
+    """
+    Paginazione a cursore su una chiave composta.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        for index, last_name in enumerate(['Rossi', 'Bianchi', 'Rossi', 'Verdi', 'Bianchi', 'Rossi', 'Neri']):
+            email = f'keyset{index}@example.com'
+            User.objects.create_user(email, username=email, last_name=last_name)
+
+    def collect(self, paginator, page_size):
+        queryset = get_user_model().objects.filter(email__startswith='keyset')
+        items, cursor, pages = [], None, 0
+        while True:
+            page, cursor = paginator.paginate(queryset, cursor=cursor, page_size=page_size)
+            items.extend(page)
+            pages += 1
+            if cursor is None:
+                return items, pages
+
+    def test_cursor_round_trip(self):
+        expected = list(
+            get_user_model().objects.filter(email__startswith='keyset').order_by('last_name', 'id')
+        )
+        items, pages = self.collect(KeysetPaginator(('last_name', 'id')), page_size=2)
+        self.assertEqual(items, expected)
+        self.assertEqual(pages, 4)
+
+    def test_descending(self):
+        expected = list(
+            get_user_model().objects.filter(email__startswith='keyset').order_by('-last_name', '-id')
+        )
+        items, _ = self.collect(KeysetPaginator(('last_name', 'id'), descending=True), page_size=3)
+        self.assertEqual(items, expected)
+
+    def test_decode_returns_encoded_values(self):
+        paginator = KeysetPaginator(('date_joined', 'id'))
+        user = get_user_model().objects.get(email='keyset0@example.com')
+        cursor = paginator.encode_cursor(user)
+        self.assertEqual(
+            paginator.decode_cursor(get_user_model(), cursor),
+            [user.date_joined, user.id]
+        )
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(('last_name', 'id'))
+        queryset = get_user_model().objects.all()
+        for cursor in ('non-base64!', 'WzFd', 'e30'):
+            with self.assertRaises(InvalidCursor):
+                paginator.paginate(queryset, cursor=cursor)
+        with self.assertRaises(InvalidCursor):
+            paginator.paginate(queryset, page_size=0)
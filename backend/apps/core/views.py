@@ -1,9 +1,13 @@
 # backend/apps/core/views.py
 
+import hmac
 import logging
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_GET
 
+from .metrics import REGISTRY, CONTENT_TYPE
+
 # Ottieni un'istanza del logger
 logger = logging.getLogger(__name__)
 
@@ -45,4 +49,30 @@ def test_logging(request):
     return JsonResponse({
         'status': 'success',
         'message': 'Log di test generati con successo'
-    })
\ No newline at end of file
+    })
+
+
+@require_GET
+def metrics(request):
+    """
+    Espone le metriche del processo in formato testo Prometheus.
+
+    L'accesso richiede l'header "Authorization: Bearer <METRICS_TOKEN>"; se
+    METRICS_TOKEN non è configurato l'endpoint è disponibile solo con DEBUG.
+
+    Returns:
+        HttpResponse: Metriche nel formato di esposizione testuale
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        allowed = hmac.compare_digest(provided.encode(), token.encode())
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Accesso alle metriche non autorizzato'
+        }, status=403)
+
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,354 @@
+# backend/apps/leaves/accruals.py
+"""
+Maturazione mensile dei giorni di assenza.
+
+Per ogni utente attivo e per ogni tipo di assenza con annual_allowance, i
+giorni maturati dall'inizio dell'anno alla fine del mese indicato sono
+annual_allowance / 12 per ogni mese lavorato, con il mese di assunzione
+contato in proporzione ai giorni (hire_date; senza data l'utente matura
+l'intero anno). Il risultato diventa il valore di allocated del registro
+dei saldi per l'anno: eventuali modifiche manuali di allocated vengono
+sostituite al passaggio successivo.
+
+Alla creazione dell'esecuzione gli utenti vengono divisi in blocchi
+(LeaveAccrualChunk) con l'elenco esplicito dei loro ID. Ogni blocco è
+calcolato in forma vettoriale con numpy (matrice utenti x tipi) e scritto
+con un solo upsert (INSERT ... ON CONFLICT DO UPDATE) nella transazione che
+segna il blocco come completato; i blocchi sono distribuiti su un pool di
+processi.
+
+Ogni esecuzione ha una chiave di idempotenza (default: accrual-YYYY-MM). I
+valori scritti sono assoluti, quindi ripetere un blocco non cambia il
+risultato; ripetere un'esecuzione interrotta elabora solo i blocchi
+pianificati e non completati, ripetere un'esecuzione completata non fa
+nulla.
+
+allocated_days applica lo stesso calcolo a una singola riga del registro:
+lo usano balances.py e rebuild_leave_balances per le righe create prima
+della maturazione, così il valore non dipende da chi crea la riga.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from decimal import Decimal
+
+import django
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .availability import month_start, next_month
+from .models import LeaveAccrualChunk, LeaveAccrualRun, LeaveBalance, LeaveType
+
+# Utenti per blocco
+CHUNK_SIZE = 5000
+
+# Righe per istruzione INSERT dell'upsert
+WRITE_BATCH_SIZE = 5000
+
+
+class AccrualError(Exception):
+    """
+    Esecuzione della maturazione non valida o fallita.
+    """
+
+
+class AccrualResult:
+    """
+    Esito di un'esecuzione della maturazione.
+
+    Attributes:
+        run: LeaveAccrualRun
+        users: Utenti elaborati in questa chiamata
+        rows: Righe del registro scritte in questa chiamata
+        chunks: Blocchi elaborati in questa chiamata
+        skipped_chunks: Blocchi già completati in una chiamata precedente
+        seconds: Durata dell'elaborazione
+        already_completed: True se l'esecuzione era già terminata
+    """
+
+    def __init__(self, run, already_completed=False):
+        self.run = run
+        self.users = 0
+        self.rows = 0
+        self.chunks = 0
+        self.skipped_chunks = 0
+        self.seconds = 0.0
+        self.already_completed = already_completed
+
+    @property
+    def users_per_second(self):
+        return self.users / self.seconds if self.seconds else 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def default_key(month):
+    """
+    Args:
+        month: Mese maturato
+
+    Returns:
+        str: Chiave di idempotenza predefinita del mese
+    """
+    return f'accrual-{month:%Y-%m}'
+
+
+def accrued_days(hire_ordinals, allowances, month):
+    """
+    Calcola i giorni maturati dall'inizio dell'anno alla fine del mese.
+
+    Args:
+        hire_ordinals: Array (utenti,) delle date di assunzione come ordinali
+                       (0 se assente)
+        allowances: Array (tipi,) dei giorni annui per tipo
+        month: Primo giorno del mese
+
+    Returns:
+        numpy.ndarray: Matrice (utenti, tipi) dei giorni maturati,
+                       arrotondati al decimo
+    """
+    bounds = np.array(
+        [date(month.year, number, 1).toordinal() for number in range(1, month.month + 1)]
+        + [next_month(month).toordinal()]
+    )
+    starts, ends = bounds[:-1], bounds[1:]
+    lengths = ends - starts
+    # Quota di ogni mese lavorata: 0 prima dell'assunzione, 1 dopo
+    employed_from = np.maximum(hire_ordinals[:, None], starts[None, :])
+    fractions = np.clip(ends[None, :] - employed_from, 0, lengths[None, :]) / lengths[None, :]
+    months_worked = fractions.sum(axis=1)
+    accrued = months_worked[:, None] * allowances[None, :] / 12
+    # Arrotondamento al decimo per eccesso da 0,05 (la tolleranza assorbe
+    # gli errori di rappresentazione dei float)
+    return np.floor(accrued * 10 + 0.5 + 1e-9) / 10
+
+
+def accrual_month(year, today=None):
+    """
+    Args:
+        year: Anno del registro
+        today: Data di riferimento (default: oggi)
+
+    Returns:
+        date | None: Ultimo mese maturato dell'anno (dicembre per gli anni
+                     passati, il mese corrente per l'anno in corso), None
+                     per gli anni futuri
+    """
+    today = today or date.today()
+    if year < today.year:
+        return date(year, 12, 1)
+    if year == today.year:
+        return today.replace(day=1)
+    return None
+
+
+def allocated_days(hire_date, allowance, year, today=None):
+    """
+    Calcola i giorni assegnati di una riga del registro secondo la
+    maturazione: quelli maturati fino a accrual_month(year).
+
+    Args:
+        hire_date: Data di assunzione dell'utente (None se assente)
+        allowance: annual_allowance del tipo di assenza (None se senza limiti)
+        year: Anno del registro
+        today: Data di riferimento (default: oggi)
+
+    Returns:
+        Decimal: Giorni assegnati
+    """
+    month = accrual_month(year, today)
+    if allowance is None or month is None:
+        return Decimal('0')
+    accrued = accrued_days(
+        np.array([hire_date.toordinal() if hire_date else 0], dtype=np.int64),
+        np.array([float(allowance)], dtype=np.float64),
+        month
+    )
+    return Decimal(f'{accrued[0, 0]:.1f}')
+
+
+def process_chunk(chunk_id, month, leave_types):
+    """
+    Calcola e scrive i saldi maturati di un blocco pianificato.
+
+    Gli utenti eliminati dopo la pianificazione vengono saltati.
+
+    Args:
+        chunk_id: ID di LeaveAccrualChunk
+        month: Primo giorno del mese
+        leave_types: Coppie (ID tipo, giorni annui)
+
+    Returns:
+        tuple: (utenti, righe scritte); (0, 0) se il blocco era già completato
+    """
+    type_ids = [type_id for type_id, _ in leave_types]
+    allowances = np.array([allowance for _, allowance in leave_types], dtype=np.float64)
+
+    with transaction.atomic():
+        # Il lock sulla riga del blocco serializza due esecuzioni concorrenti
+        # con la stessa chiave
+        chunk = LeaveAccrualChunk.objects.select_for_update().get(pk=chunk_id)
+        if chunk.finished_at is not None:
+            return 0, 0
+        users = list(
+            get_user_model().objects.filter(pk__in=chunk.user_ids)
+            .order_by('pk').values_list('pk', 'hire_date')
+        )
+        hire_ordinals = np.array(
+            [hire_date.toordinal() if hire_date else 0 for _, hire_date in users], dtype=np.int64
+        )
+        accrued = accrued_days(hire_ordinals, allowances, month)
+
+        now = timezone.now()
+        balances = [
+            LeaveBalance(
+                user_id=user_id,
+                leave_type_id=type_id,
+                year=month.year,
+                allocated=Decimal(f'{value:.1f}'),
+                updated_at=now
+            )
+            for (user_id, _), row in zip(users, accrued.tolist())
+            for type_id, value in zip(type_ids, row)
+        ]
+        LeaveBalance.objects.bulk_create(
+            balances,
+            batch_size=WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'leave_type', 'year'],
+            update_fields=['allocated', 'updated_at']
+        )
+        chunk.users = len(users)
+        chunk.rows = len(balances)
+        chunk.finished_at = now
+        chunk.save(update_fields=['users', 'rows', 'finished_at'])
+    return len(users), len(balances)
+
+
+def plan_chunks(run, users, chunk_size):
+    """
+    Divide gli utenti in blocchi e li registra, se l'esecuzione non ne ha.
+
+    Il lock sulla riga dell'esecuzione impedisce che due processi pianifichino
+    la stessa esecuzione con elenchi di utenti diversi.
+
+    Args:
+        run: LeaveAccrualRun
+        users: QuerySet degli utenti da elaborare
+        chunk_size: Utenti per blocco
+    """
+    with transaction.atomic():
+        LeaveAccrualRun.objects.select_for_update().get(pk=run.pk)
+        if run.chunks.exists():
+            return
+        user_ids = list(users.order_by('pk').values_list('pk', flat=True))
+        LeaveAccrualChunk.objects.bulk_create([
+            LeaveAccrualChunk(
+                run=run,
+                first_user_id=ids[0],
+                last_user_id=ids[-1],
+                user_ids=ids
+            )
+            for ids in (user_ids[index:index + chunk_size] for index in range(0, len(user_ids), chunk_size))
+        ])
+
+
+def _init_worker():
+    """
+    Prepara un processo del pool: con l'avvio "spawn" Django va configurato
+    di nuovo, con "fork" la chiamata non ha effetto.
+    """
+    django.setup()
+
+
+def run_accruals(month, key=None, workers=1, chunk_size=CHUNK_SIZE, users=None, force=False):
+    """
+    Esegue (o riprende) la maturazione di un mese.
+
+    Args:
+        month: Data nel mese da maturare
+        key: Chiave di idempotenza (default: default_key(month))
+        workers: Processi del pool (1 per elaborare nel processo corrente)
+        chunk_size: Utenti per blocco (solo alla pianificazione)
+        users: QuerySet degli utenti da elaborare (default: utenti attivi);
+               usato solo alla pianificazione, una ripresa elabora gli
+               utenti pianificati
+        force: Se True ripete da capo un'esecuzione già completata
+
+    Returns:
+        AccrualResult: Esito dell'esecuzione
+
+    Raises:
+        AccrualError: Se la chiave appartiene a un altro mese o un blocco fallisce
+    """
+    month = month_start(month)
+    key = key or default_key(month)
+    run, _ = LeaveAccrualRun.objects.get_or_create(key=key, defaults={'month': month})
+    if run.month != month:
+        raise AccrualError(f"La chiave {key} appartiene alla maturazione di {run.month:%Y-%m}")
+    if run.status == 'completed':
+        if not force:
+            return AccrualResult(run, already_completed=True)
+        run.chunks.all().delete()
+    LeaveAccrualRun.objects.filter(pk=run.pk).update(status='running', finished_at=None)
+
+    if users is None:
+        users = get_user_model().objects.filter(is_active=True)
+    plan_chunks(run, users, chunk_size)
+    leave_types = [
+        (type_id, float(allowance))
+        for type_id, allowance in LeaveType.objects.filter(annual_allowance__isnull=False)
+        .order_by('pk').values_list('pk', 'annual_allowance')
+    ]
+    pending = list(
+        run.chunks.filter(finished_at__isnull=True)
+        .order_by('first_user_id').values_list('pk', flat=True)
+    )
+
+    result = AccrualResult(run)
+    result.skipped_chunks = run.chunks.filter(finished_at__isnull=False).count()
+    started = time.perf_counter()
+    try:
+        if not leave_types:
+            pending = []
+        if workers > 1 and len(pending) > 1:
+            # I processi figli aprono connessioni proprie
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(process_chunk, chunk_id, month, leave_types)
+                    for chunk_id in pending
+                ]
+                for future in as_completed(futures):
+                    chunk_users, chunk_rows = future.result()
+                    result.users += chunk_users
+                    result.rows += chunk_rows
+                    result.chunks += 1
+        else:
+            for chunk_id in pending:
+                chunk_users, chunk_rows = process_chunk(chunk_id, month, leave_types)
+                result.users += chunk_users
+                result.rows += chunk_rows
+                result.chunks += 1
+    except Exception as e:
+        LeaveAccrualRun.objects.filter(pk=run.pk).update(status='failed')
+        raise AccrualError(
+            f"Maturazione {key} interrotta dopo {result.chunks} blocchi: {e}. "
+            "Ripetere il comando con la stessa chiave per riprenderla"
+        ) from e
+    result.seconds = time.perf_counter() - started
+
+    totals = LeaveAccrualChunk.objects.filter(run=run).values_list('users', 'rows')
+    LeaveAccrualRun.objects.filter(pk=run.pk).update(
+        status='completed',
+        users=sum(chunk_users for chunk_users, _ in totals),
+        rows=sum(chunk_rows for _, chunk_rows in totals),
+        finished_at=timezone.now()
+    )
+    run.refresh_from_db()
+    return result
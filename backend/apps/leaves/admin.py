@@ -1,20 +1,107 @@
-from django.contrib import admin
-from .models import LeaveType, LeaveRequest, Holiday
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from apps.core.pagination import EstimatedCountPaginator
+
+from .imports import MAX_REPORTED_ERRORS, CSVImportError, import_csv
+from .models import LeaveType, LeaveRequest, Holiday, LeaveBalance
+
+class CSVImportForm(forms.Form):
+    file = forms.FileField(label='File CSV')
+    dry_run = forms.BooleanField(label='Solo verifica (nessuna modifica salvata)', required=False)
+
+class CSVImportAdminMixin:
+    """
+    Aggiunge alla lista dell'admin l'importazione da CSV (vedi imports.py).
+    """
+    change_list_template = 'admin/leaves/change_list_import.html'
+    import_kind = None
+    
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'import-csv/',
+                self.admin_site.admin_view(self.import_csv_view),
+                name='%s_%s_import_csv' % info
+            ),
+        ] + super().get_urls()
+    
+    def import_csv_view(self, request):
+        """
+        Mostra il modulo di caricamento e importa il file inviato.
+        """
+        if not self.has_add_permission(request):
+            return redirect('admin:index')
+        form = CSVImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_csv(self.import_kind, stream, dry_run=form.cleaned_data['dry_run'])
+            except (CSVImportError, UnicodeDecodeError) as e:
+                messages.error(request, str(e))
+            else:
+                level = messages.WARNING if result.rejected else messages.SUCCESS
+                messages.add_message(
+                    request, level,
+                    f"Importate {result.imported} righe, scartate {result.rejected}"
+                    + (" (solo verifica)" if form.cleaned_data['dry_run'] else "")
+                )
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"Importa {self.model._meta.verbose_name_plural} da CSV",
+            'form': form,
+            'result': result,
+            'max_errors': MAX_REPORTED_ERRORS,
+        }
+        return TemplateResponse(request, 'admin/leaves/csv_import.html', context)
 
 @admin.register(LeaveType)
 class LeaveTypeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_paid', 'color_code')
+    list_display = ('name', 'is_paid', 'annual_allowance', 'color_code')
     search_fields = ('name',)
 
 @admin.register(LeaveRequest)
-class LeaveRequestAdmin(admin.ModelAdmin):
+class LeaveRequestAdmin(CSVImportAdminMixin, admin.ModelAdmin):
+    import_kind = 'leave_requests'
     list_display = ('user', 'leave_type', 'start_date', 'end_date', 'status')
     list_filter = ('status', 'leave_type')
+    # La ricerca sui campi dell'utente usa gli indici trigram di accounts_user
     search_fields = ('user__email', 'user__first_name', 'user__last_name')
     readonly_fields = ('created_at', 'updated_at')
+    # Utente e tipo letti con la stessa query della lista
+    list_select_related = ('user', 'leave_type')
+    # Ordinamento e navigazione per data sull'indice (start_date, id)
+    ordering = ('-start_date', '-id')
+    date_hierarchy = 'start_date'
+    # Conteggi stimati sulle tabelle grandi, senza COUNT(*) dell'intera tabella
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Ricerca degli utenti invece di una select con tutti gli utenti
+    autocomplete_fields = ('user', 'approved_by')
 
 @admin.register(Holiday)
-class HolidayAdmin(admin.ModelAdmin):
+class HolidayAdmin(CSVImportAdminMixin, admin.ModelAdmin):
+    import_kind = 'holidays'
     list_display = ('name', 'date', 'is_recurring')
     list_filter = ('is_recurring',)
-    search_fields = ('name',)
\ No newline at end of file
+    search_fields = ('name',)
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'leave_type', 'year', 'allocated', 'used', 'pending', 'available')
+    list_filter = ('year', 'leave_type')
+    search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    list_select_related = ('user', 'leave_type')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    autocomplete_fields = ('user',)
+    # Usati e prenotati sono mantenuti dalle richieste di assenza
+    readonly_fields = ('used', 'pending', 'updated_at')
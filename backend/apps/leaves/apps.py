@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LeavesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.leaves'
+
+    def ready(self):
+        # Registra i receiver dei segnali
+        from . import signals  # noqa: F401
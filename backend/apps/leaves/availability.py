@@ -0,0 +1,316 @@
+# backend/apps/leaves/availability.py
+"""
+Calendario delle presenze per reparto, basato su bitmap mensili precalcolate.
+
+Per ogni coppia (reparto, mese) AbsenceCalendarMonth contiene, per ciascun
+utente, una bitmap dei giorni di assenza approvata. La riga viene calcolata
+alla prima lettura con una sola query e poi mantenuta in modo incrementale da
+LeaveRequest.save()/delete(): approvare, annullare o modificare una richiesta
+aggiorna solo i bit dei mesi coinvolti, sotto lock della riga.
+
+Anche la modifica crea le righe mancanti dei mesi che tocca. Una lettura
+concorrente che calcola lo stesso mese senza vedere la modifica non
+committata può quindi solo:
+- inserire la riga prima, e la modifica ne aggiorna i bit;
+- trovare la riga della modifica (l'inserimento attende il suo commit e
+  viene scartato).
+
+Un cambio di reparto di un utente elimina le righe dei reparti coinvolti, che
+vengono ricalcolate alla lettura successiva.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from .models import AbsenceCalendarMonth, LeaveRequest
+
+# Stato delle richieste riportate nel calendario
+CALENDAR_STATUS = 'approved'
+
+
+def month_start(day):
+    """
+    Args:
+        day: Data qualsiasi
+
+    Returns:
+        date: Primo giorno del mese della data
+    """
+    return day.replace(day=1)
+
+
+def next_month(month):
+    """
+    Args:
+        month: Primo giorno di un mese
+
+    Returns:
+        date: Primo giorno del mese successivo
+    """
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def iter_months(start_date, end_date):
+    """
+    Elenca i mesi toccati da un periodo.
+
+    Args:
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+
+    Yields:
+        date: Primo giorno di ciascun mese
+    """
+    month = month_start(start_date)
+    while month <= end_date:
+        yield month
+        month = next_month(month)
+
+
+def range_masks(start_date, end_date, half_day, month):
+    """
+    Calcola i bit di un'assenza all'interno di un mese.
+
+    Args:
+        start_date: Inizio dell'assenza
+        end_date: Fine dell'assenza (inclusa)
+        half_day: Se True l'ultimo giorno è una mezza giornata
+        month: Primo giorno del mese
+
+    Returns:
+        tuple: (bitmap dei giorni di assenza, bitmap delle mezze giornate)
+    """
+    first = max(start_date, month)
+    last = min(end_date, next_month(month) - timedelta(days=1))
+    if last < first:
+        return 0, 0
+    mask = ((1 << (last.day - first.day + 1)) - 1) << (first.day - 1)
+    half = 1 << (end_date.day - 1) if half_day and last == end_date else 0
+    return mask, half
+
+
+def build_month(department, month):
+    """
+    Calcola da zero le bitmap di un reparto in un mese.
+
+    Args:
+        department: Nome del reparto
+        month: Primo giorno del mese
+
+    Returns:
+        AbsenceCalendarMonth: Riga non ancora salvata
+    """
+    rows = LeaveRequest.objects.filter(
+        user__department=department,
+        status=CALENDAR_STATUS,
+        start_date__lt=next_month(month),
+        end_date__gte=month
+    ).values_list('user_id', 'start_date', 'end_date', 'half_day')
+
+    absences, half_days = {}, {}
+    for user_id, start_date, end_date, half_day in rows:
+        key = str(user_id)
+        mask, half = range_masks(start_date, end_date, half_day, month)
+        absences[key] = absences.get(key, 0) | mask
+        if half:
+            half_days[key] = half_days.get(key, 0) | half
+    return AbsenceCalendarMonth(department=department, month=month, absences=absences, half_days=half_days)
+
+
+def get_months(department, start_date, end_date):
+    """
+    Restituisce le righe mensili di un reparto per un periodo, calcolando
+    quelle mancanti.
+
+    Args:
+        department: Nome del reparto
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+
+    Returns:
+        dict: AbsenceCalendarMonth per primo giorno del mese
+    """
+    months = list(iter_months(start_date, end_date))
+    rows = {
+        row.month: row
+        for row in AbsenceCalendarMonth.objects.filter(department=department, month__in=months)
+    }
+    missing = [build_month(department, month) for month in months if month not in rows]
+    if missing:
+        # Un'altra richiesta può aver creato le stesse righe nel frattempo
+        AbsenceCalendarMonth.objects.bulk_create(missing, ignore_conflicts=True)
+        rows.update({
+            row.month: row
+            for row in AbsenceCalendarMonth.objects.filter(
+                department=department, month__in=[row.month for row in missing]
+            )
+        })
+    return rows
+
+
+def apply_change(previous, current):
+    """
+    Aggiorna le bitmap dei mesi dopo la modifica di una richiesta.
+
+    Va chiamato all'interno della transazione che salva la richiesta.
+
+    Args:
+        previous: Valori di balances.LEDGER_FIELDS prima della modifica (o None)
+        current: Valori di balances.LEDGER_FIELDS dopo la modifica (o None)
+    """
+    apply_changes([(previous, current)])
+
+
+def apply_changes(changes):
+    """
+    Aggiorna le bitmap dei mesi dopo la modifica di più richieste,
+    bloccando e salvando una sola volta ogni riga mensile.
+
+    Va chiamato all'interno della transazione che salva le richieste. Le
+    righe mancanti vengono calcolate e create. Le richieste approvate di uno
+    stesso utente non si sovrappongono (vincolo di esclusione), quindi
+    rimuovere i bit di una richiesta non tocca quelli di un'altra.
+
+    Args:
+        changes: Coppie (previous, current) di valori di balances.LEDGER_FIELDS
+                 (None per richiesta nuova o eliminata)
+    """
+    changes = [(previous, current) for previous, current in changes if previous != current]
+    updates = []
+    # Prima tutte le rimozioni, poi le aggiunte: una richiesta spostata
+    # all'interno dello stesso mese mantiene i bit del nuovo periodo
+    for position, adding in ((0, False), (1, True)):
+        for change in changes:
+            values = change[position]
+            if values is None or values[5] != CALENDAR_STATUS:
+                continue
+            user_id, _, start_date, end_date, half_day, _ = values
+            updates.append((user_id, start_date, end_date, half_day, adding))
+    if not updates:
+        return
+
+    user_ids = {update[0] for update in updates}
+    departments = dict(
+        get_user_model().objects.filter(pk__in=user_ids).values_list('pk', 'department')
+    )
+    by_month = {}
+    for user_id, start_date, end_date, half_day, adding in updates:
+        department = departments.get(user_id)
+        if not department:
+            continue
+        for month in iter_months(start_date, end_date):
+            mask, half = range_masks(start_date, end_date, half_day, month)
+            by_month.setdefault((department, month), []).append((str(user_id), mask, half, adding))
+
+    # Righe bloccate sempre nello stesso ordine tra transazioni concorrenti
+    for department, month in sorted(by_month):
+        rows = AbsenceCalendarMonth.objects.select_for_update().filter(department=department, month=month)
+        row = rows.first()
+        if row is None:
+            # Mese mai calcolato: la riga calcolata qui include già questa
+            # modifica, riapplicarla sotto lock non cambia i bit
+            AbsenceCalendarMonth.objects.bulk_create([build_month(department, month)], ignore_conflicts=True)
+            row = rows.first()
+            if row is None:
+                continue
+        for key, mask, half, adding in by_month[(department, month)]:
+            if adding:
+                row.absences[key] = row.absences.get(key, 0) | mask
+                if half:
+                    row.half_days[key] = row.half_days.get(key, 0) | half
+            else:
+                _clear_bits(row.absences, key, mask)
+                _clear_bits(row.half_days, key, mask)
+        row.version = F('version') + 1
+        row.save(update_fields=['absences', 'half_days', 'version', 'updated_at'])
+
+
+def _clear_bits(bitmaps, key, mask):
+    """
+    Azzera dei bit nella bitmap di un utente, rimuovendola se vuota.
+
+    Args:
+        bitmaps: Dizionario {user_id: bitmap}
+        key: ID utente (stringa)
+        mask: Bit da azzerare
+    """
+    value = bitmaps.get(key, 0) & ~mask
+    if value:
+        bitmaps[key] = value
+    else:
+        bitmaps.pop(key, None)
+
+
+def invalidate_departments(*departments):
+    """
+    Elimina le righe calcolate di uno o più reparti, dopo il commit.
+
+    Args:
+        *departments: Nomi dei reparti
+    """
+    departments = [department for department in departments if department]
+    if departments:
+        transaction.on_commit(
+            lambda: AbsenceCalendarMonth.objects.filter(department__in=departments).delete()
+        )
+
+
+def availability_etag(department, start_date, end_date, months, employees, holidays_version=None):
+    """
+    Calcola il validatore della risposta di disponibilità.
+
+    Args:
+        department: Nome del reparto
+        start_date: Inizio del periodo
+        end_date: Fine del periodo
+        months: AbsenceCalendarMonth del periodo
+        employees: Tuple (id, nome, cognome) dei dipendenti
+        holidays_version: Versione delle festività (cambia i giorni lavorativi)
+
+    Returns:
+        str: ETag tra virgolette
+    """
+    digest = hashlib.sha1(repr((
+        department, start_date, end_date,
+        sorted((row.month, row.version) for row in months),
+        employees, holidays_version
+    )).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def availability_matrix(start_date, end_date, months, employees):
+    """
+    Costruisce la matrice giorno per dipendente.
+
+    Args:
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+        months: AbsenceCalendarMonth per primo giorno del mese
+        employees: Tuple (id, nome, cognome) dei dipendenti
+
+    Returns:
+        list: Per ogni dipendente un dizionario con 'absent' e 'half_day',
+              liste di 0/1 allineate ai giorni del periodo
+    """
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    rows = []
+    for user_id, first_name, last_name in employees:
+        key = str(user_id)
+        absent, half = [], []
+        for day in days:
+            row = months[month_start(day)]
+            bit = 1 << (day.day - 1)
+            absent.append(1 if row.absences.get(key, 0) & bit else 0)
+            half.append(1 if row.half_days.get(key, 0) & bit else 0)
+        rows.append({
+            'id': user_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'absent': absent,
+            'half_day': half,
+        })
+    return rows
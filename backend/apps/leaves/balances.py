@@ -0,0 +1,360 @@
+# backend/apps/leaves/balances.py
+"""
+Registro dei saldi di assenza (LeaveBalance).
+
+Per ogni utente, tipo di assenza e anno il registro mantiene i giorni
+assegnati, usati (richieste approvate) e prenotati (richieste in attesa).
+Viene aggiornato in modo incrementale da LeaveRequest.save()/delete(), nella
+stessa transazione del salvataggio: si calcola il contributo della richiesta
+prima e dopo la modifica e si applica solo la differenza.
+
+Una modifica alle festività cambia la durata delle richieste che le
+contengono: i segnali di Holiday e l'importazione delle festività
+ricalcolano, nella stessa transazione, le righe del registro di quelle
+richieste (holiday_keys, rebuild_keys).
+
+Le modifiche che non passano da save()/delete() (queryset.update) non
+aggiornano il registro: il comando rebuild_leave_balances lo ricostruisce da
+zero e con --check segnala le differenze.
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from .accruals import allocated_days
+from .models import LeaveBalance, LeaveRequest, LeaveType
+from .reference import get_leave_type
+from .work_calendar import HALF_DAY, build_calendar, get_calendar
+
+# Colonna del registro alimentata da ciascuno stato
+STATUS_COLUMNS = {
+    'pending': 'pending',
+    'approved': 'used',
+}
+
+# Campi di LeaveRequest che determinano il contributo al registro
+LEDGER_FIELDS = ('user_id', 'leave_type_id', 'start_date', 'end_date', 'half_day', 'status')
+
+
+def contributions(values, calendar=None):
+    """
+    Calcola il contributo di una richiesta al registro, suddiviso per anno.
+
+    Args:
+        values: Tupla con i valori di LEDGER_FIELDS, o None
+        calendar: Calendario da usare (default: get_calendar())
+
+    Returns:
+        dict: Giorni per chiave (user_id, leave_type_id, anno, colonna)
+    """
+    if values is None:
+        return {}
+    user_id, leave_type_id, start_date, end_date, half_day, status = values
+    column = STATUS_COLUMNS.get(status)
+    if column is None or end_date < start_date:
+        return {}
+
+    calendar = calendar or get_calendar(start_date.year, end_date.year)
+    result = {}
+    for year in range(start_date.year, end_date.year + 1):
+        days = Decimal(calendar.working_days(
+            max(start_date, date(year, 1, 1)),
+            min(end_date, date(year, 12, 31))
+        ))
+        # La mezza giornata riguarda l'ultimo giorno, quindi l'anno di fine,
+        # e conta solo se l'ultimo giorno è lavorativo (come in duration())
+        if half_day and year == end_date.year and days and calendar.is_working_day(end_date):
+            days -= HALF_DAY
+        if days:
+            result[(user_id, leave_type_id, year, column)] = days
+    return result
+
+
+def apply_change(previous, current):
+    """
+    Applica al registro la differenza tra due stati di una richiesta.
+
+    Va chiamato all'interno della transazione che salva la richiesta.
+
+    Args:
+        previous: Valori di LEDGER_FIELDS prima della modifica (None se nuova)
+        current: Valori di LEDGER_FIELDS dopo la modifica (None se eliminata)
+    """
+    apply_changes([(previous, current)])
+
+
+def apply_changes(changes):
+    """
+    Applica al registro le differenze di più richieste con un solo
+    aggiornamento per riga del registro.
+
+    Va chiamato all'interno della transazione che salva le richieste.
+
+    Args:
+        changes: Coppie (previous, current) come per apply_change
+    """
+    delta = defaultdict(Decimal)
+    for previous, current in changes:
+        if previous == current:
+            continue
+        for key, days in contributions(current).items():
+            delta[key] += days
+        for key, days in contributions(previous).items():
+            delta[key] -= days
+    apply_deltas(delta)
+
+
+def apply_deltas(delta):
+    """
+    Aggiorna le righe del registro con incrementi atomici.
+
+    Le righe vengono aggiornate in ordine di chiave, così transazioni
+    concorrenti le bloccano sempre nello stesso ordine.
+
+    Args:
+        delta: Giorni per chiave (user_id, leave_type_id, anno, colonna)
+    """
+    rows = defaultdict(dict)
+    for (user_id, leave_type_id, year, column), days in delta.items():
+        if days:
+            rows[(user_id, leave_type_id, year)][column] = days
+
+    now = timezone.now()
+    for key in sorted(rows):
+        balance = get_or_create_balance(*key)
+        changes = {column: F(column) + days for column, days in rows[key].items()}
+        LeaveBalance.objects.filter(pk=balance.pk).update(updated_at=now, **changes)
+
+
+def get_or_create_balance(user_id, leave_type_id, year):
+    """
+    Restituisce la riga del registro, creandola con i giorni maturati
+    (accruals.allocated_days).
+
+    Args:
+        user_id: ID dell'utente
+        leave_type_id: ID del tipo di assenza
+        year: Anno
+
+    Returns:
+        LeaveBalance: Riga del registro
+    """
+    balance = LeaveBalance.objects.filter(
+        user_id=user_id, leave_type_id=leave_type_id, year=year
+    ).first()
+    if balance is None:
+        leave_type = get_leave_type(leave_type_id) or LeaveType.objects.get(pk=leave_type_id)
+        balance, _ = LeaveBalance.objects.get_or_create(
+            user_id=user_id,
+            leave_type_id=leave_type_id,
+            year=year,
+            defaults={'allocated': allocated_days(_hire_date(user_id), leave_type.annual_allowance, year)}
+        )
+    return balance
+
+
+def _hire_date(user_id):
+    return get_user_model().objects.filter(pk=user_id).values_list('hire_date', flat=True).first()
+
+
+def validate_balance(user_id, leave_type, start_date, end_date, half_day=False, previous=None):
+    """
+    Verifica che l'utente abbia giorni sufficienti per una richiesta.
+
+    Per ogni anno coinvolto richiede una sola lettura indicizzata del
+    registro; senza riga valgono i giorni maturati (accruals.allocated_days).
+    I tipi senza annual_allowance non hanno limiti.
+
+    Args:
+        user_id: ID dell'utente
+        leave_type: LeaveType richiesto
+        start_date: Data di inizio
+        end_date: Data di fine
+        half_day: Se True l'assenza termina con una mezza giornata
+        previous: Valori di LEDGER_FIELDS della richiesta prima della modifica
+                  (il suo contributo attuale viene restituito al saldo)
+
+    Raises:
+        ValidationError: Se i giorni disponibili non sono sufficienti
+    """
+    if leave_type.annual_allowance is None:
+        return
+    requested = contributions((user_id, leave_type.pk, start_date, end_date, half_day, 'pending'))
+    released = defaultdict(Decimal)
+    for (_, leave_type_id, year, _), days in contributions(previous).items():
+        if leave_type_id == leave_type.pk:
+            released[year] += days
+
+    hire_date = None
+    for (_, _, year, _), days in requested.items():
+        balance = LeaveBalance.objects.filter(
+            user_id=user_id, leave_type_id=leave_type.pk, year=year
+        ).first()
+        if balance is not None:
+            available = balance.available
+        else:
+            hire_date = hire_date or _hire_date(user_id)
+            available = allocated_days(hire_date, leave_type.annual_allowance, year)
+        available += released[year]
+        if days > available:
+            raise ValidationError(
+                f"Giorni di {leave_type.name} insufficienti per il {year}: "
+                f"richiesti {days}, disponibili {available}"
+            )
+
+
+def compute_balances(year=None):
+    """
+    Ricalcola da zero il registro a partire dalle richieste di assenza.
+
+    Args:
+        year: Limita il calcolo a un anno (None per tutti)
+
+    Returns:
+        dict: {(user_id, leave_type_id, anno): {'used': Decimal, 'pending': Decimal}}
+    """
+    requests = LeaveRequest.objects.filter(status__in=STATUS_COLUMNS)
+    if year is not None:
+        requests = requests.filter(start_date__lte=date(year, 12, 31), end_date__gte=date(year, 1, 1))
+
+    totals = defaultdict(lambda: {'used': Decimal('0'), 'pending': Decimal('0')})
+    for values in requests.values_list(*LEDGER_FIELDS).iterator(chunk_size=2000):
+        for (user_id, leave_type_id, row_year, column), days in contributions(values).items():
+            if year is None or row_year == year:
+                totals[(user_id, leave_type_id, row_year)][column] += days
+    return totals
+
+
+def holiday_keys(holidays):
+    """
+    Elenca le righe del registro la cui durata dipende da alcune festività:
+    quelle delle richieste attive che contengono le date (in ogni anno, per
+    le festività ricorrenti).
+
+    Args:
+        holidays: Coppie (data, ricorrente)
+
+    Returns:
+        set: Chiavi (user_id, leave_type_id, anno)
+    """
+    holidays = set(holidays)
+    if not holidays:
+        return set()
+    requests = LeaveRequest.objects.filter(status__in=STATUS_COLUMNS)
+    days = {day for day, is_recurring in holidays if not is_recurring}
+    recurring = {day for day, is_recurring in holidays if is_recurring}
+    if recurring:
+        bounds = requests.aggregate(first=Min('start_date'), last=Max('end_date'))
+        if bounds['first'] is not None:
+            for day in recurring:
+                for year in range(bounds['first'].year, bounds['last'].year + 1):
+                    try:
+                        days.add(day.replace(year=year))
+                    except ValueError:
+                        # 29 febbraio negli anni non bisestili
+                        pass
+    if not days:
+        return set()
+    condition = Q()
+    for day in days:
+        condition |= Q(start_date__lte=day, end_date__gte=day)
+    keys = set()
+    for user_id, leave_type_id, start_date, end_date in (
+        requests.filter(condition).values_list('user_id', 'leave_type_id', 'start_date', 'end_date')
+    ):
+        keys.update(
+            (user_id, leave_type_id, day.year) for day in days if start_date <= day <= end_date
+        )
+    return keys
+
+
+def rebuild_keys(keys, fresh_calendar=False):
+    """
+    Ricalcola used e pending di alcune righe del registro dalle richieste
+    di assenza, creando quelle mancanti con i giorni maturati.
+
+    Blocca solo le righe degli utenti, dei tipi e degli anni coinvolti, in
+    ordine di chiave come apply_deltas. Va chiamato all'interno di una
+    transazione, ad esempio dopo inserimenti in blocco che non passano da
+    save().
+
+    Args:
+        keys: Chiavi (user_id, leave_type_id, anno)
+        fresh_calendar: Se True le durate usano le festività lette ora dal
+                        database (build_calendar), necessario nella
+                        transazione che modifica le festività
+
+    Returns:
+        int: Righe corrette o create
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+    user_ids = {key[0] for key in keys}
+    leave_type_ids = {key[1] for key in keys}
+    years = {key[2] for key in keys}
+
+    totals = defaultdict(lambda: {'used': Decimal('0'), 'pending': Decimal('0')})
+    requests = LeaveRequest.objects.filter(
+        status__in=STATUS_COLUMNS,
+        user_id__in=user_ids,
+        leave_type_id__in=leave_type_ids,
+        start_date__lte=date(max(years), 12, 31),
+        end_date__gte=date(min(years), 1, 1)
+    )
+    rows = list(requests.values_list(*LEDGER_FIELDS))
+    calendar = None
+    if fresh_calendar and rows:
+        calendar = build_calendar(min(row[2] for row in rows).year, max(row[3] for row in rows).year)
+    for values in rows:
+        for (user_id, leave_type_id, year, column), days in contributions(values, calendar).items():
+            if (user_id, leave_type_id, year) in keys:
+                totals[(user_id, leave_type_id, year)][column] += days
+
+    balances = (
+        LeaveBalance.objects.select_for_update()
+        .filter(user_id__in=user_ids, leave_type_id__in=leave_type_ids, year__in=years)
+        .order_by('user_id', 'leave_type_id', 'year')
+    )
+    now = timezone.now()
+    to_update = []
+    missing = set(keys)
+    for balance in balances:
+        key = (balance.user_id, balance.leave_type_id, balance.year)
+        if key not in keys:
+            continue
+        missing.discard(key)
+        expected = totals.get(key, {'used': Decimal('0'), 'pending': Decimal('0')})
+        if balance.used != expected['used'] or balance.pending != expected['pending']:
+            balance.used = expected['used']
+            balance.pending = expected['pending']
+            balance.updated_at = now
+            to_update.append(balance)
+
+    missing = [key for key in sorted(missing) if key in totals]
+    to_create = []
+    if missing:
+        allowances = dict(LeaveType.objects.filter(pk__in=leave_type_ids).values_list('id', 'annual_allowance'))
+        hire_dates = dict(
+            get_user_model().objects.filter(pk__in={key[0] for key in missing}).values_list('pk', 'hire_date')
+        )
+        to_create = [
+            LeaveBalance(
+                user_id=user_id,
+                leave_type_id=leave_type_id,
+                year=year,
+                allocated=allocated_days(hire_dates.get(user_id), allowances.get(leave_type_id), year),
+                used=totals[(user_id, leave_type_id, year)]['used'],
+                pending=totals[(user_id, leave_type_id, year)]['pending']
+            )
+            for user_id, leave_type_id, year in missing
+        ]
+    LeaveBalance.objects.bulk_update(to_update, ['used', 'pending', 'updated_at'], batch_size=1000)
+    LeaveBalance.objects.bulk_create(to_create, batch_size=1000)
+    return len(to_update) + len(to_create)
@@ -0,0 +1,220 @@
+# backend/apps/leaves/exports.py
+"""
+Esportazione delle richieste di assenza per le paghe, in CSV o XLSX.
+
+Le righe vengono lette dal database a blocchi (cursore lato server su
+Postgres, tramite QuerySet.iterator) e scritte in modo incrementale: la
+memoria usata resta costante qualunque sia il numero di righe esportate.
+Le durate di ogni blocco sono calcolate in un'unica operazione dal
+calendario dei giorni lavorativi (WorkingCalendar.durations).
+"""
+
+import csv
+import io
+from itertools import islice
+
+from django.utils import timezone
+
+from .models import LeaveRequest
+from .work_calendar import get_calendar
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    Workbook = None
+
+# Righe lette e scritte per blocco
+CHUNK_SIZE = 2000
+
+# Intestazione delle colonne esportate
+EXPORT_HEADER = (
+    'id', 'email', 'first_name', 'last_name', 'department', 'leave_type', 'is_paid',
+    'start_date', 'end_date', 'half_day', 'status', 'approval_date',
+    'duration', 'days_in_period'
+)
+
+# Campi letti dal database, nell'ordine dell'intestazione
+EXPORT_FIELDS = (
+    'id', 'user__email', 'user__first_name', 'user__last_name', 'user__department',
+    'leave_type__name', 'leave_type__is_paid', 'start_date', 'end_date', 'half_day',
+    'status', 'approval_date'
+)
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Colonne di testo inserito dagli utenti (email, nome, cognome, reparto, tipo)
+TEXT_COLUMNS = (1, 2, 3, 4, 5)
+
+# Caratteri iniziali che Excel e LibreOffice interpretano come formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportError(Exception):
+    """
+    Esportazione non eseguibile (es. formato non disponibile).
+    """
+
+
+def export_queryset(start_date, end_date, statuses=None):
+    """
+    Seleziona le richieste che intersecano un periodo.
+
+    Args:
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+        statuses: Stati da includere (None per tutti)
+
+    Returns:
+        QuerySet: Richieste ordinate per (start_date, id)
+    """
+    queryset = LeaveRequest.objects.filter(start_date__lte=end_date, end_date__gte=start_date)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset.order_by('start_date', 'id')
+
+
+def iter_chunks(queryset, start_date, end_date, chunk_size=CHUNK_SIZE):
+    """
+    Legge le righe da esportare a blocchi, con le durate calcolate.
+
+    Per ogni richiesta 'duration' è la durata complessiva in giorni
+    lavorativi, 'days_in_period' quella che ricade nel periodo esportato
+    (la mezza giornata conta solo se l'ultimo giorno è nel periodo).
+
+    Args:
+        queryset: Richieste da esportare (vedi export_queryset)
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+        chunk_size: Righe per blocco
+
+    Yields:
+        list: Righe di un blocco, tuple nell'ordine di EXPORT_HEADER
+    """
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        starts = [row[7] for row in chunk]
+        ends = [row[8] for row in chunk]
+        half_days = [row[9] for row in chunk]
+        calendar = get_calendar(min(starts).year, max(ends).year)
+        durations = calendar.durations(starts, ends, half_days)
+        in_period = calendar.durations(
+            [max(start, start_date) for start in starts],
+            [min(end, end_date) for end in ends],
+            [half and end <= end_date for half, end in zip(half_days, ends)]
+        )
+        yield [
+            _neutralize(row[:11]) + (_format_datetime(row[11]), float(total), float(period))
+            for row, total, period in zip(chunk, durations, in_period)
+        ]
+
+
+def _neutralize(row):
+    """
+    Impedisce che il testo inserito dagli utenti diventi una formula quando
+    il file viene aperto in un foglio di calcolo (formula injection),
+    anteponendo un apice ai valori che iniziano con FORMULA_PREFIXES.
+
+    Args:
+        row: Tupla dei valori di EXPORT_FIELDS
+
+    Returns:
+        tuple: Riga con le colonne di testo neutralizzate
+    """
+    values = list(row)
+    for index in TEXT_COLUMNS:
+        value = values[index]
+        if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+            values[index] = "'" + value
+    return tuple(values)
+
+
+def _format_datetime(value):
+    """
+    Args:
+        value: Datetime aware o None
+
+    Returns:
+        str: Data e ora nel fuso locale (vuota se None)
+    """
+    if value is None:
+        return ''
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def stream_csv(queryset, start_date, end_date):
+    """
+    Genera il CSV un blocco alla volta, adatto a StreamingHttpResponse.
+
+    Args:
+        queryset: Richieste da esportare
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+
+    Yields:
+        str: Intestazione e poi il testo CSV di ogni blocco
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    yield buffer.getvalue()
+    for chunk in iter_chunks(queryset, start_date, end_date):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def write_csv(queryset, start_date, end_date, output):
+    """
+    Scrive il CSV su un file aperto in modalità testo.
+
+    Args:
+        queryset: Richieste da esportare
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+        output: File di destinazione
+
+    Returns:
+        int: Numero di righe esportate
+    """
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    for chunk in iter_chunks(queryset, start_date, end_date):
+        writer.writerows(chunk)
+        count += len(chunk)
+    return count
+
+
+def write_xlsx(queryset, start_date, end_date, output):
+    """
+    Scrive un file XLSX con openpyxl in modalità write-only, che serializza
+    le righe su disco man mano invece di tenerle in memoria.
+
+    Args:
+        queryset: Richieste da esportare
+        start_date: Inizio del periodo
+        end_date: Fine del periodo (inclusa)
+        output: Percorso o file binario di destinazione
+
+    Returns:
+        int: Numero di righe esportate
+
+    Raises:
+        ExportError: Se openpyxl non è installato
+    """
+    if Workbook is None:
+        raise ExportError("Esportazione XLSX non disponibile: installare openpyxl")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Assenze')
+    sheet.append(EXPORT_HEADER)
+    count = 0
+    for chunk in iter_chunks(queryset, start_date, end_date):
+        for row in chunk:
+            sheet.append(row)
+        count += len(chunk)
+    workbook.save(output)
+    return count
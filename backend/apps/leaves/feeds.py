@@ -0,0 +1,328 @@
+# backend/apps/leaves/feeds.py
+"""
+Feed iCalendar (RFC 5545) delle assenze approvate, per utente e per reparto.
+
+I client di calendario interrogano i feed di continuo e non inviano il token
+JWT: ogni feed è raggiungibile con un link firmato (feed_token) che resta
+valido finché l'utente non cambia password.
+
+Il contenuto di un feed è composto da frammenti in cache, uno per utente e
+uno per le festività. La chiave di ogni frammento contiene le versioni da
+cui dipende (versione delle richieste dell'utente, vedi versions.py, e
+versione dei dati di riferimento), quindi una modifica rigenera solo i
+frammenti degli utenti coinvolti; i frammenti mancanti di un feed di
+reparto vengono rigenerati con una sola query. Il validatore di un feed è
+calcolato dalle stesse versioni: un client che invia If-None-Match riceve
+304 senza che venga letta la tabella delle richieste.
+"""
+
+import hashlib
+from datetime import date, datetime, time, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+from . import reference
+from .models import LeaveRequest
+from .versions import REQUEST_VERSIONS
+
+# Salt delle firme dei link ai feed
+FEED_SALT = 'leaves.feeds'
+
+# Tipi di feed
+FEED_KINDS = ('user', 'department')
+
+# Stato delle richieste pubblicate nei feed
+FEED_STATUS = 'approved'
+
+# Durata in cache dei frammenti (le chiavi cambiano a ogni modifica)
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+# Anni di festività pubblicati prima e dopo l'anno corrente
+HOLIDAY_YEARS_AROUND = 1
+
+# Identificativo del prodotto nei feed
+PRODID = '-//HRease//Assenze//IT'
+
+
+def _password_digest(user):
+    """
+    Impronta della password dell'utente: cambiando password i link
+    firmati in precedenza smettono di funzionare.
+    """
+    return salted_hmac(FEED_SALT, user.password).hexdigest()[:16]
+
+
+def feed_token(user, kind):
+    """
+    Genera il token firmato del link a un feed.
+
+    Args:
+        user: Utente proprietario del link
+        kind: 'user' o 'department'
+
+    Returns:
+        str: Token da inserire nell'URL del feed
+    """
+    return signing.dumps([kind, user.pk, _password_digest(user)], salt=FEED_SALT)
+
+
+def feed_user(token, kind):
+    """
+    Verifica il token di un link e restituisce l'utente proprietario.
+
+    Args:
+        token: Token ricevuto nell'URL
+        kind: Tipo di feed atteso
+
+    Returns:
+        User: Utente attivo proprietario del link, o None se il token non è valido
+    """
+    try:
+        token_kind, user_id, digest = signing.loads(token, salt=FEED_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if token_kind != kind:
+        return None
+    user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    if user is None or digest != _password_digest(user):
+        return None
+    return user
+
+
+def _escape(text):
+    """
+    Applica l'escape dei valori di testo (RFC 5545, 3.3.11).
+    """
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """
+    Spezza una riga in righe da al massimo 75 byte (RFC 5545, 3.1).
+    """
+    if len(line.encode()) <= 75:
+        return line + '\r\n'
+    parts = []
+    current = ''
+    size = 0
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > 75:
+            # Le righe di continuazione iniziano con uno spazio
+            parts.append(current)
+            current = ' '
+            size = 1
+        current += char
+        size += char_size
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _event(uid, start_date, end_date, summary, stamp, description=''):
+    """
+    Genera un evento di giornata intera.
+
+    Args:
+        uid: Identificativo stabile dell'evento
+        start_date: Primo giorno
+        end_date: Ultimo giorno (incluso)
+        summary: Titolo
+        stamp: Datetime aware dell'ultima modifica
+        description: Descrizione opzionale
+
+    Returns:
+        str: Righe dell'evento
+    """
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f"DTSTAMP:{stamp.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}",
+        f'DTSTART;VALUE=DATE:{start_date:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{end_date + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{_escape(summary)}',
+        'TRANSP:TRANSPARENT',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _request_summary(leave_request, audience, name):
+    """
+    Titolo di un'assenza: il feed personale mostra il tipo di assenza,
+    quello di reparto solo il nome del collega.
+    """
+    if audience == 'user':
+        summary = leave_request.leave_type.name
+    else:
+        summary = f"{name}: assente"
+    if leave_request.half_day:
+        summary += " (mezza giornata)"
+    return summary
+
+
+def _fragment_key(audience, user_id, name, version, reference_version):
+    digest = hashlib.sha1(repr((name, version, reference_version)).encode()).hexdigest()
+    return f'leaves:ical:{audience}:{user_id}:{digest}'
+
+
+def user_fragments(users, audience):
+    """
+    Restituisce i frammenti degli utenti indicati, rigenerando con una sola
+    query quelli mancanti in cache.
+
+    Args:
+        users: Tuple (id, nome, cognome) degli utenti
+        audience: 'user' (feed personale) o 'department' (feed di reparto)
+
+    Returns:
+        list: Frammenti nell'ordine degli utenti
+    """
+    reference_version = reference.reference_version()
+    versions = REQUEST_VERSIONS.get_many([('user', user_id) for user_id, _, _ in users])
+    keys = {}
+    names = {}
+    for user_id, first_name, last_name in users:
+        names[user_id] = f"{first_name} {last_name}".strip()
+        keys[user_id] = _fragment_key(
+            audience, user_id, names[user_id], versions[('user', user_id)], reference_version
+        )
+    fragments = cache.get_many(keys.values())
+
+    missing = [user_id for user_id, key in keys.items() if key not in fragments]
+    if missing:
+        events = {user_id: [] for user_id in missing}
+        for leave_request in (
+            LeaveRequest.objects
+            .filter(user_id__in=missing, status=FEED_STATUS)
+            .select_related('leave_type')
+            .order_by('start_date', 'id')
+        ):
+            events[leave_request.user_id].append(_event(
+                f'leave-{leave_request.pk}@hrease',
+                leave_request.start_date,
+                leave_request.end_date,
+                _request_summary(leave_request, audience, names[leave_request.user_id]),
+                leave_request.updated_at,
+                leave_request.reason if audience == 'user' else ''
+            ))
+        generated = {keys[user_id]: ''.join(events[user_id]) for user_id in missing}
+        cache.set_many(generated, timeout=FRAGMENT_TIMEOUT)
+        fragments.update(generated)
+    return [fragments[keys[user_id]] for user_id, _, _ in users]
+
+
+def holidays_fragment(year):
+    """
+    Restituisce il frammento delle festività degli anni intorno a quello indicato.
+
+    Args:
+        year: Anno centrale
+
+    Returns:
+        str: Eventi delle festività
+    """
+    key = f'leaves:ical:holidays:{reference.reference_version()}:{year}'
+    fragment = cache.get(key)
+    if fragment is None:
+        events = []
+        for current in range(year - HOLIDAY_YEARS_AROUND, year + HOLIDAY_YEARS_AROUND + 1):
+            for day, holiday in reference.holidays_in_year(current):
+                events.append(_event(
+                    f'holiday-{holiday.pk}-{current}@hrease',
+                    day, day, holiday.name,
+                    datetime.combine(day, time.min, tzinfo=timezone.utc),
+                    holiday.description
+                ))
+        fragment = ''.join(events)
+        cache.set(key, fragment, timeout=FRAGMENT_TIMEOUT)
+    return fragment
+
+
+class Feed:
+    """
+    Feed da pubblicare: validatore economico e contenuto generato su richiesta.
+    """
+
+    def __init__(self, name, users, audience):
+        """
+        Args:
+            name: Nome del calendario
+            users: Tuple (id, nome, cognome) degli utenti inclusi
+            audience: 'user' o 'department'
+        """
+        self.name = name
+        self.users = users
+        self.audience = audience
+        self.year = date.today().year
+
+    @property
+    def validator(self):
+        """
+        Returns:
+            tuple: Valore da cui derivare l'ETag del feed
+        """
+        versions = REQUEST_VERSIONS.get_many([('user', user_id) for user_id, _, _ in self.users])
+        return (
+            self.name, self.audience, self.year, reference.reference_version(),
+            tuple(self.users), tuple(versions[('user', user_id)] for user_id, _, _ in self.users)
+        )
+
+    def render(self):
+        """
+        Returns:
+            str: Contenuto del feed in formato iCalendar
+        """
+        header = ''.join(_fold(line) for line in (
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            f'PRODID:{PRODID}',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            f'X-WR-CALNAME:{_escape(self.name)}',
+        ))
+        return ''.join([
+            header,
+            holidays_fragment(self.year),
+            *user_fragments(self.users, self.audience),
+            'END:VCALENDAR\r\n',
+        ])
+
+
+def user_feed(user):
+    """
+    Args:
+        user: Utente proprietario
+
+    Returns:
+        Feed: Assenze approvate dell'utente e festività
+    """
+    return Feed(
+        f"Assenze - {user.first_name} {user.last_name}".strip(),
+        [(user.pk, user.first_name, user.last_name)],
+        'user'
+    )
+
+
+def department_feed(department):
+    """
+    Args:
+        department: Nome del reparto
+
+    Returns:
+        Feed: Assenze approvate dei dipendenti attivi del reparto e festività
+    """
+    users = list(
+        get_user_model().objects
+        .filter(department=department, is_active=True)
+        .order_by('last_name', 'first_name', 'id')
+        .values_list('id', 'first_name', 'last_name')
+    )
+    return Feed(f"Assenze - {department}", users, 'department')
@@ -0,0 +1,475 @@
+# backend/apps/leaves/imports.py
+"""
+Importazione massiva da CSV di festività e richieste di assenza storiche.
+
+Il file viene letto e validato riga per riga; email degli utenti e nomi dei
+tipi di assenza sono risolti con mappe in memoria caricate una sola volta.
+Le righe valide vengono caricate a blocchi con COPY su PostgreSQL e con
+bulk_create sugli altri database. Le righe scartate vengono riportate con
+numero di riga e motivo, senza interrompere l'importazione.
+
+Ogni blocco viene caricato in un savepoint: se il database rifiuta il blocco
+(es. vincolo di esclusione sulle sovrapposizioni), il blocco viene ripetuto
+riga per riga per isolare e scartare solo le righe in errore.
+
+Le righe caricate non passano da save(): al termine vengono invalidati il
+calendario dei giorni lavorativi (festività) oppure ricostruiti il registro
+dei saldi e il calendario delle presenze (richieste di assenza); in entrambi
+i casi i mesi coinvolti vengono segnati da ricalcolare nei report.
+"""
+
+import csv
+import io
+from datetime import datetime, time
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import reference, rollups
+from .availability import iter_months
+from .balances import STATUS_COLUMNS, holiday_keys, rebuild_keys
+from .models import ACTIVE_STATUSES, AbsenceCalendarMonth, Holiday, LeaveRequest, LeaveType
+from .versions import requests_changed
+from .work_calendar import invalidate_calendar
+
+# Righe caricate per blocco
+BATCH_SIZE = 5000
+
+# Righe scartate riportate nel dettaglio (il conteggio è sempre completo)
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'si', 'sì', 'y', 's', 'x'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+class CSVImportError(Exception):
+    """
+    File non importabile (es. colonne obbligatorie mancanti).
+    """
+
+
+class RowError(ValueError):
+    """
+    Riga non valida.
+    """
+
+
+class ImportResult:
+    """
+    Esito di un'importazione.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        """
+        Args:
+            line: Numero di riga nel file (l'intestazione è la riga 1)
+            message: Motivo dello scarto
+        """
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _parse_bool(value, column):
+    value = (value or '').strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"Valore non valido per '{column}': {value}")
+
+
+def _parse_date(value, column):
+    try:
+        parsed = parse_date((value or '').strip())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError(f"Data non valida per '{column}': {value}")
+    return parsed
+
+
+def _parse_datetime(value, column):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError(f"Data e ora non valide per '{column}': {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _reader(stream, required):
+    """
+    Args:
+        stream: File di testo CSV con intestazione
+        required: Colonne obbligatorie
+
+    Returns:
+        csv.DictReader: Lettore delle righe
+
+    Raises:
+        CSVImportError: Se mancano colonne obbligatorie
+    """
+    reader = csv.DictReader(stream)
+    columns = {(name or '').strip() for name in reader.fieldnames or ()}
+    missing = [column for column in required if column not in columns]
+    if missing:
+        raise CSVImportError(f"Colonne obbligatorie mancanti: {', '.join(missing)}")
+    reader.fieldnames = [(name or '').strip() for name in reader.fieldnames]
+    return reader
+
+
+class _Importer:
+    """
+    Base degli importatori: validazione in streaming e caricamento a blocchi.
+    """
+    model = None
+    columns = ()
+    required = ()
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.result = ImportResult()
+
+    def run(self, stream, dry_run=False):
+        """
+        Importa un file CSV in un'unica transazione.
+
+        Args:
+            stream: File di testo CSV
+            dry_run: Se True valida e carica, poi annulla la transazione
+
+        Returns:
+            ImportResult: Righe importate e scartate
+
+        Raises:
+            CSVImportError: Se il file non è importabile
+        """
+        reader = _reader(stream, self.required)
+        with transaction.atomic():
+            self.prepare()
+            batch = []
+            for row in reader:
+                line = reader.line_num
+                try:
+                    batch.append((line, self.validate(row)))
+                except RowError as e:
+                    self.result.reject(line, str(e))
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+            if self.result.imported:
+                self.finish()
+            if dry_run:
+                transaction.set_rollback(True)
+        return self.result
+
+    def prepare(self):
+        """
+        Carica le mappe di risoluzione prima della lettura del file.
+        """
+
+    def validate(self, row):
+        """
+        Args:
+            row: Riga del CSV
+
+        Returns:
+            tuple: Valori delle colonne di `columns`
+
+        Raises:
+            RowError: Se la riga non è valida
+        """
+        raise NotImplementedError
+
+    def check_batch(self, batch):
+        """
+        Controlli che richiedono il database o l'intero blocco.
+
+        Args:
+            batch: Coppie (riga, valori) validate
+
+        Returns:
+            list: Coppie accettate (le altre sono già state scartate)
+        """
+        return batch
+
+    def loaded(self, rows):
+        """
+        Chiamato per le righe caricate con successo.
+
+        Args:
+            rows: Valori delle colonne di `columns`
+        """
+
+    def finish(self):
+        """
+        Aggiorna le strutture derivate dopo il caricamento.
+        """
+
+    def _flush(self, batch):
+        batch = self.check_batch(batch)
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                self._load([values for _, values in batch])
+            self.result.imported += len(batch)
+            self.loaded([values for _, values in batch])
+            return
+        except DatabaseError:
+            pass
+        # Il blocco è stato rifiutato: si ripete riga per riga
+        for line, values in batch:
+            try:
+                with transaction.atomic():
+                    self._load([values])
+                self.result.imported += 1
+                self.loaded([values])
+            except DatabaseError as e:
+                self.result.reject(line, str(e).strip().splitlines()[0])
+
+    def _load(self, rows):
+        if connection.vendor == 'postgresql':
+            self._copy(rows)
+        else:
+            self.model.objects.bulk_create(
+                [self.model(**dict(zip(self.columns, values))) for values in rows]
+            )
+
+    def _copy(self, rows):
+        """
+        Carica le righe con COPY ... FROM STDIN in formato CSV.
+
+        Args:
+            rows: Valori delle colonne di `columns`
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for values in rows:
+            writer.writerow([_copy_value(value) for value in values])
+        buffer.seek(0)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        fields = [self.model._meta.get_field(column) for column in self.columns]
+        names = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        options = 'FORMAT csv'
+        # Nelle colonne di testo non nullabili il campo vuoto è una stringa vuota
+        not_null = [
+            connection.ops.quote_name(field.column) for field in fields
+            if not field.null and field.get_internal_type() in ('CharField', 'TextField')
+        ]
+        if not_null:
+            options += f", FORCE_NOT_NULL ({', '.join(not_null)})"
+        # Il cursore psycopg2 è usato direttamente: gli errori vanno convertiti
+        # nelle eccezioni di Django
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN WITH ({options})", buffer)
+
+
+def _copy_value(value):
+    """
+    Converte un valore nella rappresentazione CSV di COPY (campo vuoto non
+    quotato = NULL).
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class HolidayImporter(_Importer):
+    """
+    Importa festività dalle colonne name, date e, facoltative, description e
+    is_recurring. Le festività già presenti (stessa data e nome) vengono
+    scartate.
+    """
+    model = Holiday
+    columns = ('name', 'date', 'description', 'is_recurring')
+    required = ('name', 'date')
+
+    def prepare(self):
+        self.existing = set(Holiday.objects.values_list('date', Lower('name')))
+        self.holidays = set()
+
+    def validate(self, row):
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise RowError("Nome mancante")
+        if len(name) > Holiday._meta.get_field('name').max_length:
+            raise RowError("Nome troppo lungo")
+        day = _parse_date(row.get('date'), 'date')
+        key = (day, name.lower())
+        if key in self.existing:
+            raise RowError(f"Festività già presente: {name} ({day})")
+        self.existing.add(key)
+        is_recurring = _parse_bool(row.get('is_recurring') or 'true', 'is_recurring')
+        return (name, day, (row.get('description') or '').strip(), is_recurring)
+
+    def loaded(self, rows):
+        self.holidays.update((day, is_recurring) for _, day, _, is_recurring in rows)
+
+    def finish(self):
+        transaction.on_commit(invalidate_calendar)
+        transaction.on_commit(reference.invalidate_reference)
+        for day, is_recurring in {(day.replace(day=1), is_recurring) for day, is_recurring in self.holidays}:
+            rollups.mark_holiday(day, is_recurring)
+        # Le durate delle richieste che contengono le nuove festività cambiano
+        rebuild_keys(holiday_keys(self.holidays), fresh_calendar=True)
+
+
+class LeaveRequestImporter(_Importer):
+    """
+    Importa richieste di assenza storiche dalle colonne email, leave_type,
+    start_date, end_date e, facoltative, half_day, status (default
+    'approved'), reason e approval_date.
+
+    Le richieste attive non possono sovrapporsi tra loro né a quelle già
+    presenti per lo stesso utente.
+    """
+    model = LeaveRequest
+    columns = (
+        'user_id', 'leave_type_id', 'start_date', 'end_date', 'half_day', 'reason',
+        'status', 'approval_date', 'created_at', 'updated_at'
+    )
+    required = ('email', 'leave_type', 'start_date', 'end_date')
+
+    def prepare(self):
+        self.users = dict(get_user_model().objects.values_list(Lower('email'), 'id'))
+        self.leave_types = dict(LeaveType.objects.values_list(Lower('name'), 'id'))
+        self.statuses = {choice for choice, _ in LeaveRequest.STATUS_CHOICES}
+        self.now = timezone.now()
+        self.user_ids = set()
+        self.months = set()
+        self.balance_keys = set()
+
+    def validate(self, row):
+        email = (row.get('email') or '').strip().lower()
+        user_id = self.users.get(email)
+        if user_id is None:
+            raise RowError(f"Utente non trovato: {email}")
+        leave_type = (row.get('leave_type') or '').strip()
+        leave_type_id = self.leave_types.get(leave_type.lower())
+        if leave_type_id is None:
+            raise RowError(f"Tipo di assenza non trovato: {leave_type}")
+        start_date = _parse_date(row.get('start_date'), 'start_date')
+        end_date = _parse_date(row.get('end_date'), 'end_date')
+        if end_date < start_date:
+            raise RowError("La data di fine non può precedere la data di inizio")
+        status = (row.get('status') or 'approved').strip().lower()
+        if status not in self.statuses:
+            raise RowError(f"Stato non valido: {status}")
+        return (
+            user_id, leave_type_id, start_date, end_date,
+            _parse_bool(row.get('half_day'), 'half_day'),
+            (row.get('reason') or '').strip(),
+            status,
+            _parse_datetime(row.get('approval_date'), 'approval_date'),
+            self.now, self.now
+        )
+
+    def check_batch(self, batch):
+        """
+        Scarta le richieste attive che si sovrappongono ad altre del blocco o
+        a quelle già presenti (compresi i blocchi precedenti), con una sola
+        query per blocco.
+        """
+        active = [(line, values) for line, values in batch if values[6] in ACTIVE_STATUSES]
+        if not active:
+            return batch
+        existing = {}
+        for user_id, start_date, end_date in LeaveRequest.objects.active().filter(
+            user_id__in={values[0] for _, values in active},
+            start_date__lte=max(values[3] for _, values in active),
+            end_date__gte=min(values[2] for _, values in active)
+        ).values_list('user_id', 'start_date', 'end_date'):
+            existing.setdefault(user_id, []).append((start_date, end_date))
+
+        rejected = set()
+        accepted = {}
+        for line, values in sorted(active, key=lambda item: (item[1][0], item[1][2])):
+            user_id, _, start_date, end_date = values[:4]
+            if any(start <= end_date and start_date <= end for start, end in existing.get(user_id, ())):
+                self.result.reject(line, "Il periodo si sovrappone a una richiesta già presente")
+                rejected.add(line)
+                continue
+            # Ordinate per inizio: basta confrontare l'ultima accettata
+            previous = accepted.get(user_id)
+            if previous is not None and start_date <= previous:
+                self.result.reject(line, "Il periodo si sovrappone a un'altra riga del file")
+                rejected.add(line)
+                continue
+            accepted[user_id] = max(end_date, previous or end_date)
+        accepted_batch = [(line, values) for line, values in batch if line not in rejected]
+        self.user_ids.update(values[0] for _, values in accepted_batch)
+        return accepted_batch
+
+    def loaded(self, rows):
+        for values in rows:
+            user_id, leave_type_id, start_date, end_date = values[:4]
+            if values[6] in STATUS_COLUMNS:
+                self.balance_keys.update(
+                    (user_id, leave_type_id, year) for year in range(start_date.year, end_date.year + 1)
+                )
+            if values[6] == rollups.ROLLUP_STATUS:
+                self.months.update(iter_months(start_date, end_date))
+
+    def finish(self):
+        # Le righe non passano da save(): si ricalcolano solo le righe del
+        # registro toccate dall'importazione
+        rebuild_keys(self.balance_keys)
+        departments = set(
+            get_user_model().objects.filter(pk__in=self.user_ids)
+            .exclude(department='')
+            .values_list('department', flat=True)
+        )
+        AbsenceCalendarMonth.objects.filter(department__in=departments).delete()
+        rollups.mark_months(self.months)
+        requests_changed(self.user_ids)
+
+
+IMPORTERS = {
+    'holidays': HolidayImporter,
+    'leave_requests': LeaveRequestImporter,
+}
+
+
+def import_csv(kind, stream, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Importa un file CSV.
+
+    Args:
+        kind: Chiave di IMPORTERS ('holidays' o 'leave_requests')
+        stream: File di testo CSV con intestazione
+        dry_run: Se True annulla l'importazione dopo la validazione
+        batch_size: Righe per blocco
+
+    Returns:
+        ImportResult: Righe importate e scartate
+
+    Raises:
+        CSVImportError: Se il file non è importabile
+    """
+    return IMPORTERS[kind](batch_size=batch_size).run(stream, dry_run=dry_run)
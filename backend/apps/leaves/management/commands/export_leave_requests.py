@@ -0,0 +1,79 @@
+# backend/apps/leaves/management/commands/export_leave_requests.py
+"""
+Esporta su file le richieste di assenza di un periodo, in CSV o XLSX.
+
+Le righe vengono lette e scritte a blocchi (vedi apps/leaves/exports.py),
+quindi l'esportazione di milioni di righe usa la stessa memoria di poche.
+
+Esempi:
+    python manage.py export_leave_requests --from 2025-01-01 --to 2025-01-31
+    python manage.py export_leave_requests --from 2025-01-01 --to 2025-12-31 \\
+        --status approved --format xlsx --output assenze_2025.xlsx
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.leaves import exports
+from apps.leaves.models import LeaveRequest
+
+
+def _date(value):
+    """
+    Args:
+        value: Data in formato YYYY-MM-DD
+
+    Returns:
+        date: Data convertita
+
+    Raises:
+        ValueError: Se la data non è valida
+    """
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Esporta le richieste di assenza di un periodo in CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start_date', type=_date, required=True,
+                            help='Inizio del periodo (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end_date', type=_date, required=True,
+                            help='Fine del periodo, inclusa (YYYY-MM-DD)')
+        parser.add_argument('--status', action='append', default=None,
+                            choices=[choice for choice, _ in LeaveRequest.STATUS_CHOICES],
+                            help='Stato da includere (ripetibile, default: tutti)')
+        parser.add_argument('--format', dest='export_format', choices=exports.EXPORT_FORMATS, default='csv',
+                            help='Formato del file (default: csv)')
+        parser.add_argument('--output', default=None,
+                            help='File di destinazione (default: stdout, solo per CSV)')
+
+    def handle(self, *args, **options):
+        start_date = options['start_date']
+        end_date = options['end_date']
+        if end_date < start_date:
+            raise CommandError('--to non può precedere --from')
+
+        queryset = exports.export_queryset(start_date, end_date, options['status'])
+        output = options['output']
+
+        if options['export_format'] == 'xlsx':
+            if not output:
+                raise CommandError("L'esportazione XLSX richiede --output")
+            try:
+                count = exports.write_xlsx(queryset, start_date, end_date, output)
+            except exports.ExportError as e:
+                raise CommandError(str(e))
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as handle:
+                count = exports.write_csv(queryset, start_date, end_date, handle)
+        else:
+            count = exports.write_csv(queryset, start_date, end_date, sys.stdout)
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Esportate {count} richieste in {output}"))
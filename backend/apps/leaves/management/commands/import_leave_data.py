@@ -0,0 +1,50 @@
+# backend/apps/leaves/management/commands/import_leave_data.py
+"""
+Importa da CSV festività o richieste di assenza storiche.
+
+Le righe valide vengono caricate a blocchi (COPY su PostgreSQL), quelle non
+valide vengono elencate senza interrompere l'importazione (vedi
+apps/leaves/imports.py per le colonne accettate).
+
+Esempi:
+    python manage.py import_leave_data holidays festivita.csv
+    python manage.py import_leave_data leave_requests storico.csv --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.leaves.imports import BATCH_SIZE, IMPORTERS, CSVImportError, import_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa da CSV festività o richieste di assenza storiche'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS),
+                            help='Tipo di dati da importare')
+        parser.add_argument('path', help='File CSV (UTF-8, con intestazione)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Righe caricate per blocco (default: {BATCH_SIZE})')
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Valida e carica il file, poi annulla l'importazione")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                result = import_csv(
+                    options['kind'], stream,
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size']
+                )
+        except (OSError, CSVImportError) as e:
+            raise CommandError(str(e))
+
+        for line, message in result.errors:
+            self.stderr.write(f"Riga {line}: {message}")
+        if result.rejected > len(result.errors):
+            self.stderr.write(f"... e altre {result.rejected - len(result.errors)} righe scartate")
+
+        summary = f"Importate {result.imported} righe, scartate {result.rejected}"
+        if options['dry_run']:
+            summary += " (dry run, nessuna modifica salvata)"
+        self.stdout.write(self.style.SUCCESS(summary))
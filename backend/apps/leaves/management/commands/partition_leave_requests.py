@@ -0,0 +1,71 @@
+# backend/apps/leaves/management/commands/partition_leave_requests.py
+"""
+Gestisce il partizionamento annuale della tabella delle richieste di assenza
+(solo PostgreSQL, vedi apps/leaves/partitions.py).
+
+Senza opzioni crea le partizioni mancanti dall'anno corrente fino a
+FUTURE_YEARS anni avanti: va eseguito periodicamente, ad esempio una volta
+al mese da cron. La conversione della tabella esistente va eseguita una
+sola volta, in una finestra di manutenzione: la tabella resta bloccata per
+tutta la copia dei dati. Dopo la conversione i processi dell'applicazione
+vanno riavviati, così i salvataggi iniziano a controllare le sovrapposizioni
+tra partizioni diverse, che il vincolo di esclusione non copre.
+
+Esempi:
+    python manage.py partition_leave_requests --convert
+    python manage.py partition_leave_requests
+    python manage.py partition_leave_requests --detach-before 2020
+    python manage.py partition_leave_requests --status
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.leaves import partitions
+
+
+class Command(BaseCommand):
+    help = 'Partiziona per anno la tabella delle richieste di assenza e archivia gli anni chiusi'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Converte la tabella esistente in una tabella partizionata')
+        parser.add_argument('--future-years', type=int, default=partitions.FUTURE_YEARS,
+                            help='Anni futuri per cui creare le partizioni')
+        parser.add_argument('--detach-before', type=int, default=None, metavar='YEAR',
+                            help='Stacca e archivia le partizioni degli anni precedenti')
+        parser.add_argument('--archive-schema', default=partitions.ARCHIVE_SCHEMA,
+                            help='Schema in cui spostare le partizioni staccate')
+        parser.add_argument('--status', action='store_true',
+                            help='Mostra solo le partizioni esistenti')
+
+    def handle(self, *args, **options):
+        try:
+            if options['status']:
+                self.show_partitions()
+                return
+
+            if options['convert']:
+                years = partitions.convert_table(future_years=options['future_years'])
+                self.stdout.write(f"Tabella convertita, partizioni {years[0]}-{years[-1]}")
+            else:
+                created = partitions.ensure_partitions(future_years=options['future_years'])
+                for year in created:
+                    self.stdout.write(f"Partizione {partitions.partition_name(year)} creata")
+
+            if options['detach_before'] is not None:
+                for year, message in partitions.detach_before(
+                    options['detach_before'], archive_schema=options['archive_schema']
+                ):
+                    self.stdout.write(f"{year}: {message}")
+        except partitions.PartitionError as exc:
+            raise CommandError(str(exc))
+
+        self.show_partitions()
+        self.stdout.write(self.style.SUCCESS("Partizionamento aggiornato"))
+
+    def show_partitions(self):
+        if not partitions.is_partitioned():
+            self.stdout.write(f"La tabella {partitions.TABLE} non è partizionata")
+            return
+        for name, bounds, rows in partitions.list_partitions():
+            self.stdout.write(f"{name}: {bounds} (circa {max(rows, 0)} righe)")
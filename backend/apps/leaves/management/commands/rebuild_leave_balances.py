@@ -0,0 +1,101 @@
+# backend/apps/leaves/management/commands/rebuild_leave_balances.py
+"""
+Ricostruisce da zero il registro dei saldi (LeaveBalance) a partire dalle
+richieste di assenza, oppure, con --check, ne verifica la coerenza.
+
+I giorni assegnati (allocated) delle righe esistenti non vengono modificati;
+le righe mancanti vengono create con i giorni maturati
+(apps/leaves/accruals.py, allocated_days).
+
+Esempi:
+    python manage.py rebuild_leave_balances --check
+    python manage.py rebuild_leave_balances --year 2025
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.leaves.accruals import allocated_days
+from apps.leaves.balances import compute_balances
+from apps.leaves.models import LeaveBalance, LeaveType
+
+ZERO = Decimal('0')
+
+
+class Command(BaseCommand):
+    help = 'Ricostruisce il registro dei saldi di assenza o ne verifica la coerenza'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Segnala le differenze senza modificare il registro')
+        parser.add_argument('--year', type=int, default=None,
+                            help='Limita la ricostruzione a un anno')
+
+    def handle(self, *args, **options):
+        year = options['year']
+        check = options['check']
+
+        with transaction.atomic():
+            expected = compute_balances(year)
+            balances = LeaveBalance.objects.select_for_update()
+            if year is not None:
+                balances = balances.filter(year=year)
+
+            now = timezone.now()
+            drift = []
+            to_update = []
+            for balance in balances:
+                key = (balance.user_id, balance.leave_type_id, balance.year)
+                totals = expected.pop(key, {'used': ZERO, 'pending': ZERO})
+                if balance.used != totals['used'] or balance.pending != totals['pending']:
+                    drift.append((key, balance.used, balance.pending, totals['used'], totals['pending']))
+                    balance.used = totals['used']
+                    balance.pending = totals['pending']
+                    balance.updated_at = now
+                    to_update.append(balance)
+
+            # Chiavi con richieste ma senza riga nel registro
+            allowances = dict(LeaveType.objects.values_list('id', 'annual_allowance'))
+            hire_dates = dict(
+                get_user_model().objects.filter(pk__in={user_id for user_id, _, _ in expected})
+                .values_list('pk', 'hire_date')
+            )
+            to_create = []
+            for key, totals in expected.items():
+                if totals['used'] or totals['pending']:
+                    drift.append((key, None, None, totals['used'], totals['pending']))
+                    user_id, leave_type_id, row_year = key
+                    to_create.append(LeaveBalance(
+                        user_id=user_id,
+                        leave_type_id=leave_type_id,
+                        year=row_year,
+                        allocated=allocated_days(
+                            hire_dates.get(user_id), allowances.get(leave_type_id), row_year
+                        ),
+                        used=totals['used'],
+                        pending=totals['pending']
+                    ))
+
+            for (user_id, leave_type_id, row_year), used, pending, exp_used, exp_pending in drift:
+                current = 'mancante' if used is None else f"used={used} pending={pending}"
+                self.stdout.write(
+                    f"user={user_id} leave_type={leave_type_id} year={row_year}: "
+                    f"{current} -> used={exp_used} pending={exp_pending}"
+                )
+
+            if check:
+                if drift:
+                    raise CommandError(f"{len(drift)} saldi non coerenti con le richieste di assenza")
+                self.stdout.write(self.style.SUCCESS('Registro dei saldi coerente'))
+                return
+
+            LeaveBalance.objects.bulk_update(to_update, ['used', 'pending', 'updated_at'], batch_size=1000)
+            LeaveBalance.objects.bulk_create(to_create, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registro ricostruito: {len(to_update)} righe corrette, {len(to_create)} create"
+        ))
@@ -0,0 +1,48 @@
+# backend/apps/leaves/management/commands/refresh_absence_rollups.py
+"""
+Ricalcola gli aggregati mensili delle assenze (AbsenceRollup) dei mesi
+segnati come da ricalcolare.
+
+Più istanze del comando possono girare in parallelo: ogni mese viene preso
+da una sola istanza (vedi apps/leaves/rollups.py). Va eseguito
+periodicamente, ad esempio ogni pochi minuti da cron.
+
+Esempi:
+    python manage.py refresh_absence_rollups
+    python manage.py refresh_absence_rollups --month 2025-03
+    python manage.py refresh_absence_rollups --all
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.leaves import rollups
+
+
+class Command(BaseCommand):
+    help = 'Ricalcola gli aggregati mensili delle assenze dei mesi modificati'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', action='append', default=[],
+                            help='Segna anche questo mese (YYYY-MM, ripetibile)')
+        parser.add_argument('--all', action='store_true',
+                            help='Segna tutti i mesi con richieste approvate o aggregati esistenti')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Numero massimo di mesi da ricalcolare')
+
+    def handle(self, *args, **options):
+        months = []
+        for value in options['month']:
+            try:
+                months.append(datetime.strptime(value, '%Y-%m').date())
+            except ValueError:
+                raise CommandError(f"Mese non valido: {value} (formato YYYY-MM)")
+        rollups.mark_months(months)
+        if options['all']:
+            self.stdout.write(f"Segnati {rollups.mark_all()} mesi")
+
+        refreshed = rollups.refresh_dirty(limit=options['limit'])
+        for month in refreshed:
+            self.stdout.write(f"{month:%Y-%m} ricalcolato")
+        self.stdout.write(self.style.SUCCESS(f"Ricalcolati {len(refreshed)} mesi"))
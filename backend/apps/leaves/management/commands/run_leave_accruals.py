@@ -0,0 +1,138 @@
+# backend/apps/leaves/management/commands/run_leave_accruals.py
+"""
+Matura i giorni di assenza del mese per tutti gli utenti attivi e aggiorna
+i giorni assegnati del registro dei saldi (vedi apps/leaves/accruals.py).
+
+Va eseguito una volta al mese, ad esempio da cron il primo giorno del mese
+successivo. Ripetere il comando con la stessa chiave è sicuro: un'esecuzione
+interrotta riprende dai blocchi mancanti, una completata non viene ripetuta
+(salvo --force).
+
+Con --benchmark N il comando crea N utenti sintetici (e tre tipi di assenza
+sintetici se nessun tipo ha giorni annui), ne esegue la maturazione con una
+chiave dedicata, riporta la velocità ed elimina tutti i dati creati.
+
+Esempi:
+    python manage.py run_leave_accruals --month 2025-03
+    python manage.py run_leave_accruals --month 2025-03 --workers 8
+    python manage.py run_leave_accruals --benchmark 200000 --workers 8
+"""
+
+import os
+import random
+import time
+import uuid
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.leaves.accruals import CHUNK_SIZE, AccrualError, run_accruals
+from apps.leaves.models import LeaveAccrualRun, LeaveBalance, LeaveType
+
+
+class Command(BaseCommand):
+    help = 'Matura i giorni di assenza del mese e aggiorna il registro dei saldi'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', default=None,
+                            help='Mese da maturare (YYYY-MM, default: mese corrente)')
+        parser.add_argument('--key', default=None,
+                            help='Chiave di idempotenza (default: accrual-YYYY-MM)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processi di calcolo (default: numero di CPU)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f'Utenti per blocco (default: {CHUNK_SIZE})')
+        parser.add_argument('--force', action='store_true',
+                            help="Ripete un'esecuzione già completata")
+        parser.add_argument('--benchmark', type=int, default=None, metavar='USERS',
+                            help='Misura la velocità su un numero di utenti sintetici')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f"Mese non valido: {options['month']} (formato YYYY-MM)")
+        else:
+            month = date.today().replace(day=1)
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--workers e --chunk-size devono essere positivi")
+
+        if options['benchmark'] is not None:
+            self.benchmark(month, options['benchmark'], options['workers'], options['chunk_size'])
+            return
+
+        try:
+            result = run_accruals(
+                month,
+                key=options['key'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                force=options['force']
+            )
+        except AccrualError as e:
+            raise CommandError(str(e))
+
+        if result.already_completed:
+            self.stdout.write(f"Maturazione {result.run.key} già completata il {result.run.finished_at:%Y-%m-%d %H:%M}")
+            return
+        self.report(result)
+
+    def report(self, result):
+        if result.skipped_chunks:
+            self.stdout.write(f"{result.skipped_chunks} blocchi già completati in precedenza")
+        self.stdout.write(
+            f"{result.users} utenti, {result.rows} saldi in {result.seconds:.2f}s "
+            f"({result.users_per_second:.0f} utenti/s, {result.rows_per_second:.0f} saldi/s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Maturazione {result.run.key} completata"))
+
+    def benchmark(self, month, count, workers, chunk_size):
+        """
+        Crea utenti sintetici, ne misura la maturazione e li elimina.
+        """
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        prefix = f'accrual-benchmark-{tag}-'
+        password = make_password(None)
+        first_hire = month.replace(year=month.year - 10).toordinal()
+        last_hire = month.toordinal() + 60
+
+        started = time.perf_counter()
+        User.objects.bulk_create(
+            [
+                User(
+                    email=f'{prefix}{index}@example.invalid',
+                    username=f'{prefix}{index}',
+                    password=password,
+                    first_name='Benchmark',
+                    last_name=str(index),
+                    hire_date=date.fromordinal(random.randint(first_hire, last_hire)),
+                )
+                for index in range(count)
+            ],
+            batch_size=5000
+        )
+        self.stdout.write(f"Creati {count} utenti sintetici in {time.perf_counter() - started:.2f}s")
+        leave_types = []
+        if not LeaveType.objects.filter(annual_allowance__isnull=False).exists():
+            leave_types = [
+                LeaveType.objects.create(name=f'{prefix}{name}', annual_allowance=allowance)
+                for name, allowance in (('ferie', 26), ('permessi', 12), ('studio', 5))
+            ]
+
+        users = User.objects.filter(email__startswith=prefix)
+        key = f'benchmark-{tag}'
+        try:
+            result = run_accruals(month, key=key, workers=workers, chunk_size=chunk_size, users=users)
+            self.report(result)
+        except AccrualError as e:
+            raise CommandError(str(e))
+        finally:
+            LeaveBalance.objects.filter(user__in=users).delete()
+            users.delete()
+            for leave_type in leave_types:
+                leave_type.delete()
+            LeaveAccrualRun.objects.filter(key=key).delete()
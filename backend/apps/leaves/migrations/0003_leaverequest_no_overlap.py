@@ -0,0 +1,64 @@
+# Vincolo di esclusione sulle richieste di assenza sovrapposte (solo Postgres)
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+ADD_CONSTRAINT = """
+ALTER TABLE leaves_leaverequest
+ADD CONSTRAINT leaverequest_no_overlap
+EXCLUDE USING gist (user_id WITH =, daterange(start_date, end_date, '[]') WITH &&)
+WHERE (status IN ('pending', 'approved'))
+"""
+
+DROP_CONSTRAINT = "ALTER TABLE leaves_leaverequest DROP CONSTRAINT IF EXISTS leaverequest_no_overlap"
+
+FIND_OVERLAPS = """
+SELECT a.id, b.id
+FROM leaves_leaverequest a
+JOIN leaves_leaverequest b
+  ON a.user_id = b.user_id AND a.id < b.id
+ AND a.start_date <= b.end_date AND b.start_date <= a.end_date
+WHERE a.status IN ('pending', 'approved') AND b.status IN ('pending', 'approved')
+LIMIT 10
+"""
+
+
+def add_constraint(apps, schema_editor):
+    """
+    Crea il vincolo di esclusione, segnalando prima eventuali sovrapposizioni
+    già presenti che ne impedirebbero la creazione.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        # Sugli altri database le sovrapposizioni sono controllate solo
+        # da LeaveRequest.clean()
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FIND_OVERLAPS)
+        overlaps = cursor.fetchall()
+    if overlaps:
+        pairs = ', '.join(f"{a}/{b}" for a, b in overlaps)
+        raise RuntimeError(
+            f"Richieste di assenza attive sovrapposte (id {pairs}): "
+            "correggerle prima di applicare la migrazione"
+        )
+    schema_editor.execute(ADD_CONSTRAINT)
+
+
+def drop_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0002_leave_balance'),
+    ]
+
+    operations = [
+        # btree_gist permette di combinare l'uguaglianza su user_id con
+        # l'intersezione di intervalli nello stesso indice GiST
+        BtreeGistExtension(),
+        migrations.RunPython(add_constraint, drop_constraint),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0003_leaverequest_no_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceCalendarMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=100)),
+                ('month', models.DateField()),
+                ('absences', models.JSONField(default=dict)),
+                ('half_days', models.JSONField(default=dict)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='absencecalendarmonth',
+            constraint=models.UniqueConstraint(fields=('department', 'month'), name='unique_absence_calendar_month'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-17 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0005_leaverequest_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceRollupDirtyMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AbsenceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(blank=True, max_length=100)),
+                ('leave_type_name', models.CharField(max_length=100)),
+                ('is_paid', models.BooleanField()),
+                ('month', models.DateField()),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('days', models.DecimalField(decimal_places=1, default=0, max_digits=9)),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='leaves.leavetype')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='absencerollup',
+            constraint=models.UniqueConstraint(fields=('month', 'department', 'leave_type'), name='unique_absence_rollup'),
+        ),
+    ]
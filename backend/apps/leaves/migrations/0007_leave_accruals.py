@@ -0,0 +1,44 @@
+# Generated by Django 5.0.2 on 2026-10-17 23:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0006_absence_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveAccrualRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('running', 'In corso'), ('completed', 'Completata'), ('failed', 'Fallita')], default='running', max_length=20)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveAccrualChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_user_id', models.PositiveIntegerField()),
+                ('last_user_id', models.PositiveIntegerField()),
+                ('user_ids', models.JSONField(default=list)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='leaves.leaveaccrualrun')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='leaveaccrualchunk',
+            constraint=models.UniqueConstraint(fields=('run', 'first_user_id'), name='unique_accrual_chunk'),
+        ),
+    ]
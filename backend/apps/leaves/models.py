@@ -1,5 +1,6 @@
 # backend/apps/leaves/models.py
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, models, transaction
 from django.conf import settings
 
 class LeaveType(models.Model):
@@ -8,12 +9,15 @@ class LeaveType(models.Model):
     Ad esempio: ferie, malattia, permessi, ecc.
     
     Ogni tipo di assenza ha un nome, una descrizione, un indicatore
-    per specificare se è retribuito e un codice colore per la UI.
+    per specificare se è retribuito, un codice colore per la UI e,
+    facoltativamente, i giorni assegnati ogni anno a ciascun utente.
     """
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     is_paid = models.BooleanField(default=True)
     color_code = models.CharField(max_length=7, default='#3498db')  # Colore per la UI
+    # Giorni assegnati ogni anno a ciascun utente (vuoto = nessun limite)
+    annual_allowance = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True)
     
     def __str__(self):
         """
@@ -24,6 +28,76 @@ class LeaveType(models.Model):
         """
         return self.name
 
+# Stati che occupano il calendario dell'utente: due richieste attive non
+# possono sovrapporsi (vincolo di esclusione su Postgres, migrazione 0003)
+ACTIVE_STATUSES = ('pending', 'approved')
+
+# Nome del vincolo di esclusione creato dalla migrazione 0003
+OVERLAP_CONSTRAINT = 'leaverequest_no_overlap'
+
+
+def _violates_overlap_constraint(error):
+    """
+    Args:
+        error: IntegrityError sollevato dal database
+
+    Returns:
+        bool: True se l'errore è una violazione di OVERLAP_CONSTRAINT
+    """
+    diag = getattr(error.__cause__, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None)
+    if constraint is not None:
+        return constraint == OVERLAP_CONSTRAINT
+    return OVERLAP_CONSTRAINT in str(error)
+
+
+class LeaveRequestQuerySet(models.QuerySet):
+    """
+    QuerySet delle richieste di assenza con le interrogazioni più comuni.
+    """
+    
+    def active(self):
+        """
+        Returns:
+            QuerySet: Richieste in attesa o approvate
+        """
+        return self.filter(status__in=ACTIVE_STATUSES)
+    
+    def overlapping(self, user, start_date, end_date, exclude_pk=None):
+        """
+        Restituisce le richieste attive di un utente che si sovrappongono a un periodo.
+        
+        Su Postgres il filtro usa la stessa espressione daterange del vincolo
+        di esclusione, così viene risolto dal suo indice GiST; sugli altri
+        database (SQLite in sviluppo) si usa il confronto tra le date.
+        
+        Args:
+            user: Utente (o suo ID)
+            start_date: Inizio del periodo (incluso)
+            end_date: Fine del periodo (inclusa)
+            exclude_pk: ID di una richiesta da ignorare (es. quella in modifica)
+            
+        Returns:
+            QuerySet: Richieste in conflitto
+        """
+        queryset = self.active().filter(user=user)
+        if connections[self.db].vendor == 'postgresql':
+            from django.contrib.postgres.fields import DateRangeField
+            from psycopg2.extras import DateRange
+            queryset = queryset.annotate(
+                period=models.Func(
+                    models.F('start_date'), models.F('end_date'), models.Value('[]'),
+                    function='daterange',
+                    output_field=DateRangeField()
+                )
+            ).filter(period__overlap=DateRange(start_date, end_date, '[]'))
+        else:
+            queryset = queryset.filter(start_date__lte=end_date, end_date__gte=start_date)
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        return queryset
+
+
 class LeaveRequest(models.Model):
     """
     Rappresenta una richiesta di assenza da parte di un dipendente.
@@ -63,6 +137,17 @@ class LeaveRequest(models.Model):
     )
     approval_date = models.DateTimeField(null=True, blank=True)
     
+    objects = LeaveRequestQuerySet.as_manager()
+    
+    class Meta:
+        # Indici per la paginazione keyset su (start_date, id) dell'elenco,
+        # con e senza i filtri più comuni (vedi views.LeaveRequestListView)
+        indexes = [
+            models.Index(fields=['start_date', 'id'], name='leaverequest_start_idx'),
+            models.Index(fields=['user', 'start_date', 'id'], name='leaverequest_user_start_idx'),
+            models.Index(fields=['status', 'start_date', 'id'], name='leaverequest_status_start_idx'),
+        ]
+    
     def __str__(self):
         """
         Restituisce una rappresentazione leggibile della richiesta di assenza.
@@ -72,21 +157,168 @@ class LeaveRequest(models.Model):
         """
         return f"{self.user} - {self.leave_type} ({self.start_date} to {self.end_date})"
     
+    def clean(self):
+        """
+        Verifica che la richiesta non si sovrapponga ad altre richieste attive
+        dell'utente e che l'utente abbia giorni sufficienti.
+        
+        Raises:
+            ValidationError: Se le date non sono valide, se ci sono
+                             sovrapposizioni o se il saldo non è sufficiente
+        """
+        from .balances import LEDGER_FIELDS, validate_balance
+        from .reference import get_leave_type
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': "La data di fine non può precedere la data di inizio"})
+        if self.status not in ACTIVE_STATUSES or not (self.user_id and self.leave_type_id and self.start_date and self.end_date):
+            return
+        conflicts = list(
+            LeaveRequest.objects.overlapping(self.user_id, self.start_date, self.end_date, exclude_pk=self.pk)
+            .values_list('start_date', 'end_date')[:3]
+        )
+        if conflicts:
+            periods = ', '.join(f"{start} - {end}" for start, end in conflicts)
+            raise ValidationError(f"Il periodo si sovrappone ad altre richieste di assenza ({periods})")
+        previous = None
+        if self.pk is not None:
+            previous = LeaveRequest.objects.filter(pk=self.pk).values_list(*LEDGER_FIELDS).first()
+        # Il tipo di assenza viene letto dalla cache dei dati di riferimento
+        leave_type = get_leave_type(self.leave_type_id) or self.leave_type
+        validate_balance(
+            self.user_id, leave_type, self.start_date, self.end_date,
+            self.half_day, previous=previous
+        )
+    
+    def save(self, *args, **kwargs):
+        """
+        Salva la richiesta e aggiorna nella stessa transazione il registro dei
+        saldi, il calendario delle presenze e i mesi da ricalcolare nei report.
+        
+        Lo stato precedente viene riletto con un lock sulla riga, così
+        salvataggi concorrenti della stessa richiesta non alterano il registro.
+        
+        Su una tabella partizionata il vincolo di esclusione non confronta
+        richieste in partizioni diverse: le sovrapposizioni di una richiesta
+        attiva vengono controllate qui, sotto lock della riga dell'utente
+        (vedi partitions.py).
+        
+        Raises:
+            ValidationError: Se il periodo si sovrappone ad altre richieste
+                             attive (vincolo di esclusione o, su una tabella
+                             partizionata, controllo sotto lock)
+        """
+        from . import availability, partitions, rollups
+        from .balances import LEDGER_FIELDS, apply_change
+        from .versions import requests_changed
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {
+            field.removesuffix('_id') for field in update_fields
+        } & {field.removesuffix('_id') for field in LEDGER_FIELDS}:
+            # Nessun campo rilevante per il registro
+            super().save(*args, **kwargs)
+            requests_changed([self.user_id])
+            return
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None and not self._state.adding:
+                previous = (
+                    LeaveRequest.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list(*LEDGER_FIELDS)
+                    .first()
+                )
+            if self.status in ACTIVE_STATUSES and partitions.overlap_check_required():
+                self._check_overlaps_locked()
+            try:
+                # Savepoint: la violazione del vincolo non invalida la
+                # transazione del chiamante
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except IntegrityError as e:
+                if not _violates_overlap_constraint(e):
+                    raise
+                raise ValidationError("Il periodo si sovrappone ad altre richieste di assenza") from e
+            current = tuple(getattr(self, field) for field in LEDGER_FIELDS)
+            apply_change(previous, current)
+            availability.apply_change(previous, current)
+            rollups.mark_changes([(previous, current)])
+            requests_changed([self.user_id] + ([previous[0]] if previous else []))
+    
+    def _check_overlaps_locked(self):
+        """
+        Controlla le sovrapposizioni con il lock sulla riga dell'utente, che
+        serializza i salvataggi concorrenti delle sue richieste.
+        
+        Raises:
+            ValidationError: Se il periodo si sovrappone ad altre richieste attive
+        """
+        from django.contrib.auth import get_user_model
+        list(get_user_model().objects.select_for_update().filter(pk=self.user_id).values_list('pk'))
+        if LeaveRequest.objects.overlapping(self.user_id, self.start_date, self.end_date, exclude_pk=self.pk).exists():
+            raise ValidationError("Il periodo si sovrappone ad altre richieste di assenza")
+    
+    def delete(self, *args, **kwargs):
+        """
+        Elimina la richiesta e ne rimuove il contributo dal registro dei saldi,
+        dal calendario delle presenze e dai report.
+        """
+        from . import availability, rollups
+        from .balances import LEDGER_FIELDS, apply_change
+        from .versions import requests_changed
+        with transaction.atomic():
+            previous = (
+                LeaveRequest.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list(*LEDGER_FIELDS)
+                .first()
+            )
+            result = super().delete(*args, **kwargs)
+            apply_change(previous, None)
+            availability.apply_change(previous, None)
+            rollups.mark_changes([(previous, None)])
+            requests_changed([self.user_id])
+        return result
+    
+    def transition(self, target, actor, seen_updated_at=None):
+        """
+        Porta la richiesta in un nuovo stato con un UPDATE condizionato, senza
+        lock in lettura (vedi transitions.py), e aggiorna l'istanza.
+        
+        Args:
+            target: Stato di destinazione
+            actor: Utente che esegue la transizione
+            seen_updated_at: updated_at su cui si basa la decisione
+                             (default: quello dell'istanza)
+            
+        Returns:
+            LeaveRequest: L'istanza aggiornata
+            
+        Raises:
+            LeaveRequestConflict: Se la transizione non è ammessa o la
+                                  richiesta è stata modificata nel frattempo
+        """
+        from .transitions import transition
+        updated = transition(self.pk, target, actor, seen_updated_at or self.updated_at)
+        self.status = updated.status
+        self.updated_at = updated.updated_at
+        self.approved_by = updated.approved_by
+        self.approval_date = updated.approval_date
+        return self
+    
     @property
     def duration(self):
         """
-        Calcola la durata dell'assenza in giorni, inclusi il giorno di inizio e fine.
+        Calcola la durata dell'assenza in giorni lavorativi, inclusi il giorno di inizio e fine.
+        
+        Esclude i weekend e le festività (vedi work_calendar.py); con half_day
+        l'ultimo giorno conta come mezza giornata.
         
         Returns:
-            int: Numero di giorni di assenza
-            
-        Note:
-            Non tiene conto dei giorni festivi o dei weekend. Per calcoli più precisi
-            sarebbe necessario implementare una logica aggiuntiva che consideri
-            le festività e i giorni lavorativi.
+            Decimal: Numero di giorni lavorativi di assenza
         """
-        delta = self.end_date - self.start_date
-        return delta.days + 1
+        from .work_calendar import get_calendar
+        calendar = get_calendar(self.start_date.year, self.end_date.year)
+        return calendar.duration(self.start_date, self.end_date, self.half_day)
 
 class Holiday(models.Model):
     """
@@ -107,4 +339,196 @@ class Holiday(models.Model):
         Returns:
             str: Nome e data della festività
         """
-        return f"{self.name} ({self.date})"
\ No newline at end of file
+        return f"{self.name} ({self.date})"
+
+class LeaveBalance(models.Model):
+    """
+    Saldo di un utente per un tipo di assenza in un anno.
+    
+    È un registro materializzato, aggiornato in modo incrementale a ogni
+    modifica di una LeaveRequest (vedi balances.py): la lettura di un saldo
+    è una singola lettura indicizzata, indipendente dallo storico.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='leave_balances'
+    )
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='balances')
+    year = models.PositiveSmallIntegerField()
+    allocated = models.DecimalField(max_digits=6, decimal_places=1, default=0)
+    used = models.DecimalField(max_digits=6, decimal_places=1, default=0)  # Richieste approvate
+    pending = models.DecimalField(max_digits=6, decimal_places=1, default=0)  # Richieste in attesa
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'leave_type', 'year'], name='unique_leave_balance'),
+        ]
+    
+    def __str__(self):
+        """
+        Restituisce una rappresentazione leggibile del saldo.
+        
+        Returns:
+            str: Utente, tipo di assenza, anno e giorni disponibili
+        """
+        return f"{self.user} - {self.leave_type} {self.year}: {self.available}"
+    
+    @property
+    def available(self):
+        """
+        Giorni ancora disponibili, al netto delle richieste in attesa.
+        
+        Returns:
+            Decimal: Giorni assegnati meno usati e prenotati
+        """
+        return self.allocated - self.used - self.pending
+
+class AbsenceCalendarMonth(models.Model):
+    """
+    Assenze approvate di un reparto in un mese, in forma di bitmap per utente.
+    
+    Per ogni utente il bit d-1 di `absences` indica un'assenza nel giorno d
+    del mese; `half_days` marca allo stesso modo le mezze giornate. Le righe
+    vengono calcolate alla prima lettura e poi aggiornate in modo incrementale
+    quando una richiesta viene approvata, annullata o modificata (vedi
+    availability.py); `version` cambia a ogni aggiornamento ed è usata come
+    validatore della cache HTTP.
+    """
+    department = models.CharField(max_length=100)
+    month = models.DateField()  # Primo giorno del mese
+    absences = models.JSONField(default=dict)  # {user_id: bitmap dei giorni}
+    half_days = models.JSONField(default=dict)  # {user_id: bitmap delle mezze giornate}
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'month'], name='unique_absence_calendar_month'),
+        ]
+    
+    def __str__(self):
+        """
+        Restituisce una rappresentazione leggibile del mese di calendario.
+        
+        Returns:
+            str: Reparto e mese
+        """
+        return f"{self.department} {self.month:%Y-%m}"
+
+class AbsenceRollup(models.Model):
+    """
+    Aggregato mensile delle assenze approvate per reparto e tipo di assenza.
+    
+    È una tabella di sintesi per i report: viene ricalcolata un mese alla
+    volta a partire dalle richieste di assenza (vedi rollups.py), solo per i
+    mesi segnati in AbsenceRollupDirtyMonth. Nome e retribuzione del tipo di
+    assenza e organico del reparto sono copiati nella riga, così i report
+    leggono solo questa tabella.
+    """
+    department = models.CharField(max_length=100, blank=True)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE, related_name='rollups')
+    leave_type_name = models.CharField(max_length=100)
+    is_paid = models.BooleanField()
+    month = models.DateField()  # Primo giorno del mese
+    requests = models.PositiveIntegerField(default=0)  # Richieste che toccano il mese
+    days = models.DecimalField(max_digits=9, decimal_places=1, default=0)  # Giorni lavorativi nel mese
+    headcount = models.PositiveIntegerField(default=0)  # Utenti attivi del reparto al ricalcolo
+    refreshed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'department', 'leave_type'], name='unique_absence_rollup'),
+        ]
+    
+    def __str__(self):
+        """
+        Restituisce una rappresentazione leggibile dell'aggregato.
+        
+        Returns:
+            str: Reparto, tipo di assenza e mese
+        """
+        return f"{self.department or '-'} {self.leave_type_name} {self.month:%Y-%m}"
+
+class AbsenceRollupDirtyMonth(models.Model):
+    """
+    Mese i cui aggregati (AbsenceRollup) vanno ricalcolati.
+    
+    Le righe vengono inserite nella stessa transazione delle modifiche alle
+    richieste di assenza e rimosse dal comando refresh_absence_rollups.
+    """
+    month = models.DateField(unique=True)  # Primo giorno del mese
+    marked_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        """
+        Restituisce una rappresentazione leggibile del mese da ricalcolare.
+        
+        Returns:
+            str: Mese
+        """
+        return f"{self.month:%Y-%m}"
+
+class LeaveAccrualRun(models.Model):
+    """
+    Esecuzione della maturazione mensile dei giorni di assenza.
+    
+    La chiave di idempotenza identifica l'esecuzione: ripetere il comando
+    con la stessa chiave riprende i blocchi di utenti non ancora completati
+    (LeaveAccrualChunk) oppure, se l'esecuzione è terminata, non fa nulla.
+    """
+    STATUS_CHOICES = [
+        ('running', 'In corso'),
+        ('completed', 'Completata'),
+        ('failed', 'Fallita'),
+    ]
+    
+    key = models.CharField(max_length=100, unique=True)
+    month = models.DateField()  # Primo giorno del mese maturato
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    users = models.PositiveIntegerField(default=0)  # Utenti elaborati
+    rows = models.PositiveIntegerField(default=0)  # Righe del registro scritte
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        """
+        Restituisce una rappresentazione leggibile dell'esecuzione.
+        
+        Returns:
+            str: Chiave, mese e stato
+        """
+        return f"{self.key} ({self.month:%Y-%m}, {self.get_status_display().lower()})"
+
+class LeaveAccrualChunk(models.Model):
+    """
+    Blocco di utenti di un'esecuzione della maturazione.
+    
+    I blocchi vengono pianificati alla creazione dell'esecuzione con l'elenco
+    esplicito degli utenti: una ripresa elabora gli stessi utenti anche se nel
+    frattempo altri sono stati creati, attivati o disattivati. Il blocco è
+    segnato come completato nella stessa transazione che scrive i saldi dei
+    suoi utenti.
+    """
+    run = models.ForeignKey(LeaveAccrualRun, on_delete=models.CASCADE, related_name='chunks')
+    first_user_id = models.PositiveIntegerField()
+    last_user_id = models.PositiveIntegerField()
+    user_ids = models.JSONField(default=list)  # Utenti pianificati, ordinati per ID
+    users = models.PositiveIntegerField(default=0)  # Utenti elaborati
+    rows = models.PositiveIntegerField(default=0)  # Righe del registro scritte
+    finished_at = models.DateTimeField(null=True, blank=True)  # None finché non completato
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'first_user_id'], name='unique_accrual_chunk'),
+        ]
+    
+    def __str__(self):
+        """
+        Restituisce una rappresentazione leggibile del blocco.
+        
+        Returns:
+            str: Esecuzione e intervallo di utenti
+        """
+        return f"{self.run.key} [{self.first_user_id}-{self.last_user_id}]"
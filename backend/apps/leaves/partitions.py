@@ -0,0 +1,384 @@
+# backend/apps/leaves/partitions.py
+"""
+Partizionamento annuale di leaves_leaverequest (solo Postgres, opzionale).
+
+La tabella delle richieste cresce senza limiti, mentre quasi tutte le query
+riguardano l'anno corrente e il successivo. Con il partizionamento
+dichiarativo per intervallo su start_date ogni anno diventa una partizione
+(leaves_leaverequest_y2025, ...): indici e vacuum lavorano sulla partizione
+interessata e una query con un filtro su start_date legge solo le
+partizioni coinvolte (partition pruning). Una partizione di default
+raccoglie le righe fuori dagli anni creati, così un inserimento non
+fallisce mai.
+
+Il modello Django non cambia: la conversione (convert_table) sostituisce la
+tabella esistente con una tabella partizionata con le stesse colonne, gli
+stessi indici e le stesse chiavi esterne. Le differenze rispetto alla
+tabella originale sono:
+- la chiave primaria diventa (id, start_date), perché Postgres richiede la
+  chiave di partizione nei vincoli di unicità; gli ID restano generati
+  dalla stessa identity e quindi unici;
+- il vincolo di esclusione sulle sovrapposizioni (migrazione 0003) non è
+  ammesso sulla tabella partizionata e viene creato su ogni partizione, ma
+  confronta solo richieste della stessa partizione: due richieste
+  sovrapposte che iniziano in anni diversi (es. 30/12-02/01 e 01/01-05/01)
+  non vengono più respinte dal database. Per questo, su una tabella
+  partizionata LeaveRequest.save() ripete il controllo overlapping() sotto
+  lock della riga dell'utente (vedi overlap_check_required()); le
+  importazioni controllano le sovrapposizioni per blocco.
+
+Le partizioni degli anni chiusi possono essere staccate (detach_before) e
+spostate in uno schema di archivio: le righe escono da tutte le query
+dell'applicazione, mentre registro dei saldi, calendario delle presenze e
+aggregati dei report conservano i valori già calcolati. Un successivo
+rebuild_leave_balances non vedrebbe più le richieste archiviate.
+"""
+
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import LeaveRequest
+
+# Tabella partizionata
+TABLE = LeaveRequest._meta.db_table
+
+# Partizione che raccoglie le righe fuori dagli anni creati
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+# Anni futuri per cui creare in anticipo le partizioni
+FUTURE_YEARS = 2
+
+# Schema di destinazione delle partizioni archiviate
+ARCHIVE_SCHEMA = 'leaves_archive'
+
+
+class PartitionError(Exception):
+    """
+    Operazione sulle partizioni non eseguibile.
+    """
+
+
+def partition_name(year):
+    """
+    Args:
+        year: Anno
+
+    Returns:
+        str: Nome della partizione dell'anno
+    """
+    return f'{TABLE}_y{year}'
+
+
+def _check_vendor():
+    if connection.vendor != 'postgresql':
+        raise PartitionError("Il partizionamento è disponibile solo su PostgreSQL")
+
+
+def is_partitioned():
+    """
+    Returns:
+        bool: True se la tabella delle richieste è partizionata
+    """
+    _check_vendor()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+# Memo per processo di overlap_check_required()
+_overlap_check = None
+
+
+def overlap_check_required():
+    """
+    Indica se i salvataggi devono controllare le sovrapposizioni
+    nell'applicazione, perché il vincolo di esclusione non copre richieste
+    in partizioni diverse.
+
+    Il valore è letto una volta per processo: dopo la conversione della
+    tabella i processi dell'applicazione vanno riavviati (la conversione
+    avviene comunque in una finestra di manutenzione).
+
+    Returns:
+        bool: True se la tabella delle richieste è partizionata
+    """
+    global _overlap_check
+    if _overlap_check is None:
+        _overlap_check = connection.vendor == 'postgresql' and is_partitioned()
+    return _overlap_check
+
+
+def list_partitions():
+    """
+    Elenca le partizioni collegate alla tabella.
+
+    Returns:
+        list: Tuple (nome, limiti, righe stimate) ordinate per nome
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            ORDER BY child.relname
+        """, [TABLE])
+        return cursor.fetchall()
+
+
+def _partition_years():
+    """
+    Returns:
+        set: Anni con una partizione collegata
+    """
+    prefix = partition_name('')
+    return {
+        int(name[len(prefix):])
+        for name, _, _ in list_partitions()
+        if name.startswith(prefix) and name[len(prefix):].isdigit()
+    }
+
+
+def _exclusion_constraints(partition):
+    """
+    Returns:
+        list: Coppie (nome senza il prefisso della partizione, definizione)
+              dei vincoli di esclusione di una partizione
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'x' ORDER BY conname",
+            [partition]
+        )
+        return [(name.removeprefix(f'{partition}_'), definition) for name, definition in cursor.fetchall()]
+
+
+def _add_exclusion_constraints(partition, definitions):
+    """
+    Crea su una partizione i vincoli di esclusione indicati.
+
+    Il nome di un vincolo di esclusione è anche il nome del suo indice e
+    deve essere unico nello schema: viene prefissato con la partizione.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for name, definition in definitions:
+            cursor.execute(
+                f'ALTER TABLE {quote(partition)} ADD CONSTRAINT {quote(f"{partition}_{name}")} {definition}'
+            )
+
+
+def _attach_year(year, exclusions):
+    """
+    Crea e collega la partizione di un anno, spostandovi le righe dell'anno
+    già finite nella partizione di default.
+
+    Args:
+        year: Anno
+        exclusions: Vincoli di esclusione da replicare sulla partizione
+    """
+    quote = connection.ops.quote_name
+    partition = partition_name(year)
+    bounds = [date(year, 1, 1), date(year + 1, 1, 1)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {quote(partition)} '
+            f'(LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            "SELECT 1 FROM pg_inherits WHERE inhparent = to_regclass(%s) AND inhrelid = to_regclass(%s)",
+            [TABLE, DEFAULT_PARTITION]
+        )
+        if cursor.fetchone() is not None:
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+                f'WHERE start_date >= %s AND start_date < %s RETURNING *) '
+                f'INSERT INTO {quote(partition)} SELECT * FROM moved',
+                bounds
+            )
+        # Il vincolo CHECK evita la scansione della partizione durante ATTACH
+        cursor.execute(
+            f'ALTER TABLE {quote(partition)} ADD CONSTRAINT {quote(f"{partition}_bounds")} '
+            f'CHECK (start_date >= %s AND start_date < %s)',
+            bounds
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(partition)} "
+            f"FOR VALUES FROM ('{bounds[0].isoformat()}') TO ('{bounds[1].isoformat()}')"
+        )
+        cursor.execute(f'ALTER TABLE {quote(partition)} DROP CONSTRAINT {quote(f"{partition}_bounds")}')
+    _add_exclusion_constraints(partition, exclusions)
+
+
+def ensure_partitions(future_years=FUTURE_YEARS):
+    """
+    Crea le partizioni mancanti dall'anno corrente fino a future_years anni
+    avanti.
+
+    Args:
+        future_years: Anni futuri per cui creare le partizioni
+
+    Returns:
+        list: Anni per cui è stata creata una partizione
+    """
+    if not is_partitioned():
+        raise PartitionError(f"La tabella {TABLE} non è partizionata: eseguire prima la conversione")
+    today = date.today()
+
+    created = []
+    with transaction.atomic():
+        existing = _partition_years()
+        # I vincoli di esclusione vengono copiati dalla partizione più recente
+        exclusions = _exclusion_constraints(partition_name(max(existing))) if existing else []
+        for year in range(today.year, today.year + future_years + 1):
+            if year not in existing:
+                _attach_year(year, exclusions)
+                created.append(year)
+    return created
+
+
+def convert_table(future_years=FUTURE_YEARS):
+    """
+    Converte la tabella delle richieste in una tabella partizionata per anno.
+
+    L'operazione avviene in un'unica transazione con la tabella bloccata in
+    esclusiva: le righe vengono copiate nella nuova tabella, che prende il
+    nome, gli indici, le chiavi esterne e la sequenza degli ID della
+    precedente.
+
+    Args:
+        future_years: Anni futuri per cui creare le partizioni
+
+    Returns:
+        list: Anni delle partizioni create
+    """
+    if is_partitioned():
+        raise PartitionError(f"La tabella {TABLE} è già partizionata")
+    quote = connection.ops.quote_name
+    legacy = f'{TABLE}_unpartitioned'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}')
+
+        # Vincoli e indici della tabella originale: vengono rimossi per
+        # liberarne i nomi e ricreati identici sulla nuova tabella
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'f', 'x') ORDER BY conname",
+            [legacy]
+        )
+        constraints = cursor.fetchall()
+        for name, _, _ in constraints:
+            cursor.execute(f'ALTER TABLE {quote(legacy)} DROP CONSTRAINT {quote(name)}')
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+            [legacy]
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {quote(name)}')
+
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} '
+            f'(LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (start_date)'
+        )
+        cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+
+        cursor.execute(f'SELECT min(start_date), max(start_date) FROM {quote(legacy)}')
+        first, last = cursor.fetchone()
+        today = date.today()
+        years = range(
+            min(first.year if first else today.year, today.year),
+            max(last.year if last else today.year, today.year + future_years) + 1
+        )
+        for year in years:
+            cursor.execute(
+                f"CREATE TABLE {quote(partition_name(year))} PARTITION OF {quote(TABLE)} "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+
+        # Copia dei dati prima degli indici, più veloce del caricamento
+        # con gli indici già presenti
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(legacy)}')
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(max(id), 1), max(id) IS NOT NULL) "
+            f"FROM {quote(TABLE)}",
+            [TABLE]
+        )
+
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(f"{TABLE}_pkey")} PRIMARY KEY (id, start_date)'
+        )
+        primary_indexes = {name for name, contype, _ in constraints if contype in ('p', 'x')}
+        for name, definition in indexes:
+            if name not in primary_indexes:
+                cursor.execute(definition.replace(f' ON {_qualified(legacy)} ', f' ON {quote(TABLE)} '))
+        for name, contype, definition in constraints:
+            if contype == 'f':
+                cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+        exclusions = [(name, definition) for name, contype, definition in constraints if contype == 'x']
+        for year in years:
+            _add_exclusion_constraints(partition_name(year), exclusions)
+
+        cursor.execute(f'DROP TABLE {quote(legacy)}')
+        # La sequenza della nuova identity prende il nome di quella eliminata
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f'ALTER SEQUENCE {sequence} RENAME TO {quote(f"{TABLE}_id_seq")}')
+
+    global _overlap_check
+    _overlap_check = True
+    return list(years)
+
+
+def _qualified(table):
+    """
+    Nome della tabella come compare nelle definizioni di pg_indexes.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)::regclass::text, current_schema()", [table])
+        name, schema = cursor.fetchone()
+    return name if '.' in name else f'{schema}.{name}'
+
+
+def detach_before(year, archive_schema=ARCHIVE_SCHEMA):
+    """
+    Stacca le partizioni degli anni precedenti a quello indicato e le sposta
+    nello schema di archivio.
+
+    Le partizioni con richieste ancora in attesa non vengono staccate.
+
+    Args:
+        year: Primo anno da mantenere (non oltre l'anno corrente)
+        archive_schema: Schema di destinazione
+
+    Returns:
+        list: Coppie (anno, messaggio) per ogni partizione considerata
+    """
+    if not is_partitioned():
+        raise PartitionError(f"La tabella {TABLE} non è partizionata")
+    if year > date.today().year:
+        raise PartitionError("Non è possibile archiviare l'anno corrente o anni futuri")
+    quote = connection.ops.quote_name
+
+    results = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {quote(archive_schema)}')
+        for old_year in sorted(y for y in _partition_years() if y < year):
+            partition = partition_name(old_year)
+            cursor.execute(f"SELECT count(*) FROM {quote(partition)} WHERE status = 'pending'")
+            pending = cursor.fetchone()[0]
+            if pending:
+                results.append((old_year, f"non archiviata: {pending} richieste in attesa"))
+                continue
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition)}')
+            cursor.execute(f'ALTER TABLE {quote(partition)} SET SCHEMA {quote(archive_schema)}')
+            results.append((old_year, f"archiviata in {archive_schema}.{partition}"))
+    return results
@@ -0,0 +1,187 @@
+# backend/apps/leaves/reference.py
+"""
+Cache in memoria dei dati di riferimento: tipi di assenza e festività.
+
+LeaveType e Holiday sono tabelle piccole e modificate raramente, ma lette da
+quasi ogni validazione e serializzazione. Il processo ne tiene una copia in
+memoria, con indici per ID e per nome, e la ricarica solo quando cambia la
+versione salvata nella cache condivisa di Django: ogni modifica da admin o
+API (segnali in signals.py) incrementa la versione e gli altri processi
+ricaricano i dati al primo controllo successivo, eseguito al massimo ogni
+VERSION_CHECK_INTERVAL secondi.
+
+Le istanze restituite sono condivise tra le richieste e non vanno
+modificate; per le modifiche va letta l'istanza dal database. Le modifiche
+massive che non emettono segnali (queryset.update, bulk_create) devono
+chiamare invalidate_reference().
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import Holiday, LeaveType
+
+# Chiave della cache condivisa
+VERSION_CACHE_KEY = 'leaves:reference:version'
+
+# Secondi tra due controlli della versione nella cache condivisa
+VERSION_CHECK_INTERVAL = 5.0
+
+
+class ReferenceData:
+    """
+    Istantanea dei dati di riferimento con gli indici di ricerca.
+    """
+
+    def __init__(self, leave_types, holidays):
+        """
+        Args:
+            leave_types: Istanze di LeaveType
+            holidays: Istanze di Holiday
+        """
+        self.leave_types = sorted(leave_types, key=lambda leave_type: (leave_type.name.lower(), leave_type.pk))
+        self.leave_types_by_id = {leave_type.pk: leave_type for leave_type in self.leave_types}
+        self.leave_types_by_name = {}
+        for leave_type in self.leave_types:
+            self.leave_types_by_name.setdefault(leave_type.name.strip().lower(), leave_type)
+        self.holidays = sorted(holidays, key=lambda holiday: (holiday.date, holiday.pk))
+
+
+class _ReferenceState:
+    """
+    Dati di riferimento caricati nel processo e versione da cui derivano.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = None
+        self.version = None
+        self.checked_at = 0.0
+
+
+_state = _ReferenceState()
+
+
+def _shared_version():
+    """
+    Legge la versione dei dati di riferimento dalla cache condivisa, al
+    massimo ogni VERSION_CHECK_INTERVAL secondi.
+
+    Returns:
+        int: Versione corrente
+    """
+    now = time.monotonic()
+    if _state.version is not None and now - _state.checked_at < VERSION_CHECK_INTERVAL:
+        return _state.version
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    _state.checked_at = now
+    return version
+
+
+def get_reference():
+    """
+    Restituisce i dati di riferimento, ricaricandoli se la versione è cambiata.
+
+    Returns:
+        ReferenceData: Istantanea corrente
+    """
+    version = _shared_version()
+    data = _state.data
+    if data is not None and _state.version == version:
+        return data
+    with _state.lock:
+        if _state.data is None or _state.version != version:
+            _state.data = ReferenceData(LeaveType.objects.all(), Holiday.objects.all())
+            _state.version = version
+        return _state.data
+
+
+def invalidate_reference():
+    """
+    Invalida i dati di riferimento in tutti i processi.
+    """
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # Chiave assente (cache svuotata o mai inizializzata)
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        cache.incr(VERSION_CACHE_KEY)
+    with _state.lock:
+        _state.data = None
+
+
+def reference_version():
+    """
+    Returns:
+        int: Versione dei dati di riferimento attualmente in uso
+    """
+    get_reference()
+    return _state.version
+
+
+def leave_types():
+    """
+    Returns:
+        list: Tipi di assenza ordinati per nome
+    """
+    return get_reference().leave_types
+
+
+def get_leave_type(pk):
+    """
+    Args:
+        pk: ID del tipo di assenza
+
+    Returns:
+        LeaveType: Tipo di assenza, o None se non esiste
+    """
+    return get_reference().leave_types_by_id.get(pk)
+
+
+def get_leave_type_by_name(name):
+    """
+    Args:
+        name: Nome del tipo di assenza (senza distinzione tra maiuscole e minuscole)
+
+    Returns:
+        LeaveType: Tipo di assenza, o None se non esiste
+    """
+    return get_reference().leave_types_by_name.get((name or '').strip().lower())
+
+
+def holidays():
+    """
+    Returns:
+        list: Festività ordinate per data registrata
+    """
+    return get_reference().holidays
+
+
+def holidays_in_year(year):
+    """
+    Restituisce le festività che cadono in un anno, con quelle ricorrenti
+    riportate sull'anno richiesto.
+
+    Args:
+        year: Anno
+
+    Returns:
+        list: Coppie (data nell'anno, Holiday) ordinate per data
+    """
+    result = []
+    for holiday in get_reference().holidays:
+        if holiday.is_recurring:
+            try:
+                result.append((holiday.date.replace(year=year), holiday))
+            except ValueError:
+                # 29 febbraio negli anni non bisestili
+                continue
+        elif holiday.date.year == year:
+            result.append((holiday.date, holiday))
+    result.sort(key=lambda item: (item[0], item[1].pk))
+    return result
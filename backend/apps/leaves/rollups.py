@@ -0,0 +1,232 @@
+# backend/apps/leaves/rollups.py
+"""
+Aggregati mensili delle assenze per i report (AbsenceRollup).
+
+Le modifiche alle richieste approvate, alle festività e al reparto degli
+utenti segnano come "da ricalcolare" i mesi coinvolti
+(AbsenceRollupDirtyMonth), nella stessa transazione della modifica. Il
+comando refresh_absence_rollups ricalcola solo quei mesi, uno per
+transazione: ogni mese viene preso con SELECT ... FOR UPDATE SKIP LOCKED,
+quindi più processi possono aggiornare mesi diversi in parallelo e i report
+vedono sempre un mese completo, prima o dopo il ricalcolo.
+
+La marcatura è un upsert (INSERT ... ON CONFLICT DO UPDATE di marked_at),
+che prende il lock sulla riga del mese fino al commit della modifica:
+- se il ricalcolo ha già preso il mese, la modifica attende il suo commit e
+  poi inserisce di nuovo la riga, che verrà ripresa al passaggio successivo;
+- se la modifica non ha ancora fatto commit, il ricalcolo salta il mese
+  (SKIP LOCKED) e lo riprende al passaggio successivo.
+Con ON CONFLICT DO NOTHING la modifica non attenderebbe il lock e la sua
+marcatura andrebbe persa con l'eliminazione della riga dopo il ricalcolo.
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from . import reference
+from .availability import iter_months, month_start, next_month
+from .models import AbsenceRollup, AbsenceRollupDirtyMonth, LeaveRequest, LeaveType
+from .work_calendar import get_calendar
+
+# Stato delle richieste conteggiate negli aggregati
+ROLLUP_STATUS = 'approved'
+
+# Righe lette per blocco durante il ricalcolo di un mese
+CHUNK_SIZE = 5000
+
+
+def mark_months(months):
+    """
+    Segna dei mesi come da ricalcolare.
+
+    Args:
+        months: Primi giorni dei mesi
+    """
+    months = {month_start(month) for month in months}
+    if months:
+        # Ordinati per mese, così marcature concorrenti prendono i lock
+        # nello stesso ordine
+        AbsenceRollupDirtyMonth.objects.bulk_create(
+            [AbsenceRollupDirtyMonth(month=month) for month in sorted(months)],
+            update_conflicts=True,
+            unique_fields=['month'],
+            update_fields=['marked_at']
+        )
+
+
+def mark_changes(changes):
+    """
+    Segna i mesi toccati da modifiche a richieste approvate.
+
+    Args:
+        changes: Coppie (previous, current) di valori di balances.LEDGER_FIELDS
+                 (None per richiesta nuova o eliminata)
+    """
+    months = set()
+    for previous, current in changes:
+        if previous == current:
+            continue
+        for values in (previous, current):
+            if values is not None and values[5] == ROLLUP_STATUS:
+                months.update(iter_months(values[2], values[3]))
+    mark_months(months)
+
+
+def mark_user(user_id):
+    """
+    Segna i mesi delle richieste approvate di un utente (es. cambio di reparto).
+
+    Args:
+        user_id: ID dell'utente
+    """
+    months = set()
+    for start_date, end_date in LeaveRequest.objects.filter(
+        user_id=user_id, status=ROLLUP_STATUS
+    ).values_list('start_date', 'end_date'):
+        months.update(iter_months(start_date, end_date))
+    mark_months(months)
+
+
+def mark_holiday(day, is_recurring):
+    """
+    Segna i mesi in cui una festività cambia i giorni lavorativi.
+
+    Args:
+        day: Data della festività
+        is_recurring: Se True la festività vale per ogni anno
+    """
+    if not is_recurring:
+        mark_months([day])
+        return
+    bounds = LeaveRequest.objects.filter(status=ROLLUP_STATUS).aggregate(
+        first=Min('start_date'), last=Max('end_date')
+    )
+    if bounds['first'] is None:
+        return
+    mark_months(
+        date(year, day.month, 1)
+        for year in range(bounds['first'].year, bounds['last'].year + 1)
+    )
+
+
+def refresh_month(month):
+    """
+    Ricalcola gli aggregati di un mese, sostituendo quelli esistenti.
+
+    Va chiamato all'interno di una transazione.
+
+    Args:
+        month: Primo giorno del mese
+    """
+    end = next_month(month)
+    last_day = date.fromordinal(end.toordinal() - 1)
+    calendar = get_calendar(month.year, month.year)
+
+    totals = defaultdict(lambda: [0, 0.0])
+    rows = (
+        LeaveRequest.objects
+        .filter(status=ROLLUP_STATUS, start_date__lt=end, end_date__gte=month)
+        .values_list('user__department', 'leave_type_id', 'start_date', 'end_date', 'half_day')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        # Giorni lavorativi che ricadono nel mese; la mezza giornata conta
+        # solo se l'ultimo giorno è nel mese
+        days = calendar.durations(
+            [max(row[2], month) for row in chunk],
+            [min(row[3], last_day) for row in chunk],
+            [row[4] and row[3] <= last_day for row in chunk]
+        )
+        for (department, leave_type_id, _, _, _), value in zip(chunk, days):
+            total = totals[(department or '', leave_type_id)]
+            total[0] += 1
+            total[1] += float(value)
+
+    leave_types = {
+        leave_type.pk: (leave_type.name, leave_type.is_paid)
+        for leave_type in reference.leave_types()
+    }
+    missing = {leave_type_id for _, leave_type_id in totals} - leave_types.keys()
+    if missing:
+        # Tipo creato da meno di VERSION_CHECK_INTERVAL secondi
+        leave_types.update(
+            (pk, (name, is_paid))
+            for pk, name, is_paid in LeaveType.objects.filter(pk__in=missing).values_list('id', 'name', 'is_paid')
+        )
+    headcount = dict(
+        get_user_model().objects.filter(is_active=True)
+        .values_list('department')
+        .annotate(count=Count('id'))
+        .values_list('department', 'count')
+    )
+
+    AbsenceRollup.objects.filter(month=month).delete()
+    AbsenceRollup.objects.bulk_create([
+        AbsenceRollup(
+            department=department,
+            leave_type_id=leave_type_id,
+            leave_type_name=leave_types[leave_type_id][0],
+            is_paid=leave_types[leave_type_id][1],
+            month=month,
+            requests=count,
+            days=Decimal(str(days)),
+            headcount=headcount.get(department, 0)
+        )
+        for (department, leave_type_id), (count, days) in sorted(totals.items())
+    ])
+
+
+def refresh_dirty(limit=None):
+    """
+    Ricalcola i mesi segnati, uno per transazione.
+
+    I mesi già presi da un altro processo vengono saltati (SKIP LOCKED).
+
+    Args:
+        limit: Numero massimo di mesi da ricalcolare (None per tutti)
+
+    Returns:
+        list: Mesi ricalcolati
+    """
+    refreshed = []
+    while limit is None or len(refreshed) < limit:
+        with transaction.atomic():
+            dirty = (
+                AbsenceRollupDirtyMonth.objects
+                .select_for_update(skip_locked=True)
+                .exclude(month__in=refreshed)
+                .order_by('month')
+                .first()
+            )
+            if dirty is None:
+                break
+            refresh_month(dirty.month)
+            dirty.delete()
+        refreshed.append(dirty.month)
+    return refreshed
+
+
+def mark_all():
+    """
+    Segna tutti i mesi con richieste approvate o con aggregati esistenti.
+
+    Returns:
+        int: Numero di mesi segnati
+    """
+    months = set(AbsenceRollup.objects.values_list('month', flat=True).distinct())
+    bounds = LeaveRequest.objects.filter(status=ROLLUP_STATUS).aggregate(
+        first=Min('start_date'), last=Max('end_date')
+    )
+    if bounds['first'] is not None:
+        months.update(iter_months(bounds['first'], bounds['last']))
+    mark_months(months)
+    return len(months)
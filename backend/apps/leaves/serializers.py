@@ -0,0 +1,92 @@
+# backend/apps/leaves/serializers.py
+
+from rest_framework import serializers
+
+from .models import AbsenceRollup, Holiday, LeaveBalance, LeaveRequest, LeaveType
+from .transitions import ACTIONS, BULK_ACTIONS, MAX_BULK_SIZE
+
+class LeaveBalanceSerializer(serializers.ModelSerializer):
+    """
+    Serializer for LeaveBalance model
+    """
+    leave_type_name = serializers.CharField(source='leave_type.name', read_only=True)
+    available = serializers.DecimalField(max_digits=6, decimal_places=1, read_only=True)
+
+    class Meta:
+        model = LeaveBalance
+        fields = ('leave_type', 'leave_type_name', 'year', 'allocated', 'used', 'pending', 'available')
+        read_only_fields = fields
+
+class LeaveRequestUserSerializer(serializers.Serializer):
+    """
+    Minimal serializer for users referenced by a leave request
+    """
+    id = serializers.IntegerField(read_only=True)
+    email = serializers.EmailField(read_only=True)
+    first_name = serializers.CharField(read_only=True)
+    last_name = serializers.CharField(read_only=True)
+
+class LeaveRequestSerializer(serializers.ModelSerializer):
+    """
+    Serializer for LeaveRequest model
+    """
+    user = LeaveRequestUserSerializer(read_only=True)
+    leave_type_name = serializers.CharField(source='leave_type.name', read_only=True)
+    approved_by = LeaveRequestUserSerializer(read_only=True)
+    duration = serializers.DecimalField(max_digits=6, decimal_places=1, read_only=True)
+
+    class Meta:
+        model = LeaveRequest
+        fields = (
+            'id', 'user', 'leave_type', 'leave_type_name', 'start_date', 'end_date',
+            'half_day', 'duration', 'reason', 'status', 'created_at', 'updated_at',
+            'approved_by', 'approval_date'
+        )
+        read_only_fields = fields
+
+class LeaveRequestBulkTransitionSerializer(serializers.Serializer):
+    """
+    Serializer for bulk approve/reject requests
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_SIZE
+    )
+    action = serializers.ChoiceField(choices=sorted(BULK_ACTIONS))
+
+class LeaveRequestTransitionSerializer(serializers.Serializer):
+    """
+    Serializer for single leave request transitions
+    """
+    action = serializers.ChoiceField(choices=sorted(ACTIONS))
+    updated_at = serializers.DateTimeField(required=False)
+
+class AbsenceRollupSerializer(serializers.ModelSerializer):
+    """
+    Serializer for AbsenceRollup model
+    """
+    month = serializers.DateField(format='%Y-%m', read_only=True)
+
+    class Meta:
+        model = AbsenceRollup
+        fields = ('department', 'leave_type', 'leave_type_name', 'is_paid', 'month', 'requests', 'days', 'headcount')
+        read_only_fields = fields
+
+class LeaveTypeSerializer(serializers.ModelSerializer):
+    """
+    Serializer for LeaveType model
+    """
+    class Meta:
+        model = LeaveType
+        fields = ('id', 'name', 'description', 'is_paid', 'color_code', 'annual_allowance')
+        read_only_fields = fields
+
+class HolidaySerializer(serializers.ModelSerializer):
+    """
+    Serializer for Holiday model
+    """
+    class Meta:
+        model = Holiday
+        fields = ('id', 'name', 'date', 'description', 'is_recurring')
+        read_only_fields = fields
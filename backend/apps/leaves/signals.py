@@ -0,0 +1,119 @@
+# backend/apps/leaves/signals.py
+"""
+Segnali dell'app leaves.
+"""
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import rollups
+from .availability import invalidate_departments
+from .balances import holiday_keys, rebuild_keys
+from .models import Holiday, LeaveRequest, LeaveType
+from .reference import invalidate_reference
+from .work_calendar import invalidate_calendar
+
+# Inviato dopo il commit di una transizione in blocco, una volta per lotto.
+# Argomenti: request_ids (lista di ID), status (nuovo stato), actor (utente)
+leave_requests_transitioned = Signal()
+
+# Oggetto delle notifiche per stato
+NOTIFICATION_SUBJECTS = {
+    'approved': "La tua richiesta di assenza è stata approvata",
+    'rejected': "La tua richiesta di assenza è stata rifiutata",
+}
+
+
+@receiver(pre_save, sender=Holiday)
+def holiday_saving(sender, instance, raw=False, **kwargs):
+    """
+    Ricorda data e ricorrenza precedenti di una festività modificata.
+    """
+    instance._previous_holiday = None
+    if not raw and instance.pk is not None:
+        instance._previous_holiday = (
+            Holiday.objects.filter(pk=instance.pk).values_list('date', 'is_recurring').first()
+        )
+
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def holiday_changed(sender, instance, **kwargs):
+    """
+    Invalida il calendario dei giorni lavorativi e i dati di riferimento
+    quando cambia una festività e segna i mesi coinvolti come da ricalcolare
+    nei report.
+
+    Le invalidazioni avvengono dopo il commit: prima, un altro processo
+    ricaricherebbe le festività precedenti salvandole con la nuova versione.
+    Le righe del registro dei saldi delle richieste che contengono la data
+    (vecchia e nuova) vengono invece ricalcolate subito, con le festività
+    della transazione.
+    """
+    transaction.on_commit(invalidate_calendar)
+    transaction.on_commit(invalidate_reference)
+    holidays = {(instance.date, instance.is_recurring)}
+    previous = getattr(instance, '_previous_holiday', None)
+    if previous is not None:
+        holidays.add(previous)
+    for day, is_recurring in holidays:
+        rollups.mark_holiday(day, is_recurring)
+    with transaction.atomic():
+        rebuild_keys(holiday_keys(holidays), fresh_calendar=True)
+
+
+@receiver(post_save, sender=LeaveType)
+@receiver(post_delete, sender=LeaveType)
+def leave_type_changed(sender, **kwargs):
+    """
+    Invalida i dati di riferimento quando cambia un tipo di assenza.
+
+    L'invalidazione avviene dopo il commit, così gli altri processi non
+    ricaricano i dati prima che la modifica sia visibile.
+    """
+    transaction.on_commit(invalidate_reference)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def user_department_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Invalida il calendario delle presenze dei reparti coinvolti e segna i mesi
+    da ricalcolare nei report quando un utente cambia reparto.
+    """
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'department' not in update_fields:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('department', flat=True).first()
+    if previous is not None and previous != instance.department:
+        invalidate_departments(previous, instance.department)
+        rollups.mark_user(instance.pk)
+
+
+@receiver(leave_requests_transitioned)
+def notify_requesters(sender, request_ids, status, actor, **kwargs):
+    """
+    Notifica via email i richiedenti di un lotto di richieste, con una sola
+    query e una sola connessione al server di posta.
+    """
+    subject = NOTIFICATION_SUBJECTS.get(status)
+    if subject is None:
+        return
+    messages = [
+        (
+            subject,
+            f"{request.leave_type.name} dal {request.start_date} al {request.end_date}: "
+            f"{request.get_status_display().lower()} da {actor.get_full_name() or actor.email}.",
+            settings.EMAIL_HOST_USER,
+            [request.user.email]
+        )
+        for request in LeaveRequest.objects.filter(pk__in=request_ids).select_related('user', 'leave_type')
+        if request.user.email
+    ]
+    try:
+        send_mass_mail(messages, fail_silently=False)
+    except Exception as e:
+        print(f"Error sending leave notifications: {str(e)}")
@@ -1,3 +1,405 @@
+# backend/apps/leaves/tests.py
+"""
+Test dell'app leaves: registro dei saldi, transizioni di stato, calendario
+delle presenze, importazione e maturazione.
+
+Le date cadono nel 2025, un anno passato (i giorni annui sono maturati per
+intero), senza festività: il 3 marzo 2025 è un lunedì.
+"""
+
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from . import accruals
+from .accruals import AccrualError, run_accruals
+from .availability import get_months
+from .imports import import_csv
+from .models import AbsenceCalendarMonth, LeaveAccrualRun, LeaveBalance, LeaveRequest, LeaveType
+from .transitions import bulk_transition
+
+MONDAY = date(2025, 3, 3)
+FRIDAY = date(2025, 3, 7)
+MARCH = date(2025, 3, 1)
+
+
+class LeaveTestCase(TestCase):
+    """
+    Base dei test: un tipo di assenza con 20 giorni annui e un utente del
+    reparto IT.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leave_type = LeaveType.objects.create(name='Ferie test', annual_allowance=Decimal('20'))
+        cls.user = cls.create_user('dipendente@example.com')
+        cls.manager = cls.create_user('responsabile@example.com', is_staff=True)
+
+    @staticmethod
+    def create_user(email, **extra_fields):
+        extra_fields.setdefault('department', 'IT')
+        return get_user_model().objects.create_user(email, password='password', username=email, **extra_fields)
+
+    def setUp(self):
+        # Versioni e dati di riferimento in cache non sopravvivono al rollback
+        cache.clear()
+
+    def create_request(self, start_date=MONDAY, end_date=FRIDAY, status='pending', user=None, **fields):
+        leave_request = LeaveRequest(
+            user=user or self.user,
+            leave_type=self.leave_type,
+            start_date=start_date,
+            end_date=end_date,
+            status=status,
+            **fields
+        )
+        leave_request.save()
+        return leave_request
+
+    def balance(self, user=None):
+        return LeaveBalance.objects.get(user=user or self.user, leave_type=self.leave_type, year=2025)
+
+
+class LeaveBalanceLedgerTests(LeaveTestCase):
+    """
+    Aggiornamento incrementale del registro da LeaveRequest.save()/delete().
+    """
+
+    def test_create_adds_pending_days(self):
+        self.create_request()
+        balance = self.balance()
+        self.assertEqual(balance.pending, Decimal('5'))
+        self.assertEqual(balance.used, Decimal('0'))
+        self.assertEqual(balance.allocated, Decimal('20'))
+
+    def test_half_day_subtracts_half_of_last_day(self):
+        self.create_request(half_day=True)
+        self.assertEqual(self.balance().pending, Decimal('4.5'))
+
+    def test_status_change_moves_days_to_used(self):
+        leave_request = self.create_request()
+        leave_request.status = 'approved'
+        leave_request.save()
+        balance = self.balance()
+        self.assertEqual(balance.pending, Decimal('0'))
+        self.assertEqual(balance.used, Decimal('5'))
+
+    def test_date_move_applies_difference(self):
+        leave_request = self.create_request(status='approved')
+        # Da lunedì-venerdì a mercoledì-martedì successivo: 5 giorni lavorativi
+        leave_request.start_date = date(2025, 3, 5)
+        leave_request.end_date = date(2025, 3, 11)
+        leave_request.save()
+        self.assertEqual(self.balance().used, Decimal('5'))
+
+        leave_request.end_date = date(2025, 3, 6)
+        leave_request.save()
+        self.assertEqual(self.balance().used, Decimal('2'))
+
+    def test_delete_removes_contribution(self):
+        leave_request = self.create_request(status='approved')
+        leave_request.delete()
+        balance = self.balance()
+        self.assertEqual(balance.used, Decimal('0'))
+        self.assertEqual(balance.pending, Decimal('0'))
+
+    def test_inactive_status_does_not_count(self):
+        leave_request = self.create_request()
+        leave_request.status = 'cancelled'
+        leave_request.save()
+        self.assertEqual(self.balance().pending, Decimal('0'))
+
+
+class ValidateBalanceTests(LeaveTestCase):
+    """
+    Controllo dei giorni disponibili in LeaveRequest.clean().
+    """
+
+    def test_request_over_allowance_is_rejected(self):
+        leave_request = LeaveRequest(
+            user=self.user, leave_type=self.leave_type,
+            start_date=MONDAY, end_date=date(2025, 4, 4), status='pending'
+        )
+        with self.assertRaisesMessage(ValidationError, 'insufficienti per il 2025'):
+            leave_request.clean()
+
+    def test_existing_requests_reduce_availability(self):
+        self.create_request(start_date=date(2025, 3, 10), end_date=date(2025, 3, 31))
+        leave_request = LeaveRequest(
+            user=self.user, leave_type=self.leave_type,
+            start_date=date(2025, 5, 5), end_date=date(2025, 5, 9), status='pending'
+        )
+        with self.assertRaises(ValidationError):
+            leave_request.clean()
+
+    def test_edit_releases_own_contribution(self):
+        leave_request = self.create_request(start_date=date(2025, 3, 10), end_date=date(2025, 4, 4))
+        # 20 giorni già prenotati da questa stessa richiesta: spostarla è ammesso
+        leave_request.start_date = date(2025, 3, 11)
+        leave_request.end_date = date(2025, 4, 7)
+        leave_request.clean()
+
+    def test_overlap_is_rejected(self):
+        self.create_request()
+        leave_request = LeaveRequest(
+            user=self.user, leave_type=self.leave_type,
+            start_date=FRIDAY, end_date=date(2025, 3, 10), status='pending'
+        )
+        with self.assertRaisesMessage(ValidationError, 'Il periodo si sovrappone'):
+            leave_request.clean()
+
+
+class RebuildLeaveBalancesTests(LeaveTestCase):
+    """
+    Comando rebuild_leave_balances.
+    """
+
+    def test_check_reports_consistent_ledger(self):
+        self.create_request(status='approved')
+        out = io.StringIO()
+        call_command('rebuild_leave_balances', '--check', stdout=out)
+        self.assertIn('coerente', out.getvalue())
+
+    def test_check_reports_drift_and_rebuild_fixes_it(self):
+        self.create_request(status='approved')
+        LeaveBalance.objects.update(used=Decimal('9'))
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_leave_balances', '--check', stdout=io.StringIO())
+        self.assertEqual(self.balance().used, Decimal('9'))
+
+        call_command('rebuild_leave_balances', stdout=io.StringIO())
+        self.assertEqual(self.balance().used, Decimal('5'))
+        call_command('rebuild_leave_balances', '--check', stdout=io.StringIO())
+
+
+class TransitionViewTests(LeaveTestCase):
+    """
+    Transizioni singole con concorrenza ottimistica.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.leave_request = self.create_request()
+        self.url = f'/api/v1/leaves/requests/{self.leave_request.pk}/transition/'
+
+    def test_approve(self):
+        response = self.client.post(self.url, {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['status'], 'approved')
+        balance = self.balance()
+        self.assertEqual(balance.used, Decimal('5'))
+        self.assertEqual(balance.pending, Decimal('0'))
+
+    def test_stale_version_returns_conflict(self):
+        response = self.client.post(
+            self.url, {'action': 'approve', 'updated_at': '2000-01-01T00:00:00Z'}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['code'], 'CONCURRENT_UPDATE')
+        self.assertEqual(response.data['data']['status'], 'pending')
+        self.leave_request.refresh_from_db()
+        self.assertEqual(self.leave_request.status, 'pending')
+
+    def test_invalid_transition_returns_conflict(self):
+        self.client.post(self.url, {'action': 'reject'}, format='json')
+        response = self.client.post(self.url, {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['code'], 'INVALID_TRANSITION')
+        self.assertEqual(response.data['data']['status'], 'rejected')
+
+    def test_owner_cannot_approve(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkTransitionTests(LeaveTestCase):
+    """
+    Approvazione e rifiuto in blocco.
+    """
+
+    def test_bulk_approve_reports_each_request(self):
+        other = self.create_user('collega@example.com')
+        first = self.create_request()
+        second = self.create_request(user=other)
+        approved = self.create_request(start_date=date(2025, 3, 10), end_date=date(2025, 3, 10), status='approved')
+        missing = approved.pk + 1000
+
+        results = bulk_transition([first.pk, second.pk, approved.pk, missing, first.pk], 'approve', self.manager)
+
+        self.assertEqual([result['id'] for result in results], [first.pk, second.pk, approved.pk, missing])
+        self.assertEqual([result['result'] for result in results], ['ok', 'ok', 'error', 'error'])
+        self.assertEqual(results[2]['code'], 'INVALID_STATUS')
+        self.assertEqual(results[3]['code'], 'NOT_FOUND')
+        self.assertEqual(
+            set(LeaveRequest.objects.filter(pk__in=[first.pk, second.pk]).values_list('status', 'approved_by')),
+            {('approved', self.manager.pk)}
+        )
+        self.assertEqual(self.balance().used, Decimal('6'))
+        self.assertEqual(self.balance().pending, Decimal('0'))
+        self.assertEqual(self.balance(other).used, Decimal('5'))
+
+    def test_bulk_view(self):
+        leave_request = self.create_request()
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        response = client.post(
+            '/api/v1/leaves/requests/bulk/', {'ids': [leave_request.pk], 'action': 'reject'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['updated'], 1)
+        leave_request.refresh_from_db()
+        self.assertEqual(leave_request.status, 'rejected')
+
+
+class AvailabilityTests(LeaveTestCase):
+    """
+    Bitmap mensili del calendario delle presenze.
+    """
+
+    def bitmaps(self):
+        row = AbsenceCalendarMonth.objects.get(department='IT', month=MARCH)
+        return row.absences, row.half_days
+
+    def test_create_and_delete_update_existing_month(self):
+        get_months('IT', MARCH, MARCH)
+        self.assertEqual(self.bitmaps(), ({}, {}))
+
+        leave_request = self.create_request(status='approved', half_day=True)
+        absences, half_days = self.bitmaps()
+        # Giorni dal 3 al 7 marzo: bit 2-6
+        self.assertEqual(absences, {str(self.user.pk): 0b1111100})
+        self.assertEqual(half_days, {str(self.user.pk): 1 << 6})
+
+        leave_request.delete()
+        self.assertEqual(self.bitmaps(), ({}, {}))
+
+    def test_create_builds_missing_month(self):
+        self.create_request(start_date=date(2025, 3, 29), end_date=date(2025, 4, 2), status='approved')
+        absences, _ = self.bitmaps()
+        self.assertEqual(absences, {str(self.user.pk): 0b111 << 28})
+        april = AbsenceCalendarMonth.objects.get(department='IT', month=date(2025, 4, 1))
+        self.assertEqual(april.absences, {str(self.user.pk): 0b11})
+
+    def test_pending_requests_are_not_shown(self):
+        leave_request = self.create_request()
+        get_months('IT', MARCH, MARCH)
+        self.assertEqual(self.bitmaps(), ({}, {}))
+
+        leave_request.status = 'approved'
+        leave_request.save()
+        self.assertEqual(self.bitmaps()[0], {str(self.user.pk): 0b1111100})
+
+
+class LeaveRequestImportTests(LeaveTestCase):
+    """
+    Importazione CSV delle richieste di assenza.
+    """
+
+    def import_rows(self, *rows):
+        header = 'email,leave_type,start_date,end_date,status\n'
+        return import_csv('leave_requests', io.StringIO(header + ''.join(row + '\n' for row in rows)))
+
+    def test_overlapping_rows_are_rejected(self):
+        self.create_request(status='approved')
+        result = self.import_rows(
+            # Sovrapposta alla richiesta esistente
+            'dipendente@example.com,Ferie test,2025-03-07,2025-03-10,approved',
+            'dipendente@example.com,Ferie test,2025-03-18,2025-03-20,approved',
+            # Sovrapposta alla riga precedente del file
+            'dipendente@example.com,Ferie test,2025-03-20,2025-03-21,pending',
+            # Le richieste annullate non occupano il calendario
+            'dipendente@example.com,Ferie test,2025-03-19,2025-03-19,cancelled',
+        )
+        self.assertEqual(result.imported, 2)
+        self.assertEqual(result.rejected, 2)
+        self.assertEqual([line for line, _ in result.errors], [2, 4])
+        self.assertEqual(self.balance().used, Decimal('8'))
+
+    def test_unknown_user_is_rejected(self):
+        result = self.import_rows('sconosciuto@example.com,Ferie test,2025-03-18,2025-03-20,approved')
+        self.assertEqual(result.imported, 0)
+        self.assertEqual(result.errors, [(2, 'Utente non trovato: sconosciuto@example.com')])
+
+
+class AccrualTests(LeaveTestCase):
+    """
+    Maturazione mensile: ripresa dopo un errore e idempotenza.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.users = get_user_model().objects.filter(pk__in=[self.user.pk, self.manager.pk])
+        # Solo il tipo di assenza del test matura giorni
+        LeaveType.objects.exclude(pk=self.leave_type.pk).update(annual_allowance=None)
+
+    def test_accrued_days(self):
+        result = run_accruals(MARCH, users=self.users)
+        self.assertEqual(result.users, 2)
+        self.assertEqual(result.rows, 2)
+        # Tre mesi su dodici di 20 giorni annui
+        self.assertEqual(self.balance().allocated, Decimal('5.0'))
+
+    def test_resume_processes_only_pending_chunks(self):
+        process_chunk = accruals.process_chunk
+        calls = []
+
+        def failing_chunk(chunk_id, month, leave_types):
+            calls.append(chunk_id)
+            if len(calls) == 2:
+                raise RuntimeError('errore simulato')
+            return process_chunk(chunk_id, month, leave_types)
+
+        with mock.patch('apps.leaves.accruals.process_chunk', side_effect=failing_chunk):
+            with self.assertRaises(AccrualError):
+                run_accruals(MARCH, users=self.users, chunk_size=1)
+        run = LeaveAccrualRun.objects.get(key='accrual-2025-03')
+        self.assertEqual(run.status, 'failed')
+        self.assertEqual(run.chunks.filter(finished_at__isnull=False).count(), 1)
+
+        result = run_accruals(MARCH, users=self.users, chunk_size=1)
+        self.assertEqual(result.chunks, 1)
+        self.assertEqual(result.skipped_chunks, 1)
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(run.users, 2)
+        self.assertEqual(
+            set(LeaveBalance.objects.filter(year=2025).values_list('user_id', 'allocated')),
+            {(self.user.pk, Decimal('5.0')), (self.manager.pk, Decimal('5.0'))}
+        )
+
+    def test_completed_run_is_not_repeated(self):
+        run_accruals(MARCH, users=self.users)
+        LeaveBalance.objects.update(allocated=Decimal('1'))
+
+        result = run_accruals(MARCH, users=self.users)
+        self.assertTrue(result.already_completed)
+        self.assertEqual(self.balance().allocated, Decimal('1'))
+
+        result = run_accruals(MARCH, users=self.users, force=True)
+        self.assertFalse(result.already_completed)
+        self.assertEqual(self.balance().allocated, Decimal('5.0'))
+
+    def test_key_of_another_month_is_rejected(self):
+        run_accruals(MARCH, key='chiusura', users=self.users)
+        with self.assertRaises(AccrualError):
+            run_accruals(date(2025, 4, 1), key='chiusura', users=self.users)
 
-# Create your tests here.
+    def test_existing_balance_keeps_request_totals(self):
+        self.create_request(status='approved')
+        run_accruals(MARCH, users=self.users)
+        balance = self.balance()
+        self.assertEqual(balance.allocated, Decimal('5.0'))
+        self.assertEqual(balance.used, Decimal('5'))
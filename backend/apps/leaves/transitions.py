@@ -0,0 +1,227 @@
+# backend/apps/leaves/transitions.py
+"""
+Transizioni di stato delle richieste di assenza.
+
+Le transizioni singole (transition) usano la concorrenza ottimistica: la
+richiesta viene letta senza lock e aggiornata con un UPDATE condizionato
+allo stato e a updated_at letti (o visti dal client). Se nel frattempo
+un'altra operazione l'ha modificata l'UPDATE non tocca righe e la
+transizione fallisce con LeaveRequestConflict, che l'API restituisce come
+409: il client rilegge la richiesta e decide se riprovare. La riga resta
+bloccata solo dall'UPDATE al commit, le notifiche partono dopo il commit.
+
+Le transizioni in blocco vengono applicate con UPDATE basati su insiemi in
+un'unica transazione: il registro dei saldi, il calendario delle presenze e
+i mesi da ricalcolare nei report sono aggiornati una sola volta per l'intero
+lotto e le notifiche partono con un solo segnale dopo il commit.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import availability, balances, rollups
+from .models import LeaveRequest
+from .signals import leave_requests_transitioned
+from .versions import requests_changed
+
+# Stati raggiungibili da ogni stato (vedi LeaveRequest.STATUS_CHOICES)
+ALLOWED_TRANSITIONS = {
+    'pending': {'approved', 'rejected', 'cancelled'},
+    'approved': {'cancelled'},
+    'rejected': set(),
+    'cancelled': set(),
+}
+
+# Azioni singole e stato risultante
+ACTIONS = {
+    'approve': 'approved',
+    'reject': 'rejected',
+    'cancel': 'cancelled',
+}
+
+# Stati che registrano chi ha deciso la richiesta
+DECISION_STATUSES = {'approved', 'rejected'}
+
+
+class LeaveRequestConflict(Exception):
+    """
+    Transizione non applicabile allo stato attuale della richiesta.
+
+    Attributes:
+        code: 'INVALID_TRANSITION' se lo stato attuale non ammette la
+              transizione, 'CONCURRENT_UPDATE' se la richiesta è stata
+              modificata dopo la lettura
+        status: Stato attuale della richiesta
+        updated_at: Data dell'ultima modifica della richiesta
+    """
+
+    def __init__(self, message, code, status, updated_at):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+        self.updated_at = updated_at
+
+
+def _apply_side_effects(pairs, request_ids, target, actor):
+    """
+    Aggiorna registro dei saldi, calendario delle presenze, report e versioni
+    e programma le notifiche dopo il commit.
+
+    Va chiamato nella transazione che ha aggiornato le richieste.
+
+    Args:
+        pairs: Coppie (previous, current) di valori di balances.LEDGER_FIELDS
+        request_ids: ID delle richieste aggiornate
+        target: Nuovo stato
+        actor: Utente che ha eseguito la transizione
+    """
+    balances.apply_changes(pairs)
+    availability.apply_changes(pairs)
+    rollups.mark_changes(pairs)
+    requests_changed(previous[0] for previous, _ in pairs)
+    transaction.on_commit(lambda: leave_requests_transitioned.send(
+        sender=LeaveRequest, request_ids=request_ids, status=target, actor=actor
+    ))
+
+
+def transition(pk, target, actor, seen_updated_at=None):
+    """
+    Porta una richiesta di assenza in un nuovo stato senza bloccarla in lettura.
+
+    Args:
+        pk: ID della richiesta
+        target: Stato di destinazione
+        actor: Utente che esegue la transizione
+        seen_updated_at: updated_at della versione su cui il chiamante ha
+                         deciso (default: quella letta ora)
+
+    Returns:
+        LeaveRequest: Richiesta aggiornata
+
+    Raises:
+        LeaveRequest.DoesNotExist: Se la richiesta non esiste
+        LeaveRequestConflict: Se la transizione non è ammessa o la richiesta
+                              è stata modificata nel frattempo
+    """
+    fields = ('updated_at', *balances.LEDGER_FIELDS)
+    with transaction.atomic():
+        row = LeaveRequest.objects.filter(pk=pk).values_list(*fields).first()
+        if row is None:
+            raise LeaveRequest.DoesNotExist(f"Richiesta di assenza {pk} non trovata")
+        updated_at, previous = row[0], row[1:]
+        current_status = previous[5]
+        if seen_updated_at is not None and seen_updated_at != updated_at:
+            raise LeaveRequestConflict(
+                "La richiesta è stata modificata da un'altra operazione",
+                'CONCURRENT_UPDATE', current_status, updated_at
+            )
+        if target not in ALLOWED_TRANSITIONS.get(current_status, set()):
+            raise LeaveRequestConflict(
+                f"Transizione non ammessa: {current_status} -> {target}",
+                'INVALID_TRANSITION', current_status, updated_at
+            )
+
+        now = timezone.now()
+        changes = {'status': target, 'updated_at': now}
+        if target in DECISION_STATUSES:
+            changes.update(approved_by=actor, approval_date=now)
+        # L'UPDATE riesce solo se nessuno ha modificato la riga dopo la
+        # lettura; con lo stesso updated_at anche gli altri valori letti
+        # sono ancora quelli attuali
+        updated = LeaveRequest.objects.filter(
+            pk=pk, status=current_status, updated_at=updated_at
+        ).update(**changes)
+        if not updated:
+            latest = LeaveRequest.objects.filter(pk=pk).values_list('status', 'updated_at').first()
+            if latest is None:
+                raise LeaveRequest.DoesNotExist(f"Richiesta di assenza {pk} non trovata")
+            raise LeaveRequestConflict(
+                "La richiesta è stata modificata da un'altra operazione",
+                'CONCURRENT_UPDATE', *latest
+            )
+
+        _apply_side_effects([(previous, previous[:5] + (target,))], [pk], target, actor)
+
+    return LeaveRequest.objects.select_related('user', 'leave_type', 'approved_by').get(pk=pk)
+
+
+# Azioni in blocco e stato risultante
+BULK_ACTIONS = {
+    'approve': 'approved',
+    'reject': 'rejected',
+}
+
+# Stato da cui partono le azioni in blocco
+BULK_SOURCE_STATUS = 'pending'
+
+# Numero massimo di richieste per chiamata
+MAX_BULK_SIZE = 500
+
+
+def bulk_transition(ids, action, actor):
+    """
+    Approva o rifiuta un insieme di richieste di assenza.
+
+    Le richieste vengono bloccate in ordine di ID, validate singolarmente e
+    aggiornate con un solo UPDATE; quelle non trovate o non più in attesa
+    vengono segnalate nel risultato senza interrompere il lotto.
+
+    Args:
+        ids: ID delle richieste
+        action: Chiave di BULK_ACTIONS
+        actor: Utente che esegue l'azione
+
+    Returns:
+        list: Per ogni ID (nell'ordine ricevuto, senza duplicati) un dizionario
+              con 'id', 'result' ('ok' o 'error') e, per gli errori, 'code'
+              e 'message'
+    """
+    target = BULK_ACTIONS[action]
+    ids = list(dict.fromkeys(ids))
+    now = timezone.now()
+
+    with transaction.atomic():
+        previous = {
+            row[0]: row[1:]
+            for row in (
+                LeaveRequest.objects.select_for_update()
+                .filter(pk__in=ids)
+                .order_by('pk')
+                .values_list('pk', *balances.LEDGER_FIELDS)
+            )
+        }
+
+        results = []
+        changed = []
+        for pk in ids:
+            values = previous.get(pk)
+            if values is None:
+                results.append({
+                    'id': pk,
+                    'result': 'error',
+                    'code': 'NOT_FOUND',
+                    'message': "Richiesta di assenza non trovata"
+                })
+            elif values[5] != BULK_SOURCE_STATUS:
+                results.append({
+                    'id': pk,
+                    'result': 'error',
+                    'code': 'INVALID_STATUS',
+                    'message': f"La richiesta non è in attesa (stato attuale: {values[5]})"
+                })
+            else:
+                changed.append(pk)
+                results.append({'id': pk, 'result': 'ok', 'status': target})
+
+        if changed:
+            LeaveRequest.objects.filter(pk__in=changed).update(
+                status=target,
+                approved_by=actor,
+                approval_date=now,
+                updated_at=now
+            )
+            pairs = [(previous[pk], previous[pk][:5] + (target,)) for pk in changed]
+            _apply_side_effects(pairs, changed, target, actor)
+
+    return results
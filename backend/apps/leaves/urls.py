@@ -0,0 +1,35 @@
+# backend/apps/leaves/urls.py
+
+from django.urls import path
+
+from .views import (
+    AbsenceReportView, DepartmentAvailabilityView, HolidayListView, LeaveBalanceView, LeaveFeedLinksView,
+    LeaveFeedView, LeaveRequestBulkTransitionView, LeaveRequestExportView, LeaveRequestListView,
+    LeaveRequestTransitionView, LeaveTypeListView
+)
+
+urlpatterns = [
+    # Dati di riferimento
+    path('types/', LeaveTypeListView.as_view(), name='leave_types'),
+    path('holidays/', HolidayListView.as_view(), name='holidays'),
+    
+    # Richieste di assenza
+    path('requests/', LeaveRequestListView.as_view(), name='leave_requests'),
+    path('requests/bulk/', LeaveRequestBulkTransitionView.as_view(), name='leave_requests_bulk'),
+    path('requests/export/', LeaveRequestExportView.as_view(), name='leave_requests_export'),
+    path('requests/<int:pk>/transition/', LeaveRequestTransitionView.as_view(), name='leave_request_transition'),
+    
+    # Saldi
+    path('balances/', LeaveBalanceView.as_view(), name='leave_balances'),
+    
+    # Calendario delle presenze
+    path('availability/', DepartmentAvailabilityView.as_view(), name='leave_availability'),
+    
+    # Feed iCalendar
+    path('feeds/', LeaveFeedLinksView.as_view(), name='leave_feeds'),
+    path('feeds/user/<str:token>.ics', LeaveFeedView.as_view(kind='user'), name='leave_feed_user'),
+    path('feeds/department/<str:token>.ics', LeaveFeedView.as_view(kind='department'), name='leave_feed_department'),
+    
+    # Report
+    path('reports/absences/', AbsenceReportView.as_view(), name='leave_absence_report'),
+]
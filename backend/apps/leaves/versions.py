@@ -0,0 +1,35 @@
+# backend/apps/leaves/versions.py
+"""
+Versioni delle richieste di assenza, usate come validatori delle risposte
+condizionali (vedi apps/core/conditional.py).
+
+Ogni modifica incrementa, dopo il commit, la versione globale e quella di
+ciascun utente coinvolto: l'elenco di un dipendente si confronta con la sua
+versione, quello dello staff con la versione globale.
+"""
+
+from django.db import transaction
+
+from apps.core.conditional import VersionCounter
+
+REQUEST_VERSIONS = VersionCounter('leaves:requests')
+
+
+def requests_changed(user_ids):
+    """
+    Segnala la modifica di richieste di assenza di alcuni utenti.
+
+    Le versioni vengono incrementate solo dopo il commit, così un client
+    non può associare la nuova versione a dati non ancora visibili.
+
+    Args:
+        user_ids: ID degli utenti le cui richieste sono cambiate
+    """
+    user_ids = sorted(set(user_ids))
+
+    def bump():
+        REQUEST_VERSIONS.bump()
+        for user_id in user_ids:
+            REQUEST_VERSIONS.bump('user', user_id)
+
+    transaction.on_commit(bump)
@@ -1,3 +1,713 @@
-from django.shortcuts import render
+# backend/apps/leaves/views.py
 
-# Create your views here.
+import tempfile
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from rest_framework import status, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.core.conditional import conditional, make_etag, not_modified, set_validators
+from apps.core.pagination import InvalidCursor, KeysetPaginator
+
+from . import availability, exports, feeds, reference
+from .models import AbsenceRollup, AbsenceRollupDirtyMonth, LeaveBalance, LeaveRequest
+from .serializers import (
+    AbsenceRollupSerializer, HolidaySerializer, LeaveBalanceSerializer, LeaveRequestBulkTransitionSerializer,
+    LeaveRequestSerializer, LeaveRequestTransitionSerializer, LeaveTypeSerializer
+)
+from .transitions import ACTIONS, DECISION_STATUSES, LeaveRequestConflict, bulk_transition, transition
+from .versions import REQUEST_VERSIONS
+from .work_calendar import get_calendar
+
+# Ampiezza massima del periodo richiesto al calendario delle presenze
+MAX_AVAILABILITY_DAYS = 93
+
+# Ampiezza massima del periodo di un report, in mesi
+MAX_REPORT_MONTHS = 36
+
+
+def _requests_version(request):
+    """
+    Versione delle richieste di assenza visibili all'utente, con quella dei
+    dati di riferimento (i nomi dei tipi di assenza compaiono nelle risposte).
+
+    Args:
+        request: Richiesta corrente
+
+    Returns:
+        tuple: Validatore dell'elenco delle richieste
+    """
+    if request.user.is_staff:
+        version = REQUEST_VERSIONS.get()
+    else:
+        version = REQUEST_VERSIONS.get('user', request.user.pk)
+    return version, reference.reference_version()
+
+
+class LeaveBalanceView(APIView):
+    """
+    Restituisce i saldi di assenza dell'utente autenticato per un anno.
+    
+    I saldi sono letti dal registro materializzato (LeaveBalance), senza
+    ricalcolare le richieste di assenza.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """
+        Recupera i saldi dell'utente corrente.
+        
+        Args:
+            request: Può contenere il parametro 'year' (default: anno corrente)
+            
+        Returns:
+            Response: Saldi per tipo di assenza
+        """
+        try:
+            year = int(request.query_params.get('year', date.today().year))
+        except ValueError:
+            return Response({
+                'status': 'error',
+                'message': "Il parametro 'year' deve essere un numero",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        balances = (
+            LeaveBalance.objects
+            .filter(user=request.user, year=year)
+            .select_related('leave_type')
+            .order_by('leave_type__name')
+        )
+        serializer = LeaveBalanceSerializer(balances, many=True)
+        return Response({
+            'status': 'success',
+            'data': serializer.data
+        })
+
+
+class DepartmentAvailabilityView(APIView):
+    """
+    Restituisce, per un reparto e un periodo, la matrice giorno per dipendente
+    delle assenze approvate.
+    
+    La matrice è letta dalle bitmap mensili precalcolate (vedi availability.py)
+    e la risposta porta un ETag derivato dalle loro versioni: un client che
+    invia If-None-Match con il valore ricevuto ottiene 304 finché nessuna
+    assenza del periodo cambia.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """
+        Recupera il calendario delle presenze.
+        
+        Args:
+            request: Può contenere i parametri 'start' e 'end' (YYYY-MM-DD,
+                     default: mese corrente) e 'department' (default: reparto
+                     dell'utente; solo lo staff può indicarne un altro)
+            
+        Returns:
+            Response: Giorni del periodo, giorni lavorativi e assenze per dipendente
+        """
+        today = date.today()
+        try:
+            start_date = parse_date(request.query_params.get('start', '')) or availability.month_start(today)
+            end_date = (
+                parse_date(request.query_params.get('end', ''))
+                or availability.next_month(start_date.replace(day=1)) - timedelta(days=1)
+            )
+        except ValueError:
+            start_date = end_date = None
+        if start_date is None or end_date is None or end_date < start_date:
+            return Response({
+                'status': 'error',
+                'message': "I parametri 'start' e 'end' devono essere date valide (YYYY-MM-DD) con start <= end",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if (end_date - start_date).days >= MAX_AVAILABILITY_DAYS:
+            return Response({
+                'status': 'error',
+                'message': f"Il periodo richiesto non può superare {MAX_AVAILABILITY_DAYS} giorni",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        department = request.query_params.get('department', request.user.department)
+        if department != request.user.department and not request.user.is_staff:
+            return Response({
+                'status': 'error',
+                'message': "Non hai i permessi per consultare questo reparto",
+                'code': 'PERMISSION_DENIED'
+            }, status=status.HTTP_403_FORBIDDEN)
+        if not department:
+            return Response({
+                'status': 'error',
+                'message': "Nessun reparto indicato",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        employees = list(
+            get_user_model().objects
+            .filter(department=department, is_active=True)
+            .order_by('last_name', 'first_name', 'id')
+            .values_list('id', 'first_name', 'last_name')
+        )
+        months = availability.get_months(department, start_date, end_date)
+        etag = availability.availability_etag(
+            department, start_date, end_date, months.values(), employees,
+            holidays_version=reference.reference_version()
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        calendar = get_calendar(start_date.year, end_date.year)
+        days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        response = Response({
+            'status': 'success',
+            'data': {
+                'department': department,
+                'start': start_date,
+                'end': end_date,
+                'days': days,
+                'working': [1 if calendar.is_working_day(day) else 0 for day in days],
+                'employees': availability.availability_matrix(start_date, end_date, months, employees)
+            }
+        })
+        set_validators(response, etag)
+        return response
+
+
+class LeaveRequestListView(APIView):
+    """
+    Elenca le richieste di assenza con filtri e paginazione keyset.
+    
+    Le pagine sono ordinate su (start_date, id) e proseguono dal cursore
+    dell'ultima riga, così il costo di ogni pagina resta costante al crescere
+    della tabella (indici composti in Meta.indexes di LeaveRequest). Utente,
+    tipo di assenza e approvatore sono letti con la stessa query tramite join.
+    
+    Gli utenti non staff vedono solo le proprie richieste. Le risposte
+    portano un ETag derivato dalla versione delle richieste (vedi
+    versions.py): finché nessuna richiesta visibile all'utente cambia, una
+    GET con If-None-Match riceve 304 senza eseguire la query.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @conditional(etag_func=lambda view, request: _requests_version(request))
+    def get(self, request):
+        """
+        Recupera una pagina di richieste di assenza.
+        
+        Args:
+            request: Può contenere i parametri 'user' (solo staff), 'status'
+                     (anche più stati separati da virgola), 'leave_type',
+                     'from' e 'to' (YYYY-MM-DD, richieste che intersecano il
+                     periodo), 'order' ('asc' o 'desc', default 'desc'),
+                     'cursor' e 'page_size'
+            
+        Returns:
+            Response: Richieste della pagina e cursore della pagina successiva
+        """
+        params = request.query_params
+        queryset = LeaveRequest.objects.select_related('user', 'leave_type', 'approved_by')
+        
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        elif params.get('user'):
+            if not params['user'].isdigit():
+                return self._validation_error("Il parametro 'user' deve essere un numero")
+            queryset = queryset.filter(user_id=params['user'])
+        
+        if params.get('status'):
+            statuses = params['status'].split(',')
+            valid = {choice for choice, _ in LeaveRequest.STATUS_CHOICES}
+            if not set(statuses) <= valid:
+                return self._validation_error(f"Stato non valido, valori ammessi: {', '.join(sorted(valid))}")
+            queryset = queryset.filter(status__in=statuses)
+        
+        if params.get('leave_type'):
+            if not params['leave_type'].isdigit():
+                return self._validation_error("Il parametro 'leave_type' deve essere un numero")
+            queryset = queryset.filter(leave_type_id=params['leave_type'])
+        
+        for name, lookup in (('from', 'end_date__gte'), ('to', 'start_date__lte')):
+            if params.get(name):
+                try:
+                    value = parse_date(params[name])
+                except ValueError:
+                    value = None
+                if value is None:
+                    return self._validation_error(f"Il parametro '{name}' deve essere una data (YYYY-MM-DD)")
+                queryset = queryset.filter(**{lookup: value})
+        
+        order = params.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            return self._validation_error("Il parametro 'order' deve essere 'asc' o 'desc'")
+        
+        paginator = KeysetPaginator(('start_date', 'id'), descending=order == 'desc')
+        try:
+            rows, next_cursor = paginator.paginate(queryset, params.get('cursor'), params.get('page_size'))
+        except InvalidCursor as e:
+            return self._validation_error(str(e))
+        
+        serializer = LeaveRequestSerializer(rows, many=True)
+        return Response({
+            'status': 'success',
+            'data': {
+                'results': serializer.data,
+                'next_cursor': next_cursor
+            }
+        })
+    
+    def _validation_error(self, message):
+        return Response({
+            'status': 'error',
+            'message': message,
+            'code': 'VALIDATION_ERROR'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LeaveRequestBulkTransitionView(APIView):
+    """
+    Approva o rifiuta in blocco un insieme di richieste di assenza in attesa.
+    
+    Riservata allo staff. Il lotto viene applicato in un'unica transazione
+    con UPDATE basati su insiemi (vedi transitions.py); la risposta riporta
+    l'esito di ogni richiesta.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def post(self, request):
+        """
+        Applica la transizione alle richieste indicate.
+        
+        Args:
+            request: Contiene 'ids' (lista di ID) e 'action' ('approve' o 'reject')
+            
+        Returns:
+            Response: Esito per ogni richiesta e numero di richieste aggiornate
+        """
+        serializer = LeaveRequestBulkTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'error',
+                'message': serializer.errors,
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = bulk_transition(
+            serializer.validated_data['ids'],
+            serializer.validated_data['action'],
+            request.user
+        )
+        return Response({
+            'status': 'success',
+            'data': {
+                'updated': sum(1 for result in results if result['result'] == 'ok'),
+                'results': results
+            }
+        })
+
+
+class LeaveRequestTransitionView(APIView):
+    """
+    Approva, rifiuta o annulla una richiesta di assenza.
+    
+    Approvazione e rifiuto sono riservati allo staff; il richiedente può
+    annullare le proprie richieste. La transizione usa la concorrenza
+    ottimistica (vedi transitions.py): se il client invia 'updated_at' della
+    versione che ha letto e la richiesta è cambiata nel frattempo, o se lo
+    stato attuale non ammette la transizione, la risposta è 409 con lo stato
+    attuale.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, pk):
+        """
+        Applica la transizione.
+        
+        Args:
+            request: Contiene 'action' ('approve', 'reject' o 'cancel') e,
+                     opzionalmente, 'updated_at' della versione letta
+            pk: ID della richiesta
+            
+        Returns:
+            Response: Richiesta aggiornata, oppure errore di validazione,
+                     permessi, richiesta non trovata o conflitto
+        """
+        serializer = LeaveRequestTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'error',
+                'message': serializer.errors,
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        target = ACTIONS[serializer.validated_data['action']]
+        
+        owner_id = LeaveRequest.objects.filter(pk=pk).values_list('user_id', flat=True).first()
+        if owner_id is None or (owner_id != request.user.pk and not request.user.is_staff):
+            return Response({
+                'status': 'error',
+                'message': "Richiesta di assenza non trovata",
+                'code': 'NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+        if target in DECISION_STATUSES and not request.user.is_staff:
+            return Response({
+                'status': 'error',
+                'message': "Solo lo staff può approvare o rifiutare le richieste",
+                'code': 'PERMISSION_DENIED'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            leave_request = transition(pk, target, request.user, serializer.validated_data.get('updated_at'))
+        except LeaveRequest.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': "Richiesta di assenza non trovata",
+                'code': 'NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except LeaveRequestConflict as e:
+            return Response({
+                'status': 'error',
+                'message': e.message,
+                'code': e.code,
+                'data': {
+                    'status': e.status,
+                    'updated_at': e.updated_at
+                }
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'status': 'success',
+            'data': LeaveRequestSerializer(leave_request).data
+        })
+
+
+class LeaveRequestExportView(APIView):
+    """
+    Esporta le richieste di assenza di un periodo per le paghe.
+    
+    Riservata allo staff. Il CSV viene trasmesso in streaming un blocco alla
+    volta; l'XLSX viene scritto in modalità write-only su un file temporaneo
+    e poi inviato. In entrambi i casi le righe sono lette a blocchi (vedi
+    exports.py) e la memoria usata non dipende dal numero di righe.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """
+        Genera l'esportazione.
+        
+        Args:
+            request: Contiene 'from' e 'to' (YYYY-MM-DD) e può contenere
+                     'status' (anche più stati separati da virgola) e
+                     'export_format' ('csv' o 'xlsx', default 'csv')
+            
+        Returns:
+            StreamingHttpResponse o FileResponse: File esportato
+        """
+        params = request.query_params
+        try:
+            start_date = parse_date(params.get('from', ''))
+            end_date = parse_date(params.get('to', ''))
+        except ValueError:
+            start_date = end_date = None
+        if start_date is None or end_date is None or end_date < start_date:
+            return self._validation_error(
+                "I parametri 'from' e 'to' devono essere date valide (YYYY-MM-DD) con from <= to"
+            )
+        
+        statuses = params['status'].split(',') if params.get('status') else None
+        valid = {choice for choice, _ in LeaveRequest.STATUS_CHOICES}
+        if statuses and not set(statuses) <= valid:
+            return self._validation_error(f"Stato non valido, valori ammessi: {', '.join(sorted(valid))}")
+        
+        export_format = params.get('export_format', 'csv')
+        if export_format not in exports.EXPORT_FORMATS:
+            return self._validation_error(
+                f"Formato non valido, valori ammessi: {', '.join(exports.EXPORT_FORMATS)}"
+            )
+        
+        queryset = exports.export_queryset(start_date, end_date, statuses)
+        filename = f"assenze_{start_date}_{end_date}.{export_format}"
+        
+        if export_format == 'csv':
+            response = StreamingHttpResponse(
+                exports.stream_csv(queryset, start_date, end_date),
+                content_type='text/csv; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        
+        output = tempfile.TemporaryFile()
+        try:
+            exports.write_xlsx(queryset, start_date, end_date, output)
+        except exports.ExportError as e:
+            output.close()
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'code': 'EXPORT_UNAVAILABLE'
+            }, status=status.HTTP_501_NOT_IMPLEMENTED)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=filename,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    def _validation_error(self, message):
+        return Response({
+            'status': 'error',
+            'message': message,
+            'code': 'VALIDATION_ERROR'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AbsenceReportView(APIView):
+    """
+    Report delle assenze approvate per reparto, tipo di assenza e mese.
+    
+    Riservata allo staff. Legge solo gli aggregati precalcolati
+    (AbsenceRollup, vedi rollups.py); i mesi modificati e non ancora
+    ricalcolati sono elencati in 'stale_months'.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """
+        Recupera il report.
+        
+        Args:
+            request: Contiene 'from' e 'to' (YYYY-MM) e può contenere
+                     'department' e 'leave_type'
+            
+        Returns:
+            Response: Righe per reparto, tipo e mese e totali per reparto e
+                      mese con giorni retribuiti/non retribuiti e tasso di assenza
+        """
+        params = request.query_params
+        try:
+            first = datetime.strptime(params.get('from', ''), '%Y-%m').date()
+            last = datetime.strptime(params.get('to', ''), '%Y-%m').date()
+        except ValueError:
+            first = last = None
+        if first is None or last < first:
+            return Response({
+                'status': 'error',
+                'message': "I parametri 'from' e 'to' devono essere mesi validi (YYYY-MM) con from <= to",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if (last.year - first.year) * 12 + last.month - first.month >= MAX_REPORT_MONTHS:
+            return Response({
+                'status': 'error',
+                'message': f"Il periodo richiesto non può superare {MAX_REPORT_MONTHS} mesi",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = AbsenceRollup.objects.filter(month__range=(first, last))
+        if 'department' in params:
+            queryset = queryset.filter(department=params['department'])
+        if params.get('leave_type'):
+            if not params['leave_type'].isdigit():
+                return Response({
+                    'status': 'error',
+                    'message': "Il parametro 'leave_type' deve essere un numero",
+                    'code': 'VALIDATION_ERROR'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(leave_type_id=params['leave_type'])
+        rollups = list(queryset.order_by('month', 'department', 'leave_type_name'))
+        
+        # Totali per reparto e mese; il tasso di assenza è il rapporto tra
+        # giorni di assenza e giorni lavorativi dell'organico
+        calendar = get_calendar(first.year, last.year)
+        summary = defaultdict(lambda: {
+            'requests': 0, 'days': Decimal('0'), 'paid_days': Decimal('0'), 'unpaid_days': Decimal('0'), 'headcount': 0
+        })
+        for rollup in rollups:
+            total = summary[(rollup.department, rollup.month)]
+            total['requests'] += rollup.requests
+            total['days'] += rollup.days
+            total['paid_days' if rollup.is_paid else 'unpaid_days'] += rollup.days
+            total['headcount'] = rollup.headcount
+        totals = []
+        for (department, month), total in sorted(summary.items(), key=lambda item: (item[0][1], item[0][0])):
+            working_days = calendar.working_days(month, availability.next_month(month) - timedelta(days=1))
+            capacity = total['headcount'] * working_days
+            totals.append({
+                'department': department,
+                'month': f"{month:%Y-%m}",
+                **total,
+                'working_days': working_days,
+                'absence_rate': round(float(total['days']) / capacity, 4) if capacity else None,
+            })
+        
+        stale = AbsenceRollupDirtyMonth.objects.filter(month__range=(first, last)).order_by('month')
+        return Response({
+            'status': 'success',
+            'data': {
+                'rows': AbsenceRollupSerializer(rollups, many=True).data,
+                'totals': totals,
+                'stale_months': [f"{month:%Y-%m}" for month in stale.values_list('month', flat=True)]
+            }
+        })
+
+
+class LeaveTypeListView(APIView):
+    """
+    Elenca i tipi di assenza.
+    
+    I dati sono letti dalla cache in memoria dei dati di riferimento
+    (vedi reference.py), senza query al database; l'ETag è la loro versione.
+    Con token_user l'autenticazione usa i claim del token, senza leggere
+    l'utente (vedi apps/accounts/authentication.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    token_user = True
+    
+    @conditional(etag_func=lambda view, request: reference.reference_version())
+    def get(self, request):
+        """
+        Recupera i tipi di assenza ordinati per nome.
+        
+        Returns:
+            Response: Tipi di assenza
+        """
+        serializer = LeaveTypeSerializer(reference.leave_types(), many=True)
+        return Response({
+            'status': 'success',
+            'data': serializer.data
+        })
+
+class HolidayListView(APIView):
+    """
+    Elenca le festività di un anno, con quelle ricorrenti riportate sull'anno.
+    
+    I dati sono letti dalla cache in memoria dei dati di riferimento
+    (vedi reference.py), senza query al database; l'ETag è la loro versione
+    insieme all'anno corrente, che fa da default del parametro 'year'.
+    Con token_user l'autenticazione usa i claim del token, senza leggere
+    l'utente (vedi apps/accounts/authentication.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    token_user = True
+    
+    @conditional(etag_func=lambda view, request: (reference.reference_version(), date.today().year))
+    def get(self, request):
+        """
+        Recupera le festività.
+        
+        Args:
+            request: Può contenere il parametro 'year' (default: anno corrente)
+            
+        Returns:
+            Response: Festività ordinate per data
+        """
+        try:
+            year = int(request.query_params.get('year', date.today().year))
+        except ValueError:
+            return Response({
+                'status': 'error',
+                'message': "Il parametro 'year' deve essere un numero",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not date.min.year <= year <= date.max.year:
+            return Response({
+                'status': 'error',
+                'message': "Anno non valido",
+                'code': 'VALIDATION_ERROR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = []
+        for day, holiday in reference.holidays_in_year(year):
+            item = HolidaySerializer(holiday).data
+            item['date'] = day.isoformat()
+            data.append(item)
+        return Response({
+            'status': 'success',
+            'data': data
+        })
+
+
+class LeaveFeedLinksView(APIView):
+    """
+    Restituisce i link firmati ai feed iCalendar dell'utente corrente, da
+    aggiungere come calendari in abbonamento.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """
+        Recupera i link ai feed personale e di reparto.
+        
+        Returns:
+            Response: URL assoluti dei feed ('department' è None se l'utente
+                     non ha un reparto)
+        """
+        links = {}
+        for kind in feeds.FEED_KINDS:
+            links[kind] = request.build_absolute_uri(
+                reverse(f'leave_feed_{kind}', kwargs={'token': feeds.feed_token(request.user, kind)})
+            )
+        if not request.user.department:
+            links['department'] = None
+        return Response({
+            'status': 'success',
+            'data': links
+        })
+
+
+class LeaveFeedView(APIView):
+    """
+    Pubblica un feed iCalendar delle assenze approvate e delle festività.
+    
+    L'accesso avviene con il token firmato dell'URL, perché i client di
+    calendario non inviano il token JWT. Il contenuto è composto da
+    frammenti in cache (vedi feeds.py) e la risposta porta un ETag derivato
+    dalle versioni dei frammenti: le interrogazioni periodiche dei client
+    ricevono 304 senza leggere le richieste di assenza.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    kind = 'user'
+    
+    def get(self, request, token):
+        """
+        Recupera il feed.
+        
+        Args:
+            request: Richiesta del client di calendario
+            token: Token firmato del link
+            
+        Returns:
+            HttpResponse: Feed in formato text/calendar, 304 se invariato
+        """
+        user = feeds.feed_user(token, self.kind)
+        if user is None or (self.kind == 'department' and not user.department):
+            return Response({
+                'status': 'error',
+                'message': "Feed non trovato",
+                'code': 'NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if self.kind == 'department':
+            feed = feeds.department_feed(user.department)
+        else:
+            feed = feeds.user_feed(user)
+        etag = make_etag(request, feed.validator)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        response = HttpResponse(feed.render(), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="assenze-{self.kind}.ics"'
+        set_validators(response, etag)
+        return response
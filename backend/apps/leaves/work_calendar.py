@@ -0,0 +1,386 @@
+# backend/apps/leaves/work_calendar.py
+"""
+Calendario dei giorni lavorativi usato per calcolare la durata delle assenze.
+
+Il calendario viene compilato una volta per un intervallo di anni:
+- una bitmap (un byte per giorno) con 1 per i giorni lavorativi, che esclude
+  i giorni di weekend (LEAVES_WEEKEND_DAYS) e le festività della tabella
+  Holiday, espandendo quelle ricorrenti su ogni anno;
+- le somme prefisse della bitmap, così il numero di giorni lavorativi tra due
+  date si ottiene con una sottrazione, in O(1).
+
+Per i report è disponibile un calcolo vettoriale (con NumPy, se installato)
+della durata di decine di migliaia di richieste in un'unica operazione.
+
+Il calendario compilato resta in memoria nel processo. Ogni modifica alla
+tabella Holiday incrementa una versione nella cache condivisa di Django
+(vedi signals.py): gli altri processi ricompilano il calendario al primo
+controllo successivo, eseguito al massimo ogni VERSION_CHECK_INTERVAL secondi.
+"""
+
+import threading
+import time
+from array import array
+from datetime import date
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Holiday
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    np = None
+
+# Chiavi della cache condivisa
+VERSION_CACHE_KEY = 'leaves:calendar:version'
+HOLIDAYS_CACHE_KEY = 'leaves:calendar:holidays:{version}'
+
+# Secondi tra due controlli della versione nella cache condivisa
+VERSION_CHECK_INTERVAL = 5.0
+
+# Anni compilati attorno all'anno corrente, oltre a quelli richiesti
+DEFAULT_YEARS_AROUND = 1
+
+HALF_DAY = Decimal('0.5')
+
+
+class WorkingCalendar:
+    """
+    Bitmap dei giorni lavorativi per un intervallo di anni, con somme prefisse.
+    """
+
+    def __init__(self, holidays, first_year, last_year, weekend_days=(5, 6)):
+        """
+        Compila il calendario.
+
+        Args:
+            holidays: Iterabile di coppie (data, ricorrente)
+            first_year: Primo anno compilato
+            last_year: Ultimo anno compilato (incluso)
+            weekend_days: Giorni della settimana non lavorativi (0 = lunedì)
+        """
+        self.first_year = first_year
+        self.last_year = last_year
+        self.weekend_days = frozenset(weekend_days)
+        self.origin = date(first_year, 1, 1).toordinal()
+        size = date(last_year, 12, 31).toordinal() - self.origin + 1
+
+        # Settimana tipo, ruotata per iniziare dal giorno della settimana del 1° gennaio
+        week = bytes(0 if day in self.weekend_days else 1 for day in range(7))
+        offset = date(first_year, 1, 1).weekday()
+        week = week[offset:] + week[:offset]
+        days = bytearray((week * (size // 7 + 1))[:size])
+
+        self.holidays = set()
+        for holiday_date, is_recurring in holidays:
+            if is_recurring:
+                for year in range(first_year, last_year + 1):
+                    try:
+                        self.holidays.add(holiday_date.replace(year=year))
+                    except ValueError:
+                        # 29 febbraio negli anni non bisestili
+                        pass
+            elif first_year <= holiday_date.year <= last_year:
+                self.holidays.add(holiday_date)
+        for holiday_date in self.holidays:
+            days[holiday_date.toordinal() - self.origin] = 0
+
+        self.days = days
+        # prefix[i] = giorni lavorativi nei primi i giorni del calendario
+        self.prefix = array('l', accumulate(days, initial=0))
+        self._np_prefix = None
+
+    def covers(self, first_year, last_year):
+        """
+        Args:
+            first_year: Primo anno richiesto
+            last_year: Ultimo anno richiesto
+
+        Returns:
+            bool: True se gli anni richiesti sono compilati
+        """
+        return self.first_year <= first_year and last_year <= self.last_year
+
+    def is_working_day(self, day):
+        """
+        Args:
+            day: Data da verificare
+
+        Returns:
+            bool: True se la data è un giorno lavorativo
+
+        Raises:
+            ValueError: Se la data è fuori dagli anni compilati
+        """
+        return bool(self.days[self._index(day)])
+
+    def working_days(self, start_date, end_date):
+        """
+        Conta i giorni lavorativi tra due date, estremi inclusi.
+
+        Args:
+            start_date: Data di inizio
+            end_date: Data di fine
+
+        Returns:
+            int: Giorni lavorativi (0 se end_date precede start_date)
+
+        Raises:
+            ValueError: Se le date sono fuori dagli anni compilati
+        """
+        if end_date < start_date:
+            return 0
+        return self.prefix[self._index(end_date) + 1] - self.prefix[self._index(start_date)]
+
+    def duration(self, start_date, end_date, half_day=False):
+        """
+        Calcola la durata di un'assenza in giorni lavorativi.
+
+        Con half_day l'ultimo giorno conta come mezza giornata (per una
+        richiesta di un solo giorno la durata è quindi 0.5), solo se è un
+        giorno lavorativo: se cade nel fine settimana o in una festività non
+        è conteggiato comunque.
+
+        Args:
+            start_date: Data di inizio
+            end_date: Data di fine
+            half_day: Se True l'assenza termina con una mezza giornata
+
+        Returns:
+            Decimal: Giorni lavorativi di assenza
+        """
+        days = Decimal(self.working_days(start_date, end_date))
+        if half_day and days and self.is_working_day(end_date):
+            days -= HALF_DAY
+        return days
+
+    def durations(self, start_dates, end_dates, half_days=None):
+        """
+        Calcola la durata di molte assenze in un'unica operazione.
+
+        Con NumPy il calcolo è interamente vettoriale: le date vengono
+        convertite in indici della bitmap e la durata è la differenza tra due
+        letture delle somme prefisse. Senza NumPy si usa lo stesso algoritmo
+        riga per riga.
+
+        Args:
+            start_dates: Sequenza di date di inizio
+            end_dates: Sequenza di date di fine
+            half_days: Sequenza opzionale di flag di mezza giornata (come in
+                       duration(), contano solo se la data di fine è un
+                       giorno lavorativo)
+
+        Returns:
+            numpy.ndarray o list: Durate in giorni (float), nello stesso ordine
+
+        Raises:
+            ValueError: Se qualche data è fuori dagli anni compilati
+        """
+        if np is None:
+            if half_days is None:
+                half_days = [False] * len(start_dates)
+            return [
+                float(self.duration(start, end, half))
+                for start, end, half in zip(start_dates, end_dates, half_days)
+            ]
+
+        if self._np_prefix is None:
+            self._np_prefix = np.frombuffer(self.prefix, dtype=self.prefix.typecode)
+        # toordinal() è molto più rapido della conversione di oggetti date in datetime64
+        count = len(start_dates)
+        starts = np.fromiter((day.toordinal() for day in start_dates), dtype=np.int64, count=count) - self.origin
+        ends = np.fromiter((day.toordinal() for day in end_dates), dtype=np.int64, count=count) - self.origin
+        # Intervalli vuoti (fine prima dell'inizio): durata 0
+        ends = np.maximum(ends, starts - 1)
+        size = len(self.days)
+        if count and (starts.min() < 0 or ends.min() < -1 or starts.max() > size or ends.max() >= size):
+            raise ValueError(f"Date fuori dal calendario compilato ({self.first_year}-{self.last_year})")
+
+        result = (self._np_prefix[ends + 1] - self._np_prefix[starts]).astype(np.float64)
+        if half_days is not None:
+            # Con result > 0 la data di fine è nel calendario
+            safe_ends = np.maximum(ends, 0)
+            end_working = self._np_prefix[safe_ends + 1] > self._np_prefix[safe_ends]
+            half = np.asarray(half_days, dtype=bool) & (result > 0) & end_working
+            result[half] -= 0.5
+        return result
+
+    def _index(self, day):
+        """
+        Args:
+            day: Data da convertire
+
+        Returns:
+            int: Posizione della data nella bitmap
+
+        Raises:
+            ValueError: Se la data è fuori dagli anni compilati
+        """
+        index = day.toordinal() - self.origin
+        if index < 0 or index >= len(self.days):
+            raise ValueError(f"{day} fuori dal calendario compilato ({self.first_year}-{self.last_year})")
+        return index
+
+
+class _CalendarState:
+    """
+    Calendario compilato nel processo e versione da cui deriva.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calendar = None
+        self.version = None
+        self.checked_at = 0.0
+
+
+_state = _CalendarState()
+
+
+def _shared_version():
+    """
+    Legge la versione delle festività dalla cache condivisa, al massimo ogni
+    VERSION_CHECK_INTERVAL secondi.
+
+    Returns:
+        int: Versione corrente
+    """
+    now = time.monotonic()
+    if _state.version is not None and now - _state.checked_at < VERSION_CHECK_INTERVAL:
+        return _state.version
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    _state.checked_at = now
+    return version
+
+
+def _load_holidays(version):
+    """
+    Restituisce le festività, dalla cache condivisa o dal database.
+
+    Args:
+        version: Versione delle festività
+
+    Returns:
+        list: Coppie (data, ricorrente)
+    """
+    key = HOLIDAYS_CACHE_KEY.format(version=version)
+    holidays = cache.get(key)
+    if holidays is None:
+        holidays = list(Holiday.objects.values_list('date', 'is_recurring'))
+        cache.set(key, holidays, timeout=None)
+    return holidays
+
+
+def get_calendar(first_year=None, last_year=None):
+    """
+    Restituisce il calendario compilato che copre gli anni richiesti.
+
+    Il calendario viene ricompilato solo se le festività sono cambiate o se
+    gli anni richiesti non sono ancora coperti.
+
+    Args:
+        first_year: Primo anno necessario (default: anno corrente)
+        last_year: Ultimo anno necessario (default: first_year)
+
+    Returns:
+        WorkingCalendar: Calendario dei giorni lavorativi
+    """
+    current_year = date.today().year
+    first_year = first_year or current_year
+    last_year = max(last_year or first_year, first_year)
+
+    version = _shared_version()
+    calendar = _state.calendar
+    if calendar is not None and _state.version == version and calendar.covers(first_year, last_year):
+        return calendar
+
+    with _state.lock:
+        calendar = _state.calendar
+        if calendar is None or _state.version != version or not calendar.covers(first_year, last_year):
+            # Si estende l'intervallo già compilato, così richieste alternate
+            # su anni diversi non provocano ricompilazioni continue
+            years = [first_year, last_year, current_year - DEFAULT_YEARS_AROUND, current_year + DEFAULT_YEARS_AROUND]
+            if calendar is not None and _state.version == version:
+                years += [calendar.first_year, calendar.last_year]
+            calendar = WorkingCalendar(
+                _load_holidays(version),
+                min(years),
+                max(years),
+                weekend_days=getattr(settings, 'LEAVES_WEEKEND_DAYS', (5, 6))
+            )
+            _state.calendar = calendar
+            _state.version = version
+    return calendar
+
+
+def build_calendar(first_year, last_year):
+    """
+    Compila un calendario dalle festività lette ora dal database, senza
+    usare né aggiornare le cache.
+
+    Serve dentro la transazione che modifica le festività: get_calendar()
+    restituisce il calendario precedente fino al commit.
+
+    Args:
+        first_year: Primo anno
+        last_year: Ultimo anno (incluso)
+
+    Returns:
+        WorkingCalendar: Calendario dei giorni lavorativi
+    """
+    return WorkingCalendar(
+        Holiday.objects.values_list('date', 'is_recurring'),
+        first_year,
+        max(last_year, first_year),
+        weekend_days=getattr(settings, 'LEAVES_WEEKEND_DAYS', (5, 6))
+    )
+
+
+def invalidate_calendar():
+    """
+    Invalida il calendario compilato in tutti i processi.
+
+    Chiamato dai segnali di Holiday; va chiamato esplicitamente dopo
+    modifiche massive (queryset.update, bulk_create) che non emettono segnali.
+    Dentro una transazione va registrato con transaction.on_commit: se la
+    versione cambia prima del commit, un altro processo può ricaricare le
+    festività precedenti e conservarle con la nuova versione.
+    """
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # Chiave assente (cache svuotata o mai inizializzata)
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        cache.incr(VERSION_CACHE_KEY)
+    with _state.lock:
+        _state.calendar = None
+        _state.version = None
+        _state.checked_at = 0.0
+
+
+def leave_durations(queryset):
+    """
+    Calcola in blocco la durata in giorni lavorativi delle richieste di assenza.
+
+    Args:
+        queryset: QuerySet di LeaveRequest
+
+    Returns:
+        dict: Durata in giorni (float) per id della richiesta
+    """
+    rows = list(queryset.values_list('id', 'start_date', 'end_date', 'half_day'))
+    if not rows:
+        return {}
+    ids, starts, ends, half_days = zip(*rows)
+    calendar = get_calendar(min(min(starts), min(ends)).year, max(max(starts), max(ends)).year)
+    result = calendar.durations(starts, ends, half_days)
+    if np is not None:
+        result = result.tolist()
+    return dict(zip(ids, result))
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hrease.settings.development')
+# Sotto ASGI i log vengono spediti dal loop del server (apps.core.logging.AsyncLogHandler)
+os.environ.setdefault('LOGGING_ASYNC', 'True')
 
 application = get_asgi_application()
@@ -3,6 +3,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 #test logging
 import logging
 logger = logging.getLogger(__name__)
@@ -23,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -35,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Per primo, così i tempi misurati includono gli altri middleware
+    'apps.core.middleware.RequestContextMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -103,7 +108,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication con l'utente letto dalla cache (vedi apps/accounts/authentication.py)
+        'apps.accounts.authentication.CachedJWTAuthentication',
     ],
 }
 
@@ -113,7 +119,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_LIFETIME', 7))),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login è aggiornato da CustomTokenObtainPairSerializer al più una
+    # volta ogni LAST_LOGIN_INTERVAL (vedi apps/accounts/authentication.py)
+    'UPDATE_LAST_LOGIN': False,
     
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': os.environ.get('JWT_SECRET_KEY', SECRET_KEY),
@@ -145,12 +153,59 @@ TEMPLATES = [
     },
 ]
 
+# Il frontend può inviare il proprio X-Request-ID e leggere quello della risposta
+CORS_ALLOW_HEADERS = (*default_headers, 'x-request-id')
+CORS_EXPOSE_HEADERS = ['x-request-id']
+
+# Cache condivisa tra i processi (Redis se configurato, altrimenti in memoria).
+# La cache in memoria è per processo: è ammessa solo con DEBUG (vedi
+# apps/core/checks.py), production.py richiede REDIS_URL
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'hrease',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Giorni della settimana non lavorativi per il calcolo delle assenze (0 = lunedì)
+LEAVES_WEEKEND_DAYS = [5, 6]
+
 # Frontend URL for password reset links
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
 
 # Aggiungi questa riga alle altre configurazioni
 LOGGING_SERVICE_URL = os.environ.get('LOGGING_SERVICE_URL', 'http://logging-service:8080')
 
+# Spool su disco per i log non consegnati al microservizio (vuoto per disabilitarlo)
+LOGGING_SPOOL_DIR = os.environ.get('LOGGING_SPOOL_DIR', str(BASE_DIR / 'var' / 'log_spool'))
+
+# Socket Unix dell'agente locale di spedizione dei log (python manage.py run_log_agent).
+# Se impostato, i worker consegnano i log all'agente invece che al microservizio.
+LOGGING_AGENT_SOCKET = os.environ.get('LOGGING_AGENT_SOCKET', '')
+
+# Gruppo condiviso da agente e worker, autorizzato a scrivere sul socket (0660).
+# Se vuoto il socket è accessibile solo all'utente dell'agente (0600).
+LOGGING_AGENT_SOCKET_GROUP = os.environ.get('LOGGING_AGENT_SOCKET_GROUP', '')
+
+# Soglia oltre la quale RequestContextMiddleware segnala una richiesta lenta
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 1000))
+
+# Token per l'endpoint interno delle metriche (/api/v1/internal/metrics/).
+# Se vuoto l'endpoint è accessibile solo con DEBUG attivo.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Trasporto asincrono dei log sul loop del server ASGI (impostato da hrease/asgi.py)
+LOGGING_ASYNC = os.environ.get('LOGGING_ASYNC', 'False').lower() in ('1', 'true', 'yes')
+
 # Configurazione del logging
 LOGGING = {
     'version': 1,
@@ -173,8 +228,37 @@ LOGGING = {
         },
         'simple_log_service': {
             'level': 'DEBUG',  # Cambiato da INFO a DEBUG
-            'class': 'apps.core.logging.SimpleLogHandler',
+            'class': 'apps.core.logging.AsyncLogHandler' if LOGGING_ASYNC else 'apps.core.logging.SimpleLogHandler',
             'formatter': 'verbose',
+            # Trasporto in batch verso il microservizio di logging
+            'queue_size': int(os.environ.get('LOGGING_QUEUE_SIZE', 10000)),
+            'batch_size': int(os.environ.get('LOGGING_BATCH_SIZE', 200)),
+            'flush_interval': float(os.environ.get('LOGGING_FLUSH_INTERVAL', 1.0)),
+            'overflow_policy': os.environ.get('LOGGING_OVERFLOW_POLICY', 'drop_newest'),
+            'spool_dir': LOGGING_SPOOL_DIR,
+            'spool_size': int(os.environ.get('LOGGING_SPOOL_SIZE', 16 * 1024 * 1024)),
+            'agent_socket': LOGGING_AGENT_SOCKET,
+            # Protezione dalle tempeste di log (vedi apps.core.log_storm)
+            'storm_protection': {
+                # Frazione di record DEBUG/INFO inoltrati al microservizio
+                'sampling': {
+                    'DEBUG': float(os.environ.get('LOGGING_SAMPLE_DEBUG', 1.0)),
+                    'INFO': float(os.environ.get('LOGGING_SAMPLE_INFO', 1.0)),
+                },
+                # Token bucket per logger e livello (record al secondo)
+                'rate_limits': {
+                    'DEBUG': {'rate': 50, 'burst': 200},
+                    'INFO': {'rate': 50, 'burst': 200},
+                    'WARNING': {'rate': 20, 'burst': 100},
+                    'ERROR': {'rate': 20, 'burst': 100},
+                },
+                # Token bucket condivisi da un intero sottoalbero di logger
+                'logger_rate_limits': {
+                    'django': {'rate': 100, 'burst': 500},
+                },
+                # Record identici (modulo, riga, template) collassati in un riepilogo
+                'dedup_window': float(os.environ.get('LOGGING_DEDUP_WINDOW', 10)),
+            },
         },
     },
     'loggers': {
@@ -199,6 +283,17 @@ LOGGING = {
             'level': 'INFO',  # Mantieni questo a INFO 
             'propagate': False,
         },
+        # Client HTTP asincrono usato da AsyncLogHandler
+        'httpx': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'httpcore': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['console', 'simple_log_service'],
@@ -1,10 +1,18 @@
 # backend/hrease/settings/production.py
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *
 
 DEBUG = False
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '').split(',')
 
+# Versioni delle risposte condizionali, dati di riferimento, calendario e
+# utenti autenticati sono invalidati tramite la cache: serve una cache
+# condivisa tra i processi
+if not REDIS_URL:
+    raise ImproperlyConfigured("REDIS_URL è obbligatorio in produzione")
+
 # Database
 DATABASES = {
     'default': {
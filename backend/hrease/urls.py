@@ -4,12 +4,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from apps.core.views import test_logging  # Importa la view di test
+from apps.core.views import test_logging, metrics  # Importa la view di test
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include('apps.accounts.urls')),
+    path('api/v1/leaves/', include('apps.leaves.urls')),
     path('api/v1/test/logging/', test_logging, name='test_logging'),  # Aggiungi la view di test
+    path('api/v1/internal/metrics/', metrics, name='metrics'),
 ]
 
 # Aggiungi configurazione per servire file statici e media in development
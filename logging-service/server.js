@@ -27,7 +27,9 @@ const logRotation = require('./logRotation');
 
 // Middleware
 app.use(cors());  // Abilita CORS per consentire richieste cross-origin
-app.use(bodyParser.json());  // Parse del body JSON nelle richieste
+app.use(bodyParser.json({ limit: process.env.MAX_BODY_SIZE || '5mb' }));  // Parse del body JSON (singolo log o batch)
+// Batch NDJSON (un log per riga), eventualmente compressi con gzip: body-parser decomprime automaticamente
+app.use(bodyParser.text({ type: 'application/x-ndjson', limit: process.env.MAX_BODY_SIZE || '5mb' }));
 app.use(express.static('ui'));  // Serve i file statici dalla directory 'ui'
 
 // Stampa informazioni di avvio
@@ -89,6 +91,69 @@ const logStore = {
     }
   },
   
+  /**
+   * Prepara il salvataggio di un insieme di log per una specifica sorgente:
+   * scrive il nuovo contenuto del file in un file temporaneo, che diventa
+   * effettivo solo con commitLogs
+   * @param {string} source - Sorgente dei log (es. 'backend', 'frontend')
+   * @param {array} newLogs - Array di oggetti contenenti i dati dei log
+   * @returns {object} - File di destinazione e file temporaneo
+   * @throws {Error} - Se il file temporaneo non può essere scritto
+   */
+  prepareLogs(source, newLogs) {
+    const logFile = path.join(LOG_DIR, `${source}.json`);
+    let logs = [];
+    
+    // Leggi log esistenti se il file esiste
+    if (fs.existsSync(logFile)) {
+      try {
+        logs = JSON.parse(fs.readFileSync(logFile, 'utf8'));
+      } catch (parseError) {
+        console.error(`Error parsing log file ${logFile}:`, parseError);
+        logs = [];
+      }
+    }
+    
+    const now = new Date().toISOString();
+    newLogs.forEach(log => {
+      logs.push({
+        timestamp: log.timestamp || now,
+        ...log
+      });
+    });
+    
+    // Limita a MAX_LOGS_PER_FILE log per file (rimuove i più vecchi)
+    if (logs.length > MAX_LOGS_PER_FILE) {
+      logs = logs.slice(-MAX_LOGS_PER_FILE);
+    }
+    
+    const tmpFile = `${logFile}.${process.pid}.tmp`;
+    fs.writeFileSync(tmpFile, JSON.stringify(logs, null, 2));
+    return { logFile, tmpFile };
+  },
+  
+  /**
+   * Salva i log di più sorgenti in modo atomico: o vengono salvati tutti o
+   * nessuno, così un batch rifiutato può essere ritrasmesso senza duplicati
+   * @param {object} bySource - Log da salvare raggruppati per sorgente
+   * @returns {boolean} - True se l'operazione è riuscita
+   */
+  saveBatch(bySource) {
+    const prepared = [];
+    try {
+      Object.keys(bySource).forEach(source => {
+        prepared.push(this.prepareLogs(source, bySource[source]));
+      });
+    } catch (error) {
+      console.error('Error saving logs:', error);
+      prepared.forEach(({ tmpFile }) => fs.rmSync(tmpFile, { force: true }));
+      return false;
+    }
+    // La rinomina nella stessa directory è atomica e non può fallire per spazio esaurito
+    prepared.forEach(({ logFile, tmpFile }) => fs.renameSync(tmpFile, logFile));
+    return true;
+  },
+  
   /**
    * Recupera log per una specifica sorgente con filtri opzionali
    * @param {string} source - Sorgente del log (es. 'backend', 'frontend')
@@ -168,11 +233,89 @@ const logStore = {
   }
 };
 
+const validLevels = ['debug', 'info', 'warn', 'error', 'critical'];
+
+/**
+ * Verifica che un log contenga i campi obbligatori e un livello valido
+ * @param {object} log - Oggetto log ricevuto
+ * @returns {string|null} - Messaggio di errore o null se il log è valido
+ */
+function validateLog(log) {
+  if (!log || !log.source || !log.level || !log.message) {
+    return 'Missing required fields';
+  }
+  if (!validLevels.includes(String(log.level).toLowerCase())) {
+    return 'Invalid log level';
+  }
+  return null;
+}
+
+/**
+ * Salva un batch di log raggruppandoli per sorgente (una scrittura per sorgente).
+ * Il salvataggio è atomico: in caso di errore nessun log del batch viene salvato
+ * @param {array} batch - Array di log ricevuti
+ * @returns {object} - Esito con numero di log accettati, scartati ed eventuale errore
+ */
+function ingestBatch(batch) {
+  const bySource = {};
+  let rejected = 0;
+  
+  batch.forEach(log => {
+    if (validateLog(log)) {
+      rejected++;
+      return;
+    }
+    const { source, level, message, meta, timestamp } = log;
+    (bySource[source] = bySource[source] || []).push({ timestamp, level, message, meta });
+  });
+  
+  if (!logStore.saveBatch(bySource)) {
+    return { accepted: 0, rejected, failed: true };
+  }
+  const accepted = Object.values(bySource).reduce((total, logs) => total + logs.length, 0);
+  return { accepted, rejected, failed: false };
+}
+
+/**
+ * Converte un body NDJSON in un array di log
+ * @param {string} body - Testo con un oggetto JSON per riga
+ * @returns {object} - Log decodificati e numero di righe non valide
+ */
+function parseNdjson(body) {
+  const logs = [];
+  let invalid = 0;
+  body.split('\n').forEach(line => {
+    if (!line.trim()) return;
+    try {
+      logs.push(JSON.parse(line));
+    } catch (parseError) {
+      invalid++;
+    }
+  });
+  return { logs, invalid };
+}
+
 /**
  * API per ricevere log
- * Endpoint POST che accetta log da varie sorgenti
+ * Endpoint POST che accetta log da varie sorgenti.
+ * Il body può essere un singolo log, un array di log oppure un batch NDJSON
+ * (Content-Type application/x-ndjson, anche compresso con gzip).
  */
 app.post('/api/logs', (req, res) => {
+  // Ingestione bulk: il body è un batch NDJSON o un array di log
+  if (typeof req.body === 'string' || Array.isArray(req.body)) {
+    let batch = req.body;
+    let invalid = 0;
+    if (typeof req.body === 'string') {
+      ({ logs: batch, invalid } = parseNdjson(req.body));
+    }
+    const { accepted, rejected, failed } = ingestBatch(batch);
+    if (failed) {
+      return res.status(500).json({ error: 'Failed to save logs', accepted, rejected: rejected + invalid });
+    }
+    return res.status(201).json({ success: true, accepted, rejected: rejected + invalid });
+  }
+  
   // Estrai i dati dalla richiesta
   const { source, level, message, meta } = req.body;
   
@@ -185,7 +328,6 @@ app.post('/api/logs', (req, res) => {
   }
   
   // Verifica che il livello sia valido
-  const validLevels = ['debug', 'info', 'warn', 'error', 'critical'];
   if (!validLevels.includes(level.toLowerCase())) {
     return res.status(400).json({ 
       error: 'Invalid log level', 
@@ -311,7 +453,7 @@ const server = app.listen(PORT, () => {
   console.log(`Logging service running on port ${PORT}`);
   console.log(`Dashboard available at http://localhost:${PORT}`);
   console.log(`API endpoints:`);
-  console.log(`- POST /api/logs - Send logs`);
+  console.log(`- POST /api/logs - Send logs (single object, JSON array or NDJSON batch)`);
   console.log(`- GET /api/logs/:source - Get logs by source`);
   console.log(`- GET /api/sources - Get available log sources`);
 });